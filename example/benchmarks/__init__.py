@@ -0,0 +1,82 @@
+"""Benchmarks of the XML loading, run from the example folder, e.g.:
+
+    python -m benchmarks.plan
+
+They use the models of the restaurant app and an in-memory test data base.
+benchmarks.suite times each stage of a load on a synthetic feed and writes the results as JSON, e.g.:
+
+    python -m benchmarks.suite --elements 5000 --json results.json
+"""
+# Python stdlib
+import logging
+import logging.handlers
+import os
+import tempfile
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fooproject.settings')
+
+# Loading the settings of the example project puts xmlmapping on the path
+from django.conf import settings
+# Do not keep the executed queries in memory
+settings.DEBUG = False
+
+
+def setup_db(db_file=None):
+    """Creates the test data base (syncdb and initial data) and returns the Restaurant Mapping.
+
+    Args:
+        db_file: the file of the SQLite data base. Default: in memory.
+    """
+    from django.db import connection
+    from xmlmapping.models import Mapping
+
+    if db_file:
+        settings.DATABASES['default']['TEST_NAME'] = db_file
+    connection.creation.create_test_db(verbosity=0)
+    return Mapping.objects.get(label='Restaurant Mapping')
+
+
+def clear_db():
+    """Deletes the objects of the restaurant app."""
+    from django.db import transaction
+    from restaurant.models import Menu, Meal, Music
+
+    for model in (Menu, Meal, Music):
+        model.objects.all().delete()
+    transaction.commit_unless_managed()
+
+
+def log_to_temp_file():
+    """Writes the log of xmlmapping in a temporary file, returns its path."""
+    log_file = os.path.join(tempfile.mkdtemp(), 'xmlmapping.log')
+    handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=5 * 1024 * 2 ** 10, backupCount=5)
+    handler.formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+    logging.getLogger('xmlmapping').handlers = [handler]
+    return log_file
+
+
+def best_of(func, repeat=3, number=1, setup=None):
+    """Returns the best time in seconds of one call to func.
+
+    Args:
+        setup: a function called before each timing, e.g. to clear the data base, not timed
+    """
+    best = None
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.time()
+        for j in range(number):
+            func()
+        elapsed = (time.time() - start) / number
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def report(title, rows):
+    """Prints a table of (name, value, unit) rows."""
+    print(title)
+    for name, value, unit in rows:
+        print('  %-40s %12.2f %s' % (name, value, unit))
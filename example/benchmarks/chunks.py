@@ -0,0 +1,40 @@
+"""Per-chunk cost of load_xml_chunks with many small chunks given as strings or as parsed elements.
+
+The Restaurant Mapping has an element-mapping outside of the chunks (the CDs of the jukebox catalog).
+"""
+from lxml import etree
+
+from . import setup_db, clear_db, best_of, report, log_to_temp_file
+from .feeds import menu_chunks
+
+NB_CHUNKS = 5000
+NB_FOODS = 1
+
+
+def main():
+    mapping = setup_db()
+    log_to_temp_file()
+
+    import xmlmapping.models
+    xmlmapping.models.LOG_VERBOSITY = 'summary'
+
+    chunks = menu_chunks(NB_CHUNKS, NB_FOODS)
+    root_path = 'restaurant.breakfast_menu'
+
+    rows = []
+    for name, load in (
+        ('strings', lambda: mapping.load_xml_chunks(chunks, root_path, bulk=True)),
+        ('elements', lambda: mapping.load_xml_chunks([etree.fromstring(chunk) for chunk in chunks], root_path, bulk=True)),
+    ):
+        seconds = best_of(load, setup=clear_db)
+        rows.append((name, seconds / NB_CHUNKS * 1e6, 'us/chunk'))
+
+    elements = [etree.fromstring(chunk) for chunk in chunks]
+    seconds = best_of(lambda: mapping.load_xml_chunks(elements, root_path, bulk=True), setup=clear_db)
+    rows.append(('elements parsed beforehand', seconds / NB_CHUNKS * 1e6, 'us/chunk'))
+
+    report('Loading %s chunks of %s food (2 objects each) with bulk_create in memory' % (NB_CHUNKS, NB_FOODS), rows)
+
+
+if __name__ == '__main__':
+    main()
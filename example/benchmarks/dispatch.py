@@ -0,0 +1,64 @@
+"""Cost of finding the elements of many element-mappings: one findall per path versus one walk of the trie."""
+from . import best_of, log_to_temp_file, report
+from .feeds import restaurant_feed
+
+from lxml import etree
+
+from xmlmapping.plan import MappingPlan
+from xmlmapping.utils.xmlhelper import XMLHelper
+
+NB_ELEMENTS = 5000
+NB_PATHS = (2, 20, 100)
+
+
+# Where the element-mappings other than the foods and CDs are: other sections of the feed
+# or other kinds of elements among the foods, e.g. the elements of a RSS channel besides its items.
+SHAPES = (
+    ('sections', 'restaurant.section%s.item'),
+    ('siblings', 'restaurant.breakfast_menu.special%s'),
+)
+
+
+def data_map(nb_paths, pattern):
+    """The element-mappings of the foods and CDs, plus paths matching nothing."""
+    models = {'restaurant.Music': {'title': 'title'}}
+    data_map = {
+        'restaurant.breakfast_menu.food': {'models': models},
+        'restaurant.jukebox_catalog.hits:cd': {'models': models},
+    }
+    for i in xrange(nb_paths - 2):
+        data_map[pattern % (i,)] = {'models': models}
+    return data_map
+
+
+def compare(root, shape, nb_paths, plan):
+    """Returns the report rows of the two ways of finding the elements."""
+    def findall():
+        for element_plan in plan.bind(root.nsmap):
+            for elem in XMLHelper.get_elements(element_plan.path, root):
+                pass
+
+    def walk():
+        for elem, element_plan in plan.trie(root.nsmap, root.tag).walk(root):
+            pass
+
+    return [
+        ('%s %s, findall per path' % (nb_paths, shape), best_of(findall) * 1e3, 'ms'),
+        ('%s %s, trie walk' % (nb_paths, shape), best_of(walk) * 1e3, 'ms'),
+    ]
+
+
+def main():
+    log_to_temp_file()
+    root = etree.fromstring(restaurant_feed(NB_ELEMENTS, NB_ELEMENTS))
+
+    rows = []
+    for shape, pattern in SHAPES:
+        for nb_paths in NB_PATHS:
+            rows.extend(compare(root, shape, nb_paths, MappingPlan.compile(data_map(nb_paths, pattern))))
+
+    report('Finding %s elements' % (2 * NB_ELEMENTS,), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Synthetic feeds shaped like example/restaurant.xml."""
+
+HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<restaurant xmlns:gastronomy="http://www.example-gastronoy.com/" xmlns:hits="http://www.example-gastronoy.com/">\n'
+
+FOOD = """\t\t<food>
+\t\t\t<guid>%(i)s</guid>
+\t\t\t<gastronomy:name>Belgian Waffles %(i)s</gastronomy:name>
+\t\t\t<price>$%(price).2f</price>
+\t\t\t<description>two of our famous Belgian Waffles with plenty of real maple syrup.</description>
+\t\t\t<calories>%(calories)s</calories>
+\t\t</food>
+"""
+
+CD = """\t\t<hits:cd>
+\t\t\t<title>Summer Of %(i)s</title>
+\t\t\t<artist>Bryan Adams</artist>
+\t\t\t<country>USA</country>
+\t\t\t<year>%(year)s</year>
+\t\t</hits:cd>
+"""
+
+
+def iter_restaurant_feed(nb_foods=1000, nb_cds=1000):
+    """Yields the pieces of a restaurant feed."""
+    yield HEADER
+    yield '\t<breakfast_menu>\n'
+    for i in xrange(nb_foods):
+        yield FOOD % {'i': i, 'price': 1 + i % 10 + 0.95, 'calories': 300 + i % 500}
+    yield '\t</breakfast_menu>\n\t<jukebox_catalog>\n'
+    for i in xrange(nb_cds):
+        yield CD % {'i': i, 'year': 1950 + i % 70}
+    yield '\t</jukebox_catalog>\n</restaurant>\n'
+
+
+def restaurant_feed(nb_foods=1000, nb_cds=1000):
+    """Returns a restaurant feed as a string."""
+    return ''.join(iter_restaurant_feed(nb_foods, nb_cds))
+
+
+def menu_chunks(nb_chunks=10, nb_foods=100):
+    """Returns a list of breakfast_menu chunks as strings, to be loaded with the root_path restaurant.breakfast_menu."""
+    chunks = []
+    for c in xrange(nb_chunks):
+        foods = [FOOD % {'i': i, 'price': 1 + i % 10 + 0.95, 'calories': 300 + i % 500} for i in xrange(c * nb_foods, (c + 1) * nb_foods)]
+        chunks.append('<breakfast_menu xmlns:gastronomy="http://www.example-gastronoy.com/" xmlns:hits="http://www.example-gastronoy.com/">\n%s</breakfast_menu>' % (''.join(foods),))
+    return chunks
+
+
+class SyntheticFeed(object):
+    """A breakfast menu of food elements like restaurant.xml, with a configurable shape, and its data_map.
+
+    Each food has a guid, a name, a price, calories and a description, plus nb_fields inner elements
+    spread over nb_namespaces namespaces. The name and nb_list_fields of the inner elements are mapped
+    to Meal.about as a list field. One description out of 5 has entities to unescape.
+    """
+    PATH = 'restaurant.breakfast_menu.food'
+    ROOT_PATH = 'restaurant.breakfast_menu'
+
+    def __init__(self, nb_elements=1000, nb_fields=4, nb_namespaces=1, nb_list_fields=2):
+        self.nb_elements = nb_elements
+        self.nb_fields = nb_fields
+        self.nb_namespaces = max(nb_namespaces, 1)
+        self.nb_list_fields = min(nb_list_fields, nb_fields)
+
+    def prefix(self, i):
+        return 'ns%s' % (i % self.nb_namespaces,)
+
+    def namespaces(self):
+        return ' '.join('xmlns:ns%s="http://www.example.com/ns%s/"' % (i, i) for i in xrange(self.nb_namespaces))
+
+    def food(self, i):
+        description = 'two of our famous Belgian Waffles with plenty of real maple syrup'
+        if i % 5 == 0:
+            description = 'Cr&amp;egrave;me br&amp;ucirc;l&amp;eacute;e &amp;amp; caf&amp;#233;'
+        fields = ''.join('<%s:f%s>value %s of %s</%s:f%s>' % (self.prefix(f), f, f, i, self.prefix(f), f) for f in xrange(self.nb_fields))
+        return '<food><guid>%s</guid><ns0:name>Belgian Waffles %s</ns0:name><price>$%.2f</price><calories>%s</calories><description>%s</description>%s</food>\n' % (
+            i, i, 1 + i % 10 + 0.95, 300 + i % 500, description, fields)
+
+    def menu(self, start, stop, namespaces=''):
+        return '<breakfast_menu%s>\n%s</breakfast_menu>' % (namespaces, ''.join(self.food(i) for i in xrange(start, stop)))
+
+    def xml(self):
+        """Returns the whole feed as a string."""
+        return '<?xml version="1.0" encoding="UTF-8"?>\n<restaurant %s>\n%s\n</restaurant>\n' % (self.namespaces(), self.menu(0, self.nb_elements))
+
+    def chunks(self, nb_chunks):
+        """Returns the feed as nb_chunks breakfast_menu chunks, to be loaded with ROOT_PATH."""
+        size = max(self.nb_elements // nb_chunks, 1)
+        namespaces = ' ' + self.namespaces()
+        return [self.menu(start, min(start + size, self.nb_elements), namespaces) for start in xrange(0, self.nb_elements, size)]
+
+    def data_map(self):
+        return {
+            self.PATH: {
+                'get_id': 'guid',
+                'models': {
+                    'restaurant.Meal': {
+                        'title': 'ns0:name',
+                        'price': 'price',
+                        'nb_calories': 'calories',
+                        'about': ['description'] + ['%s:f%s' % (self.prefix(f), f) for f in xrange(self.nb_list_fields)],
+                    },
+                    'restaurant.Menu': {
+                        'label': ['ns0:name', 'price'],
+                    },
+                },
+            },
+        }
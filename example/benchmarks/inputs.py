@@ -0,0 +1,170 @@
+"""Peak memory and throughput of loading a large local file: read() into a string and load_xml,
+load_xml_file with and without a memory map, load_xml_stream, and load_xml_chunks with 2 workers
+sent the chunks as strings, as FileRange of the file or split by split_xml.
+
+Each load runs in its own process, on its own SQLite file, so its memory is measured on its own, e.g. from the example folder:
+
+    python -m benchmarks.inputs --elements 50000
+
+The private memory (RssAnon) of the loading process is sampled every 10 ms. The pages of a memory-mapped file
+are not private: they are counted in RssFile and shared with the page cache and the other processes mapping the file.
+The peak RSS of the workers is the one of the largest worker, pages of the file included.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .feeds import SyntheticFeed
+
+MODES = (
+    'read + load_xml',
+    'load_xml_file',
+    'load_xml_file mmap',
+    'load_xml_stream mmap',
+    'load_xml_chunks strings workers=2',
+    'load_xml_chunks FileRange workers=2',
+    'split_xml + load_xml_chunks workers=2',
+)
+
+
+class MemorySampler(threading.Thread):
+    """Samples the private and file-backed RSS of the process and keeps their peaks, in MB."""
+
+    def __init__(self, interval=0.01):
+        super(MemorySampler, self).__init__()
+        self.daemon = True
+        self.interval = interval
+        self.peaks = {'RssAnon': 0.0, 'RssFile': 0.0}
+        self.stopped = threading.Event()
+
+    def sample(self):
+        with open('/proc/self/status') as f:
+            for line in f:
+                name = line.split(':')[0]
+                if name in self.peaks:
+                    self.peaks[name] = max(self.peaks[name], int(line.split()[1]) / 1024.0)
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.sample()
+            time.sleep(self.interval)
+
+
+def write_feed(feed, nb_chunks):
+    """Writes the feed in a temporary file, as a restaurant wrapping breakfast_menu chunks.
+
+    Returns:
+        A tuple (path of the file, list of (start, stop) of the chunks in the file).
+    """
+    fd, path = tempfile.mkstemp(suffix='.xml')
+    ranges = []
+    with os.fdopen(fd, 'wb') as f:
+        f.write('<restaurant %s>\n' % (feed.namespaces(),))
+        for chunk in feed.chunks(nb_chunks):
+            start = f.tell()
+            f.write(chunk)
+            ranges.append((start, f.tell()))
+            f.write('\n')
+        f.write('</restaurant>\n')
+    return path, ranges
+
+
+def load(mode, path, ranges, nb_elements, batch_size):
+    """Loads the file in a mode, in the current process.
+
+    Returns:
+        A dict of the results.
+    """
+    from . import setup_db, log_to_temp_file
+    setup_db(os.path.join(tempfile.mkdtemp(), 'benchmark.db'))
+    log_to_temp_file()
+
+    import xmlmapping.models
+    import xmlmapping.sources
+    from xmlmapping.models import Mapping
+    from xmlmapping.sources import FileRange
+    from xmlmapping.splitter import split_xml
+    xmlmapping.models.LOG_VERBOSITY = 'summary'
+    xmlmapping.sources.MMAP_FILES = 'mmap' in mode
+
+    mapping = Mapping.objects.create(label='Synthetic Mapping', data_map=SyntheticFeed().data_map())
+    root_path = SyntheticFeed.ROOT_PATH
+
+    sampler = MemorySampler()
+    sampler.sample()
+    baseline = sampler.peaks['RssAnon']
+    sampler.start()
+    start = time.time()
+
+    if mode == 'read + load_xml':
+        stats = mapping.load_xml(open(path).read(), bulk=True)
+    elif mode.startswith('load_xml_file'):
+        stats = mapping.load_xml_file(path, bulk=True)
+    elif mode.startswith('load_xml_stream'):
+        stats = mapping.load_xml_stream(path, bulk=True)
+    elif mode.startswith('load_xml_chunks strings'):
+        with open(path) as f:
+            chunks = []
+            for chunk_start, chunk_stop in ranges:
+                f.seek(chunk_start)
+                chunks.append(f.read(chunk_stop - chunk_start))
+        stats = mapping.load_xml_chunks(chunks, root_path, bulk=True, workers=2)
+    elif mode.startswith('load_xml_chunks FileRange'):
+        stats = mapping.load_xml_chunks([FileRange(path, a, b) for (a, b) in ranges], root_path, bulk=True, workers=2)
+    else:
+        stats = mapping.load_xml_chunks(split_xml(path, root_path, batch_size), root_path, bulk=True, workers=2)
+
+    elapsed = time.time() - start
+    sampler.stopped.set()
+    sampler.join()
+    assert sum(stats.itervalues()) == 2 * nb_elements, stats
+
+    return {
+        'mode': mode,
+        'seconds': elapsed,
+        'elements_per_second': nb_elements / elapsed,
+        'private_mb': sampler.peaks['RssAnon'] - baseline,
+        'file_mb': sampler.peaks['RssFile'],
+        'worker_peak_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--elements', type=int, default=20000, help='number of food elements')
+    parser.add_argument('--chunks', type=int, default=20, help='number of chunks for load_xml_chunks')
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    parser.add_argument('--file', help=argparse.SUPPRESS)
+    parser.add_argument('--ranges', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        # In a child process
+        print(json.dumps(load(args.mode, args.file, json.loads(args.ranges), args.elements, max(args.elements // args.chunks, 1))))
+        return
+
+    path, ranges = write_feed(SyntheticFeed(args.elements), args.chunks)
+    print('%s elements, %.1f MB file %s' % (args.elements, os.path.getsize(path) / 2.0 ** 20, path))
+    print('  %-40s %12s %12s %12s %12s' % ('', 'elements/s', 'private MB', 'file MB', 'worker MB'))
+    try:
+        for mode in MODES:
+            output = subprocess.check_output([
+                sys.executable, '-m', 'benchmarks.inputs',
+                '--mode', mode, '--file', path, '--ranges', json.dumps(ranges),
+                '--elements', str(args.elements), '--chunks', str(args.chunks),
+            ])
+            result = json.loads(output.splitlines()[-1])
+            print('  %-40s %12.0f %12.1f %12.1f %12.1f' % (
+                mode, result['elements_per_second'], result['private_mb'], result['file_mb'], result['worker_peak_mb']))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,37 @@
+"""Throughput of load_xml_chunks on a SQLite file with 1 to 8 worker processes.
+
+SQLite serializes the writes, so the gain comes from parsing and mapping in parallel.
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+
+from . import setup_db, clear_db, log_to_temp_file, report
+from .feeds import menu_chunks
+
+NB_CHUNKS = 40
+NB_FOODS = 100
+WORKERS = (1, 2, 4, 8)
+
+
+def main():
+    db_file = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    mapping = setup_db(db_file)
+    log_to_temp_file()
+    chunks = menu_chunks(NB_CHUNKS, NB_FOODS)
+
+    rows = []
+    for workers in WORKERS:
+        clear_db()
+        start = time.time()
+        nb_created = mapping.load_xml_chunks(chunks, 'restaurant.breakfast_menu', bulk=True, commit_every=NB_FOODS, workers=workers)
+        elapsed = time.time() - start
+        rows.append(('workers=%s' % (workers,), sum(nb_created.itervalues()) / elapsed, 'objects/s'))
+
+    report('Loading %s chunks of %s elements (%s objects) on %s CPUs in %s' % (
+        NB_CHUNKS, NB_FOODS, sum(nb_created.itervalues()), multiprocessing.cpu_count(), db_file), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Parse time and memory of a pretty-printed restaurant feed with a default etree.XMLParser()
+and with the parser profile of the PARSER_OPTIONS setting, e.g. from the example folder:
+
+    python -m benchmarks.parser --foods 20000
+
+The memory is the private memory (RssAnon) retained by the parsed document, measured in a process of its own per parser.
+The time of parsing small chunks with a new parser per chunk and with the parser of the thread is timed too.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from . import best_of, log_to_temp_file, report
+from .feeds import menu_chunks, restaurant_feed
+
+PARSERS = ('XMLParser()', 'PARSER_OPTIONS')
+NB_CHUNKS = 2000
+
+
+def rss_anon():
+    """Returns the private memory of the process in MB."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) / 1024.0
+
+
+def make_parser(name):
+    from lxml import etree
+    from xmlmapping.parsers import get_parser
+
+    if name == 'PARSER_OPTIONS':
+        return get_parser()
+    return etree.XMLParser()
+
+
+def measure(name, nb_foods):
+    """Parses the feed with a parser in the current process.
+
+    Returns:
+        A dict of the results.
+    """
+    from lxml import etree
+
+    xml = restaurant_feed(nb_foods, nb_foods)
+    parser = make_parser(name)
+
+    # Before the timings, whose documents are freed and leave their memory to the next ones
+    before = rss_anon()
+    root = etree.fromstring(xml, parser=parser)
+    retained = rss_anon() - before
+
+    seconds = best_of(lambda: etree.fromstring(xml, parser=parser))
+
+    return {
+        'mb_per_second': len(xml) / 2.0 ** 20 / seconds,
+        'retained_mb': retained,
+        'nodes': sum(1 for node in root.iter()) + sum(1 for text in root.itertext()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--foods', type=int, default=20000, help='number of food (and cd) elements')
+    parser.add_argument('--parser', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    log_to_temp_file()
+    if args.parser:
+        # In a child process
+        print(json.dumps(measure(args.parser, args.foods)))
+        return
+
+    xml = restaurant_feed(args.foods, args.foods)
+    print('%s foods and cds, %.1f MB' % (args.foods, len(xml) / 2.0 ** 20))
+    print('  %-40s %12s %12s %12s' % ('', 'MB/s', 'retained MB', 'nodes'))
+    for name in PARSERS:
+        output = subprocess.check_output([sys.executable, '-m', 'benchmarks.parser', '--parser', name, '--foods', str(args.foods)])
+        result = json.loads(output.splitlines()[-1])
+        print('  %-40s %12.1f %12.1f %12d' % (name, result['mb_per_second'], result['retained_mb'], result['nodes']))
+
+    from lxml import etree
+    from xmlmapping.parsers import get_parser
+
+    chunks = menu_chunks(NB_CHUNKS, 1)
+
+    def parse_with(parser):
+        for chunk in chunks:
+            etree.fromstring(chunk, parser=parser)
+
+    def parse_with_new_parsers():
+        for chunk in chunks:
+            etree.fromstring(chunk, parser=etree.XMLParser())
+
+    rows = []
+    for name, parse in (
+        ('new XMLParser() per chunk', parse_with_new_parsers),
+        ('get_parser() once per load', lambda: parse_with(get_parser())),
+    ):
+        rows.append((name, best_of(parse) / NB_CHUNKS * 1e6, 'us/chunk'))
+    report('Parsing %s chunks of one food' % (NB_CHUNKS,), rows)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,41 @@
+"""Cost of resolving the namespace prefixes of a path, uncached versus the path cache of XMLHelper."""
+from . import best_of, log_to_temp_file, report
+
+from xmlmapping.utils.xmlhelper import XMLHelper
+
+NUMBER = 100000
+NSMAP = {
+    'gastronomy': 'http://www.example-gastronoy.com/',
+    'media': 'http://search.yahoo.com/mrss/',
+    'dc': 'http://purl.org/dc/elements/1.1/',
+}
+# About 30 distinct paths, as in a feed with a few element-mappings
+PATHS = ['rss.channel.item.%s' % (tag,) for tag in ('title', 'guid', 'link', 'media:content', 'dc:creator', 'gastronomy:name')] * 5
+
+
+def main():
+    log_to_temp_file()
+
+    def uncached():
+        for i in xrange(NUMBER // len(PATHS)):
+            for path in PATHS:
+                XMLHelper._to_xpath(path, NSMAP)
+
+    def cached():
+        for i in xrange(NUMBER // len(PATHS)):
+            for path in PATHS:
+                XMLHelper.to_xpath(path, NSMAP)
+
+    XMLHelper.path_cache.clear()
+    before = best_of(uncached) / NUMBER * 1e9
+    after = best_of(cached) / NUMBER * 1e9
+    report('Resolving %s paths' % (NUMBER,), [
+        ('uncached', before, 'ns/path'),
+        ('cached', after, 'ns/path'),
+        ('cache hits', XMLHelper.path_cache_info().hits, ''),
+        ('cache misses', XMLHelper.path_cache_info().misses, ''),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Per-element cost of the field extraction: before the compiled mapping plan, with one compiled XPath per field,
+and with the texts of the children collected in one pass per element."""
+from . import setup_db, best_of, log_to_temp_file, report
+from .feeds import restaurant_feed
+
+from lxml import etree
+
+from xmlmapping.utils.introspection import ModelFactory
+from xmlmapping.utils.serializers import deserialize_function
+from xmlmapping.utils.xmlhelper import XMLHelper
+
+NB_ELEMENTS = 5000
+
+
+def legacy_resolve_get_id(get_id):
+    """Mapping._resolve_get_id before the plan."""
+    try:
+        return deserialize_function(get_id)
+    except:
+        pass
+    if isinstance(get_id, basestring):
+        return lambda x: XMLHelper.get_text(x, get_id)
+    return lambda x: get_id
+
+
+def legacy_map_element(element, models, get_id):
+    """Mapping._map_element and _map_to_fields before the plan, without saving."""
+    legacy_resolve_get_id(get_id)(element)
+    for app_model, fields in models.iteritems():
+        ins = ModelFactory.create(app_model)
+        for field, configuration in fields.items():
+            if isinstance(configuration, basestring):
+                setattr(ins, field, XMLHelper.get_text_unescape(element, configuration))
+            elif isinstance(configuration, list):
+                values = (XMLHelper.get_text_unescape(element, v) for v in configuration)
+                setattr(ins, field, ' '.join(values))
+
+
+def xpath_map_element(element, get_id, models):
+    """Mapping._map_element with one compiled XPath per field, without saving.
+
+    Args:
+        models: a list of (Model class, list of (field, list of text_finder, is_list))
+    """
+    get_id(element)
+    for model_class, fields in models:
+        ins = model_class()
+        for field, finders, is_list in fields:
+            if is_list:
+                setattr(ins, field, ' '.join([find(element) for find in finders]))
+            else:
+                setattr(ins, field, finders[0](element))
+
+
+def plan_map_element(element, element_plan):
+    """Mapping._map_element with the plan, without saving."""
+    element_plan.get_id(element)
+    texts = element_plan.collect(element)
+    for model_plan in element_plan.models:
+        model_plan.create(element, None, texts)
+
+
+def main():
+    mapping = setup_db()
+    log_to_temp_file()
+    path = 'restaurant.breakfast_menu.food'
+    conf = mapping.data_map[path]
+
+    root = etree.fromstring(restaurant_feed(NB_ELEMENTS, 0))
+    elems = XMLHelper.get_elements(path, root)
+
+    def legacy():
+        for elem in elems:
+            legacy_map_element(elem, conf['models'], conf['get_id'])
+
+    def xpath():
+        get_id = XMLHelper.text_finder(conf['get_id'], root.nsmap, unescape=False)
+        models = []
+        for app_model, fields in conf['models'].iteritems():
+            models.append((ModelFactory.get_model_class(app_model), [
+                (field, [XMLHelper.text_finder(tag, root.nsmap) for tag in (tags if isinstance(tags, list) else [tags])], isinstance(tags, list))
+                for (field, tags) in fields.iteritems()
+            ]))
+        for elem in elems:
+            xpath_map_element(elem, get_id, models)
+
+    def planned():
+        element_plan = [e for e in mapping.plan.bind(root.nsmap) if e.path == path][0]
+        for elem in elems:
+            plan_map_element(elem, element_plan)
+
+    before = best_of(legacy) / NB_ELEMENTS * 1e6
+    compiled = best_of(xpath) / NB_ELEMENTS * 1e6
+    after = best_of(planned) / NB_ELEMENTS * 1e6
+    report('Mapping %s elements to %s models (no DB)' % (NB_ELEMENTS, len(conf['models'])), [
+        ('before (to_xpath per field)', before, 'us/element'),
+        ('compiled XPath per field', compiled, 'us/element'),
+        ('after (texts collected once)', after, 'us/element'),
+        ('speedup', before / after, 'x'),
+    ])
+
+
+if __name__ == '__main__':
+    main()
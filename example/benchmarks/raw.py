@@ -0,0 +1,58 @@
+"""Throughput of load_xml on a SQLite file: objects saved one by one with save(), inserted in batches with bulk_create
+and inserted as raw rows with executemany (bulk='raw'), e.g. from the example folder:
+
+    python -m benchmarks.raw --foods 5000
+
+The time of the extract and save stages per object is reported along with the objects per second of the whole load.
+Only the summary of the loads is logged, in a temporary file.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from . import setup_db, clear_db, log_to_temp_file
+from .feeds import restaurant_feed
+
+MODES = (
+    ('save()', {}),
+    ('save(), commit_every=1000', {'commit_every': 1000}),
+    ('bulk_create', {'bulk': True}),
+    ('bulk_create, commit_every=1000', {'bulk': True, 'commit_every': 1000}),
+    ('raw', {'bulk': 'raw'}),
+    ('raw, commit_every=1000', {'bulk': 'raw', 'commit_every': 1000}),
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--foods', type=int, default=5000, help='number of food (and cd) elements')
+    args = parser.parse_args(argv)
+
+    import xmlmapping.models
+
+    log_to_temp_file()
+    xmlmapping.models.LOG_VERBOSITY = 'summary'
+    db_file = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    mapping = setup_db(db_file)
+    xml = restaurant_feed(args.foods, args.foods)
+
+    print('Loading %s elements in %s' % (2 * args.foods, db_file))
+    print('  %-40s %12s %14s %14s' % ('', 'objects/s', 'extract us/obj', 'save us/obj'))
+    for name, options in MODES:
+        clear_db()
+        start = time.time()
+        stats = mapping.load_xml(xml, **options)
+        elapsed = time.time() - start
+        nb_objects = sum(stats.itervalues())
+        print('  %-40s %12.0f %14.1f %14.1f' % (
+            name,
+            nb_objects / elapsed,
+            stats.wall['extract'] / nb_objects * 1e6,
+            stats.wall['save'] / nb_objects * 1e6,
+        ))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
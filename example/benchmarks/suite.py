@@ -0,0 +1,167 @@
+"""Times each stage of a load on a synthetic feed, then load_xml and load_xml_chunks end to end, on a SQLite file.
+
+The results are printed and can be written as JSON to compare releases, e.g. from the example folder:
+
+    python -m benchmarks.suite --elements 5000 --fields 8 --namespaces 2 --json results.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from . import setup_db, clear_db, best_of, report, log_to_temp_file
+from .feeds import SyntheticFeed
+
+
+def stages(mapping, feed, repeat):
+    """Times the stages of a load one by one.
+
+    Returns:
+        A list of (stage, seconds) for the whole feed.
+    """
+    from lxml import etree
+    from xmlmapping.persistence import Pending, SaveWriter, BulkWriter
+    from xmlmapping.utils import html
+
+    xml = feed.xml()
+    plan = mapping.plan
+    times = []
+
+    times.append(('parse', best_of(lambda: etree.fromstring(xml), repeat)))
+    root = etree.fromstring(xml)
+
+    trie = plan.trie(root.nsmap, root.tag)
+    times.append(('lookup', best_of(lambda: list(trie.walk(root)), repeat)))
+    matches = list(trie.walk(root))
+
+    def extract():
+        for elem, element_plan in matches:
+            element_plan.get_id(elem)
+            texts = element_plan.collect(elem)
+            for model_plan in element_plan.models:
+                model_plan.extract(elem, texts)
+    times.append(('extract', best_of(extract, repeat)))
+
+    texts = [elem.text or '' for (element, element_plan) in matches for elem in element.iterchildren()]
+    times.append(('unescape', best_of(lambda: [html.unescape(text) for text in texts], repeat)))
+
+    def create():
+        pendings = []
+        for elem, element_plan in matches:
+            id_value = element_plan.get_id(elem)
+            texts = element_plan.collect(elem)
+            for model_plan in element_plan.models:
+                pendings.append(Pending(element_plan.path, id_value, model_plan, model_plan.create(elem, id_value, texts)))
+        return pendings
+    times.append(('extract + instantiate', best_of(create, repeat)))
+
+    for name, writer_class in (('save', SaveWriter), ('bulk_create', BulkWriter)):
+        pendings = []
+
+        def setup():
+            clear_db()
+            pendings[:] = create()
+
+        def write():
+            writer = writer_class(commit_every=len(pendings))
+            with writer:
+                for pending in pendings:
+                    writer.add(pending)
+                    writer.element_done()
+                writer.flush()
+
+        times.append(('persist with %s' % (name,), best_of(write, repeat, setup=setup)))
+
+    return times
+
+
+def loads(mapping, feed, nb_chunks, repeat):
+    """Times load_xml and load_xml_chunks end to end.
+
+    Returns:
+        A list of (load, seconds) for the whole feed.
+    """
+    xml = feed.xml()
+    chunks = feed.chunks(nb_chunks)
+    fd, xml_file = tempfile.mkstemp(suffix='.xml')
+    os.write(fd, xml)
+    os.close(fd)
+
+    times = []
+    for name, load in (
+        ('load_xml', lambda: mapping.load_xml(xml)),
+        ('load_xml bulk', lambda: mapping.load_xml(xml, bulk=True)),
+        ('load_xml bulk commit_every', lambda: mapping.load_xml(xml, bulk=True, commit_every=1000)),
+        ('load_xml_chunks bulk', lambda: mapping.load_xml_chunks(chunks, feed.ROOT_PATH, bulk=True)),
+        ('load_xml_stream bulk', lambda: mapping.load_xml_stream(xml_file, bulk=True)),
+    ):
+        times.append((name, best_of(load, repeat, setup=clear_db)))
+    return times
+
+
+def versions():
+    import django
+    import lxml.etree
+    import xmlmapping
+
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'lxml': lxml.etree.__version__,
+        'xmlmapping': xmlmapping.get_version(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--elements', type=int, default=2000, help='number of food elements')
+    parser.add_argument('--fields', type=int, default=4, help='number of extra inner elements per food')
+    parser.add_argument('--namespaces', type=int, default=1, help='number of namespaces of the inner elements')
+    parser.add_argument('--list-fields', type=int, default=2, help='number of inner elements joined in a list field')
+    parser.add_argument('--chunks', type=int, default=20, help='number of chunks for load_xml_chunks')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timings, the best one is kept')
+    parser.add_argument('--log-elements', action='store_true', help='log each element and object (LOG_VERBOSITY=elements)')
+    parser.add_argument('--json', help='file to write the results to')
+    args = parser.parse_args(argv)
+
+    db_file = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    setup_db(db_file)
+    log_file = log_to_temp_file()
+
+    import xmlmapping.models
+    from xmlmapping.models import Mapping
+    xmlmapping.models.LOG_VERBOSITY = args.log_elements and 'elements' or 'summary'
+
+    feed = SyntheticFeed(args.elements, args.fields, args.namespaces, args.list_fields)
+    mapping = Mapping.objects.create(label='Synthetic Mapping', data_map=feed.data_map())
+
+    results = []
+    for kind, times in (('stage', stages(mapping, feed, args.repeat)), ('load', loads(mapping, feed, args.chunks, args.repeat))):
+        for name, seconds in times:
+            results.append({
+                'kind': kind,
+                'name': name,
+                'seconds': seconds,
+                'us_per_element': seconds / args.elements * 1e6,
+            })
+
+    report('%s elements, %s fields, %s namespaces, %s list fields, SQLite file %s' % (
+        args.elements, args.fields, args.namespaces, args.list_fields, db_file),
+        [(r['name'], r['us_per_element'], 'us/element') for r in results])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'versions': versions(),
+                'parameters': dict(vars(args), log_file=log_file),
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+        print('Results written in %s' % (args.json,))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
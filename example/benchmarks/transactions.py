@@ -0,0 +1,40 @@
+"""Throughput of load_xml on a SQLite file: autocommit versus commit intervals, batched inserts and pipelining."""
+import os
+import tempfile
+import time
+
+from . import setup_db, clear_db, log_to_temp_file, report
+from .feeds import restaurant_feed
+
+NB_ELEMENTS = 2000
+
+MODES = (
+    ('autocommit', {}),
+    ('commit_every=100', {'commit_every': 100}),
+    ('commit_every=1000', {'commit_every': 1000}),
+    ('bulk', {'bulk': True}),
+    ('bulk, commit_every=1000', {'bulk': True, 'commit_every': 1000}),
+    ('pipeline', {'pipeline': True}),
+    ('bulk, commit_every=1000, pipeline', {'bulk': True, 'commit_every': 1000, 'pipeline': True}),
+)
+
+
+def main():
+    db_file = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    mapping = setup_db(db_file)
+    log_to_temp_file()
+    xml = restaurant_feed(NB_ELEMENTS, NB_ELEMENTS)
+
+    rows = []
+    for name, options in MODES:
+        clear_db()
+        start = time.time()
+        nb_created = mapping.load_xml(xml, **options)
+        elapsed = time.time() - start
+        rows.append((name, sum(nb_created.itervalues()) / elapsed, 'objects/s'))
+
+    report('Loading %s elements (%s objects) in %s' % (2 * NB_ELEMENTS, sum(nb_created.itervalues()), db_file), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Cost of unescaping realistic field values: the legacy function, the precompiled table and the memo."""
+from . import best_of, report
+
+from xmlmapping.tests.utils.html import legacy_unescape
+from xmlmapping.utils.html import unescape, memoized_unescape
+
+NUMBER = 10000
+
+# Field values as found in the feeds: most have no entity, short values repeat
+VALUES = (
+    ('price', ['$%s.95' % (i % 10,) for i in range(100)]),
+    ('country code', ['USA', 'UK', 'FR', 'EU'] * 25),
+    ('description', ['two of our famous Belgian Waffles with plenty of real maple syrup %s' % (i,) for i in range(100)]),
+    ('title with entities', [u'Cr&egrave;me br&ucirc;l&eacute;e &amp; caf&#233; %s' % (i % 5,) for i in range(100)]),
+    ('long text with entities', [u'Fish &amp; Chips, %s &lt;3 ' % (i,) * 20 for i in range(100)]),
+)
+
+
+def main():
+    memoized = memoized_unescape()
+
+    rows = []
+    for name, values in VALUES:
+        for value in values:
+            assert unescape(value) == legacy_unescape(value) == memoized(value)
+
+        for label, func in (('legacy', legacy_unescape), ('table', unescape), ('table + memo', memoized)):
+            def run():
+                for value in values:
+                    func(value)
+            rows.append(('%s, %s' % (name, label), best_of(run, number=NUMBER // len(values)) / len(values) * 1e9, 'ns/value'))
+
+    report('Unescaping field values', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Cost of the log of a load: each element and object logged versus the summary only, in a rotating log file,
+written by the loading thread or by a background thread (QueueHandler, the LOG_QUEUE_SIZE setting).
+The time to write the records left in the queue after the load is reported apart."""
+import logging
+import time
+
+from . import setup_db, clear_db, best_of, report, log_to_temp_file
+from .feeds import restaurant_feed
+
+NB_ELEMENTS = 2000
+
+NB_QUEUED = 10000
+
+MODES = (
+    ('LOG_VERBOSITY=elements', 'elements', logging.INFO, None),
+    ('LOG_VERBOSITY=elements, queue (block)', 'elements', logging.INFO, 'block'),
+    ('LOG_VERBOSITY=elements, queue (drop)', 'elements', logging.INFO, 'drop'),
+    ('LOG_VERBOSITY=summary', 'summary', logging.INFO, None),
+    ('LOG_LEVEL=WARNING', 'elements', logging.WARNING, None),
+)
+
+
+def main():
+    import xmlmapping.models
+    from xmlmapping.utils.loggers import QueueHandler, QueueListener
+
+    log_file = log_to_temp_file()
+    logger = logging.getLogger('xmlmapping')
+    file_handler = logger.handlers[0]
+
+    mapping = setup_db()
+    xml = restaurant_feed(NB_ELEMENTS, NB_ELEMENTS)
+
+    def load():
+        clear_db()
+        mapping.load_xml(xml, bulk=True)
+
+    rows = []
+    for name, verbosity, level, policy in MODES:
+        xmlmapping.models.LOG_VERBOSITY = verbosity
+        logger.setLevel(level)
+        listener = None
+        logger.handlers = [file_handler]
+        if policy is not None:
+            listener = QueueListener([file_handler], NB_QUEUED)
+            logger.handlers = [QueueHandler(listener, policy)]
+
+        rows.append((name, best_of(load, setup=listener and listener.flush) / (2 * NB_ELEMENTS) * 1e6, 'us/element'))
+        if listener is not None:
+            start = time.time()
+            listener.stop()
+            rows.append(('  then writing the queue', (time.time() - start) / (2 * NB_ELEMENTS) * 1e6, 'us/element'))
+
+    report('Loading %s elements with bulk=True, logging in %s' % (2 * NB_ELEMENTS, log_file), rows)
+
+
+if __name__ == '__main__':
+    main()
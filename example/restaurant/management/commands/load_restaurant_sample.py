@@ -13,9 +13,11 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
 
         try:
-            data = open('restaurant.xml').read()
             map = Mapping.objects.get(label='Restaurant Mapping')
-            nb_created = map.load_xml(data)
+            nb_created = map.load_xml_file('restaurant.xml')
+            if nb_created.errors:
+                self.stderr.write('The mapping cannot load the file restaurant.xml: %s\n' % ('; '.join(nb_created.errors),))
+                return
             self.stdout.write('XML successfully loaded. %s objects created.\n' % (sum(nb_created.itervalues()),))
             self.stdout.write(' \n'.join(['%s: %s objects created' % (k, v) for (k, v) in nb_created.items()]))            
         except ObjectDoesNotExist:
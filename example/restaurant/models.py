@@ -14,6 +14,7 @@ class Meal(models.Model):
     price = models.CharField(max_length=255)
     about = models.CharField(max_length=255)
     nb_calories = models.CharField(max_length=255)
+    menu = models.ForeignKey(Menu, null=True, blank=True)
 
     def __unicode__(self):
         return u'%s (%s cal - %s)' % (
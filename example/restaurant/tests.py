@@ -1,8 +1,17 @@
 # Python stdlib
-import os.path
+import bz2
+import gzip
+import logging
+import os
+import tempfile
+import time
+from StringIO import StringIO
 
 # Django
-from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
 
 
 # Third-party apps
@@ -10,13 +19,33 @@ from lxml import etree  # http://lxml.de/
 
 # Internal
 from .models import Menu, Meal, Music
+import xmlmapping.models
+from xmlmapping.management.commands.load_xml_mapping import ProgressSink
 from xmlmapping.models import Mapping
+from xmlmapping.sources import FileRange
+from xmlmapping.splitter import split_xml
+from xmlmapping.stats import MemorySink, register_sink, unregister_sink
+from xmlmapping.tests.persistence import nb_queries
+from xmlmapping.utils.xmlhelper import ElementNotFound
 
 
-XML = open(os.path.join(os.path.dirname(__file__), '../restaurant.xml')).read()
+# call_command exits on a CommandError before Django 1.5
+COMMAND_FAILED = (SystemExit, CommandError)
+
+XML_FILE = os.path.join(os.path.dirname(__file__), '../restaurant.xml')
+XML = open(XML_FILE).read()
 DOC = etree.fromstring(XML)
 
 
+def call_load_xml_mapping(*args, **options):
+    """Calls the load_xml_mapping command and returns its output."""
+    out = StringIO()
+    err = StringIO()
+    options.setdefault('progress_interval', 0)
+    call_command('load_xml_mapping', *args, stdout=out, stderr=err, **options)
+    return out.getvalue()
+
+
 class LoadXMLTestCase(TestCase):
     def setUp(self):
         # Get the mapping
@@ -32,3 +61,712 @@ class LoadXMLTestCase(TestCase):
         self.assertEqual(Menu.objects.get(pk=2).label, u'French Toast $4.50')
         self.assertEqual(Meal.objects.get(pk=1).title, u'Belgian Waffles')
         self.assertEqual(Music.objects.get(pk=1).singer, u'Bryan Adams')
+
+    def test_load_xml_unescape(self):
+
+        self.map.load_xml(XML.replace('$', '&amp;#36;').replace('Bryan', 'Bry&amp;#97;n'))
+
+        self.assertEqual(Menu.objects.get(pk=2).label, u'French Toast $4.50')
+        self.assertEqual(Meal.objects.get(pk=1).price, u'$5.95')
+        self.assertEqual(Music.objects.get(pk=1).singer, u'Bryan Adams')
+
+
+class ParserOptionsTestCase(TestCase):
+    def setUp(self):
+        # Get the mapping
+        self.map = Mapping.objects.get(label='Restaurant Mapping')
+        self.xml = XML.replace('Belgian Waffles', 'Belgian <!-- comment -->Waffles')
+
+    def test_comments_removed(self):
+
+        self.map.load_xml(self.xml)
+
+        self.assertEqual(Meal.objects.get(pk=1).title, u'Belgian Waffles')
+
+    def test_mapping_parser_options(self):
+        self.map.parser_options = {'remove_comments': False}
+
+        self.map.load_xml_stream(StringIO(self.xml))
+
+        # The text of the element stops at the comment
+        self.assertEqual(Meal.objects.get(pk=1).title, u'Belgian ')
+
+
+class TransformersTestCase(TestCase):
+    def setUp(self):
+        # Get the mapping
+        self.map = Mapping.objects.get(label='Restaurant Mapping')
+        meal = self.map.data_map['restaurant.breakfast_menu.food']['models']['restaurant.Meal']
+        meal['price'] = {'tag': 'price', 'transform': [{'regex': r'\$([0-9.]+)'}, 'decimal']}
+        meal['nb_calories'] = {'tag': 'calories', 'transform': 'int'}
+        self.map.save()
+
+    def test_load_xml(self):
+
+        stats = self.map.load_xml(XML, bulk=True)
+
+        self.assertEqual(stats.objects['restaurant.Meal']['created'], 2)
+        self.assertEqual(Meal.objects.get(title=u'Belgian Waffles').price, u'5.95')
+        self.assertEqual(Meal.objects.get(title=u'Belgian Waffles').nb_calories, u'650')
+
+    def test_failed(self):
+
+        stats = self.map.load_xml(XML.replace('<price>$5.95</price>', '<price>free</price>'))
+
+        self.assertEqual(stats.objects['restaurant.Meal'], {'created': 1, 'updated': 0, 'unchanged': 0, 'failed': 1})
+
+
+class LoadXMLBulkTestCase(TestCase):
+    def setUp(self):
+        # Get the mapping
+        self.map = Mapping.objects.get(label='Restaurant Mapping')
+
+    def test_load_xml_bulk(self):
+
+        nb_created = self.map.load_xml(XML, bulk=True)
+
+        self.assertEqual(nb_created, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 3})
+        self.assertEqual(Menu.objects.count(), 2)
+        self.assertEqual(Meal.objects.count(), 2)
+        self.assertEqual(Music.objects.count(), 3)
+        self.assertEqual(Meal.objects.get(title=u'Belgian Waffles').price, u'$5.95')
+
+    def test_load_xml_chunks_bulk(self):
+        menu = etree.tostring(DOC.find('breakfast_menu'))
+
+        nb_created = self.map.load_xml_chunks([menu, menu, '<breakfast_menu>'], 'restaurant.breakfast_menu', bulk=True)
+
+        self.assertEqual(nb_created, {'restaurant.breakfast_menu.food': 8, 'restaurant.jukebox_catalog.hits:cd': 0})
+        self.assertEqual(Meal.objects.count(), 4)
+
+    def test_load_xml_pipeline(self):
+
+        nb_created = self.map.load_xml(XML, pipeline=2)
+
+        self.assertEqual(nb_created, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 3})
+        self.assertEqual(Music.objects.count(), 3)
+
+    def test_load_xml_stream_pipeline(self):
+
+        nb_created = self.map.load_xml_stream(XML_FILE, bulk=True, commit_every=2, pipeline=True)
+
+        self.assertEqual(nb_created, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 3})
+        self.assertEqual(Meal.objects.get(title=u'Belgian Waffles').price, u'$5.95')
+
+    def test_load_xml_chunks_pipeline(self):
+        menu = etree.tostring(DOC.find('breakfast_menu'))
+
+        nb_created = self.map.load_xml_chunks([menu, '<breakfast_menu>', menu], 'restaurant.breakfast_menu', pipeline=True)
+
+        self.assertEqual(nb_created, {'restaurant.breakfast_menu.food': 8, 'restaurant.jukebox_catalog.hits:cd': 0})
+        self.assertEqual(Meal.objects.count(), 4)
+
+    def test_load_xml_commit_every(self):
+
+        nb_created = self.map.load_xml(XML, commit_every=2)
+
+        self.assertEqual(nb_created, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 3})
+        self.assertEqual(Music.objects.count(), 3)
+
+    def test_load_xml_raw(self):
+
+        nb_created = self.map.load_xml(XML, bulk='raw')
+
+        self.assertEqual(nb_created, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 3})
+        self.assertEqual(Meal.objects.get(title=u'Belgian Waffles').price, u'$5.95')
+        self.assertEqual(Meal.objects.get(title=u'Belgian Waffles').menu, None)
+        self.assertEqual(Music.objects.get(title=u'Summer Of 69').desc, u'USA 1985')
+
+    def test_load_xml_stream_raw_pipeline(self):
+
+        nb_created = self.map.load_xml_stream(XML_FILE, bulk='raw', commit_every=2, pipeline=True)
+
+        self.assertEqual(nb_created, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 3})
+        self.assertEqual(Menu.objects.get(label=u'French Toast $4.50').label, u'French Toast $4.50')
+
+    def test_load_xml_stream_bulk(self):
+
+        nb_created = self.map.load_xml_stream(XML_FILE, bulk=True)
+
+        self.assertEqual(nb_created, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 3})
+        self.assertEqual(Music.objects.count(), 3)
+
+
+class UpsertTestCase(TestCase):
+    def setUp(self):
+        self.map = Mapping.objects.create(label='Meal Upsert Mapping', data_map={
+            'restaurant.breakfast_menu.food': {
+                'get_id': 'gastronomy:name',
+                'id_field': {'restaurant.Meal': 'title'},
+                'models': {
+                    'restaurant.Meal': {
+                        'nb_calories': 'calories',
+                        'price': 'price',
+                        'about': 'description',
+                    }
+                }
+            }
+        })
+
+    def _test_reload(self, bulk):
+        path = 'restaurant.breakfast_menu.food'
+
+        self.assertEqual(self.map.load_xml(XML, bulk=bulk), {path: 2})
+        self.assertEqual(self.map.load_xml(XML, bulk=bulk), {path: 0})
+        self.assertEqual(self.map.load_xml(XML.replace('$4.50', '$4.75'), bulk=bulk), {path: 0})
+
+        self.assertEqual(Meal.objects.count(), 2)
+        self.assertEqual(Meal.objects.get(title=u'French Toast').price, u'$4.75')
+        self.assertEqual(Meal.objects.get(title=u'Belgian Waffles').price, u'$5.95')
+
+    def test_reload(self):
+        self._test_reload(bulk=False)
+
+    def test_reload_bulk(self):
+        self._test_reload(bulk=True)
+
+    def test_reload_queries(self):
+        self.map.load_xml(XML, bulk=True)
+
+        # 1 query to look up the existing objects, no updates
+        with self.assertNumQueries(1):
+            self.map.load_xml(XML, bulk=True)
+
+    def test_reload_changed_queries(self):
+        self.map.load_xml(XML, bulk=True)
+
+        # 1 query to look up the existing objects, 1 to update the changed ones
+        with self.assertNumQueries(nb_queries(2, nb_savepoints=1)):
+            self.map.load_xml(XML.replace('$4.50', '$4.75').replace('$5.95', '$6.15'), bulk=True)
+
+        self.assertEqual(Meal.objects.get(title=u'French Toast').price, u'$4.75')
+        self.assertEqual(Meal.objects.get(title=u'Belgian Waffles').price, u'$6.15')
+
+
+class RelationsTestCase(TestCase):
+    def setUp(self):
+        self.map = Mapping.objects.create(label='Meal Relations Mapping', data_map={
+            'restaurant.breakfast_menu.food': {
+                'get_id': 'gastronomy:name',
+                'id_field': {'restaurant.Menu': 'label'},
+                'models': {
+                    'restaurant.Meal': {
+                        'title': 'gastronomy:name',
+                        'menu': {'sibling': 'restaurant.Menu'},
+                    },
+                    'restaurant.Menu': {},
+                }
+            }
+        })
+
+    def _test_sibling(self, bulk):
+        path = 'restaurant.breakfast_menu.food'
+
+        self.assertEqual(self.map.load_xml(XML, bulk=bulk), {path: 4})
+
+        self.assertEqual(Menu.objects.count(), 2)
+        for meal in Meal.objects.all():
+            self.assertEqual(meal.menu.label, meal.title)
+
+    def test_sibling(self):
+        self._test_sibling(bulk=False)
+
+    def test_sibling_bulk(self):
+        self._test_sibling(bulk=True)
+
+    def test_related(self):
+        for label in [u'Belgian Waffles', u'French Toast']:
+            Menu.objects.create(label=label)
+        self.map.data_map = {
+            'restaurant.breakfast_menu.food': {
+                'models': {
+                    'restaurant.Meal': {
+                        'title': 'gastronomy:name',
+                        'menu': {'related': 'restaurant.Menu', 'key': 'label', 'tag': 'gastronomy:name'},
+                    },
+                }
+            }
+        }
+        self.map.save()
+
+        # 1 query to look up the menus of the batch, 1 to insert the meals
+        with self.assertNumQueries(nb_queries(2, nb_savepoints=1)):
+            stats = self.map.load_xml(XML, bulk=True)
+
+        self.assertEqual(stats.objects['restaurant.Meal']['created'], 2)
+        for meal in Meal.objects.all():
+            self.assertEqual(meal.menu.label, meal.title)
+
+    def test_related_not_found(self):
+        Menu.objects.create(label=u'Belgian Waffles')
+        self.map.data_map['restaurant.breakfast_menu.food']['models'] = {
+            'restaurant.Meal': {
+                'title': 'gastronomy:name',
+                'menu': {'related': 'restaurant.Menu', 'key': 'label', 'tag': 'gastronomy:name'},
+            },
+        }
+        self.map.save()
+
+        stats = self.map.load_xml(XML)
+
+        self.assertEqual(stats.objects['restaurant.Meal'], {'created': 1, 'updated': 0, 'unchanged': 0, 'failed': 1})
+        self.assertEqual(Meal.objects.get().title, u'Belgian Waffles')
+
+
+class SkipUnchangedTestCase(TestCase):
+    def setUp(self):
+        self.map = Mapping.objects.create(label='Meal Skip Unchanged Mapping', data_map={
+            'restaurant.breakfast_menu.food': {
+                'get_id': 'gastronomy:name',
+                'id_field': {'restaurant.Meal': 'title'},
+                'skip_unchanged': True,
+                'models': {
+                    'restaurant.Meal': {
+                        'nb_calories': 'calories',
+                        'price': 'price',
+                        'about': 'description',
+                    }
+                }
+            }
+        })
+
+    def test_reload(self):
+        path = 'restaurant.breakfast_menu.food'
+
+        self.assertEqual(self.map.load_xml(XML), {path: 2})
+        self.assertEqual(self.map.digests.count(), 2)
+
+        # 1 query to load the digests, the elements are skipped
+        with self.assertNumQueries(1):
+            self.assertEqual(self.map.load_xml(XML, bulk=True), {path: 0})
+
+        self.assertEqual(self.map.load_xml_stream(StringIO(XML.replace('$4.50', '$4.75'))), {path: 0})
+        self.assertEqual(Meal.objects.get(title=u'French Toast').price, u'$4.75')
+        self.assertEqual(self.map.digests.count(), 2)
+
+    def test_not_saved_mapping(self):
+        self.map.pk = None
+
+        self.assertEqual(self.map.load_xml(XML), {'restaurant.breakfast_menu.food': 2})
+        self.assertEqual(self.map.load_xml(XML), {'restaurant.breakfast_menu.food': 0})
+        self.assertEqual(Meal.objects.count(), 2)
+
+
+class LogVerbosityTestCase(TestCase):
+    def setUp(self):
+        self.map = Mapping.objects.get(label='Restaurant Mapping')
+        self.records = []
+        self.handler = logging.Handler()
+        self.handler.emit = self.records.append
+        logging.getLogger('xmlmapping').addHandler(self.handler)
+
+    def tearDown(self):
+        logging.getLogger('xmlmapping').removeHandler(self.handler)
+        xmlmapping.models.LOG_VERBOSITY = 'elements'
+
+    def test_elements(self):
+        self.map.load_xml(XML)
+
+        # 7 objects and 5 elements mapped, 2 summaries of element-mappings, 1 summary and the statistics of the load
+        self.assertEqual(len(self.records), 16)
+        self.assertEqual(self.records[0].args[1], '1')
+
+    def test_summary(self):
+        xmlmapping.models.LOG_VERBOSITY = 'summary'
+
+        self.map.load_xml(XML)
+
+        self.assertEqual(len(self.records), 4)
+        self.assertEqual(Music.objects.count(), 3)
+
+
+class LoadStatsTestCase(TestCase):
+    def setUp(self):
+        self.map = Mapping.objects.get(label='Restaurant Mapping')
+        self.sink = MemorySink()
+        register_sink(self.sink)
+
+    def tearDown(self):
+        unregister_sink(self.sink)
+
+    def test_load_xml_stats(self):
+
+        stats = self.map.load_xml(XML)
+
+        self.assertEqual(stats.found, {'restaurant.breakfast_menu.food': 2, 'restaurant.jukebox_catalog.hits:cd': 3})
+        self.assertEqual(stats.objects['restaurant.Meal'], {'created': 2, 'updated': 0, 'unchanged': 0, 'failed': 0})
+        self.assertEqual(stats.objects['restaurant.Music']['created'], 3)
+        self.assertEqual(stats.bytes_parsed, len(XML))
+        self.assertEqual(sorted(stats.wall), ['extract', 'lookup', 'parse', 'save', 'total'])
+        self.assertTrue(stats.wall['total'] >= stats.wall['parse'] + stats.wall['extract'])
+        self.assertEqual(self.sink.loads, [('Restaurant Mapping', stats)])
+
+    def test_load_xml_failed_objects(self):
+        # The food has no description: its Meal cannot be saved
+        menu = '<breakfast_menu xmlns:gastronomy="http://www.example-gastronoy.com/"><food><guid>1</guid><gastronomy:name>Toast</gastronomy:name><price>1</price><calories>100</calories></food></breakfast_menu>'
+
+        stats = self.map.load_xml_chunks([menu], 'restaurant.breakfast_menu')
+
+        self.assertEqual(stats.objects['restaurant.Meal']['failed'], 1)
+        self.assertEqual(stats.objects['restaurant.Menu']['created'], 1)
+
+    def test_load_xml_stream_stats(self):
+
+        stats = self.map.load_xml_stream(StringIO(XML), pipeline=True)
+
+        self.assertEqual(stats, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 3})
+        self.assertEqual(stats.bytes_parsed, len(XML))
+        self.assertEqual(stats.cpu['save'], None)
+        self.assertTrue('blocked' in stats.wall)
+
+
+class LoadXMLStreamTestCase(TestCase):
+    def setUp(self):
+        # Get the mapping
+        self.map = Mapping.objects.get(label='Restaurant Mapping')
+
+    def test_load_xml_stream_path(self):
+
+        nb_created = self.map.load_xml_stream(XML_FILE)
+
+        self.assertEqual(nb_created, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 3})
+        self.assertEqual(Menu.objects.count(), 2)
+        self.assertEqual(Meal.objects.count(), 2)
+        self.assertEqual(Music.objects.count(), 3)
+        self.assertEqual(Menu.objects.get(pk=2).label, u'French Toast $4.50')
+        self.assertEqual(Meal.objects.get(pk=1).title, u'Belgian Waffles')
+        self.assertEqual(Music.objects.get(pk=1).singer, u'Bryan Adams')
+
+    def test_load_xml_stream_file(self):
+
+        nb_created = self.map.load_xml_stream(StringIO(XML))
+
+        self.assertEqual(nb_created, self.map.load_xml(XML))
+
+    def test_load_xml_stream_root_path(self):
+        menu = etree.tostring(DOC.find('breakfast_menu'))
+
+        nb_created = self.map.load_xml_stream(StringIO(menu), root_path='restaurant.breakfast_menu')
+
+        self.assertEqual(nb_created, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 0})
+        self.assertEqual(Meal.objects.count(), 2)
+
+    def test_load_xml_invalid(self):
+
+        stats = self.map.load_xml('<restaurant><breakfast_menu>')
+
+        self.assertEqual(sum(stats.itervalues()), 0)
+        self.assertEqual(len(stats.errors), 1)
+
+    def test_load_xml_stream_invalid(self):
+
+        nb_created = self.map.load_xml_stream(StringIO('<restaurant><breakfast_menu>'))
+
+        self.assertEqual(sum(nb_created.itervalues()), 0)
+        self.assertEqual(len(nb_created.errors), 1)
+
+    def test_load_xml_stream_mapping_error(self):
+        # Not a parse error: raised like by load_xml
+        xml = XML.replace('<guid>1</guid>', '')
+
+        self.assertRaises(ElementNotFound, self.map.load_xml, xml)
+        self.assertRaises(ElementNotFound, self.map.load_xml_stream, StringIO(xml))
+
+    def test_load_xml_stream_truncated(self):
+        end = XML.index('</food>') + len('</food>')
+
+        stats = self.map.load_xml_stream(StringIO(XML[:end]))
+
+        self.assertEqual(stats.found, {'restaurant.breakfast_menu.food': 1, 'restaurant.jukebox_catalog.hits:cd': 0})
+        self.assertEqual(len(stats.errors), 1)
+        self.assertEqual(Meal.objects.get().title, u'Belgian Waffles')
+
+    def test_load_xml_stream_missing(self):
+
+        stats = self.map.load_xml_stream('missing.xml')
+
+        self.assertEqual(sum(stats.itervalues()), 0)
+        self.assertEqual(len(stats.errors), 1)
+
+    def test_load_xml_stream_gzip(self):
+        gzipped = StringIO()
+        with gzip.GzipFile(fileobj=gzipped, mode='wb') as f:
+            f.write(XML)
+        gzipped.seek(0)
+
+        stats = self.map.load_xml_stream(gzipped)
+
+        self.assertEqual(stats, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 3})
+        self.assertEqual(stats.bytes_parsed, len(XML))
+
+
+class LoadXMLFileTestCase(TestCase):
+    def setUp(self):
+        # Get the mapping
+        self.map = Mapping.objects.get(label='Restaurant Mapping')
+
+    def test_load_xml_file_path(self):
+
+        nb_created = self.map.load_xml_file(XML_FILE)
+
+        self.assertEqual(nb_created, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 3})
+        self.assertEqual(Menu.objects.get(pk=2).label, u'French Toast $4.50')
+
+    def test_load_xml_file_bz2(self):
+        fd, path = tempfile.mkstemp(suffix='.xml.bz2')
+        os.write(fd, bz2.compress(XML))
+        os.close(fd)
+        try:
+            stats = self.map.load_xml_file(path, bulk=True)
+        finally:
+            os.remove(path)
+
+        self.assertEqual(stats, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 3})
+        self.assertEqual(stats.bytes_parsed, len(XML))
+        self.assertEqual(Music.objects.count(), 3)
+
+    def test_load_xml_file_missing(self):
+
+        stats = self.map.load_xml_file('missing.xml')
+
+        self.assertEqual(sum(stats.itervalues()), 0)
+        self.assertEqual(len(stats.errors), 1)
+
+    def test_load_xml_chunks_file_ranges(self):
+        menu = etree.tostring(DOC.find('breakfast_menu'))
+        fd, path = tempfile.mkstemp(suffix='.xml')
+        os.write(fd, menu + '\n' + menu)
+        os.close(fd)
+        ranges = [FileRange(path, 0, len(menu)), FileRange(path, len(menu) + 1, 2 * len(menu) + 1)]
+        try:
+            stats = self.map.load_xml_chunks(ranges, 'restaurant.breakfast_menu')
+        finally:
+            os.remove(path)
+
+        self.assertEqual(stats, {'restaurant.breakfast_menu.food': 8, 'restaurant.jukebox_catalog.hits:cd': 0})
+        self.assertEqual(stats.bytes_parsed, 2 * len(menu))
+        self.assertEqual(Meal.objects.count(), 4)
+
+    def test_load_xml_chunks_split(self):
+
+        chunks = split_xml(XML_FILE, 'restaurant.breakfast_menu', 1)
+        stats = self.map.load_xml_chunks(chunks, 'restaurant.breakfast_menu')
+
+        self.assertEqual(stats, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 0})
+        self.assertEqual(Meal.objects.get(title=u'Belgian Waffles').price, u'$5.95')
+
+    def test_load_xml_chunks_invalid(self):
+        menu = etree.tostring(DOC.find('breakfast_menu'))
+
+        stats = self.map.load_xml_chunks([menu, menu[:-10]], 'restaurant.breakfast_menu')
+
+        self.assertEqual(stats, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 0})
+        self.assertEqual(len(stats.errors), 1)
+
+    def test_load_xml_chunks_elements(self):
+
+        chunks = split_xml(XML_FILE, 'restaurant.breakfast_menu', 1, serialize=False)
+        stats = self.map.load_xml_chunks(chunks, 'restaurant.breakfast_menu', bulk=True)
+
+        self.assertEqual(stats, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 0})
+        self.assertEqual(stats.bytes_parsed, 0)
+        self.assertEqual(Menu.objects.count(), 2)
+
+    def test_load_xml_chunks_workers_in_transaction(self):
+
+        # The test runs in a transaction
+        self.assertRaises(
+            transaction.TransactionManagementError,
+            self.map.load_xml_chunks, [XML], 'restaurant.breakfast_menu', workers=2,
+        )
+
+
+class LoadXMLMappingCommandTestCase(TestCase):
+
+    call = staticmethod(call_load_xml_mapping)
+
+    def test_files_and_globs(self):
+
+        out = self.call('Restaurant Mapping', XML_FILE, XML_FILE[:-2] + '*', batch_size=1)
+
+        self.assertEqual(Menu.objects.count(), 4)
+        self.assertTrue('restaurant.breakfast_menu.food: 2 found, 0 skipped, 4 created, 0 updated, 0 unchanged' in out)
+        self.assertTrue('Total: 2 files loaded' in out)
+
+    def test_stream(self):
+
+        out = self.call('Restaurant Mapping', XML_FILE, stream=True, commit_every=2)
+
+        self.assertEqual(Music.objects.count(), 3)
+        self.assertTrue('time: parse' in out)
+
+    def test_errors(self):
+        self.assertRaises(COMMAND_FAILED, self.call, 'Unknown Mapping', XML_FILE)
+        self.assertRaises(COMMAND_FAILED, self.call, 'Restaurant Mapping', XML_FILE, workers=2)
+        self.assertRaises(COMMAND_FAILED, self.call, 'Restaurant Mapping', 'missing.xml')
+        self.assertRaises(COMMAND_FAILED, self.call, 'Restaurant Mapping', XML_FILE, raw=True, batch_size=10)
+
+    def test_missing_file(self):
+        for options in ({}, {'stream': True}):
+            self.assertRaises(COMMAND_FAILED, self.call, 'Restaurant Mapping', 'missing.xml', **options)
+
+    def test_truncated_file(self):
+        fd, path = tempfile.mkstemp(suffix='.xml')
+        os.write(fd, XML[:XML.index('</food>') + len('</food>')])
+        os.close(fd)
+        try:
+            for options in ({}, {'stream': True}):
+                self.assertRaises(COMMAND_FAILED, self.call, 'Restaurant Mapping', path, **options)
+        finally:
+            os.remove(path)
+
+    def test_raw(self):
+
+        self.call('Restaurant Mapping', XML_FILE, raw=True)
+
+        self.assertEqual(Meal.objects.count(), 2)
+        self.assertEqual(Music.objects.count(), 3)
+
+    def test_progress(self):
+        out = StringIO()
+        mapping = Mapping.objects.get(label='Restaurant Mapping')
+        sink = ProgressSink(out, 0.001)
+
+        sink.start(mapping, mapping.load_xml(XML))
+        time.sleep(0.05)
+        sink.emit(mapping, None)
+
+        self.assertTrue('         5 elements' in out.getvalue())
+        self.assertTrue('         7 objects' in out.getvalue())
+        self.assertTrue(sink.thread is None)
+
+
+class WorkersTestCase(TransactionTestCase):
+    """The loads with workers. Each worker has its own DB connection: the in-memory test DB cannot be shared,
+    so the loads are tested on a SQLite file.
+    """
+
+    call = staticmethod(call_load_xml_mapping)
+
+    def setUp(self):
+        fd, self.db_file = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        # Closing the connection to the in-memory test DB would destroy it: it is put aside
+        self.db_name = connection.settings_dict['NAME']
+        self.memory_connection = connection.connection
+        connection.connection = None
+        connection.settings_dict['NAME'] = self.db_file
+        call_command('syncdb', interactive=False, verbosity=0)
+
+        self.map = Mapping.objects.get(label='Restaurant Mapping')
+        self.menus = list(split_xml(XML_FILE, 'restaurant.breakfast_menu', 1))
+
+    def tearDown(self):
+        connection.close()
+        connection.settings_dict['NAME'] = self.db_name
+        connection.connection = self.memory_connection
+        os.remove(self.db_file)
+
+    def test_load_xml_chunks(self):
+
+        stats = self.map.load_xml_chunks([self.menus[0], '<breakfast_menu>', self.menus[1]], 'restaurant.breakfast_menu', bulk=True, workers=2)
+
+        self.assertEqual(stats, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 0})
+        self.assertEqual(len(stats.errors), 1)
+        self.assertEqual(sorted(Menu.objects.values_list('label', flat=True)), [u'Belgian Waffles $5.95', u'French Toast $4.50'])
+        self.assertEqual(sorted(Meal.objects.values_list('title', flat=True)), [u'Belgian Waffles', u'French Toast'])
+
+    def test_load_xml_chunks_stats(self):
+        sink = MemorySink()
+        register_sink(sink)
+        try:
+            stats = self.map.load_xml_chunks(self.menus, 'restaurant.breakfast_menu', workers=2)
+        finally:
+            unregister_sink(sink)
+
+        self.assertEqual(stats.found['restaurant.breakfast_menu.food'], 2)
+        self.assertEqual(stats.objects['restaurant.Menu']['created'], 2)
+        self.assertEqual(stats.bytes_parsed, sum(len(menu) for menu in self.menus))
+        self.assertEqual(sink.loads, [('Restaurant Mapping', stats)])
+
+    def test_load_xml_chunks_file_ranges(self):
+        fd, path = tempfile.mkstemp(suffix='.xml')
+        os.write(fd, '\n'.join(self.menus))
+        os.close(fd)
+        first = len(self.menus[0])
+        ranges = [FileRange(path, 0, first), FileRange(path, first + 1, first + 1 + len(self.menus[1]))]
+        try:
+            stats = self.map.load_xml_chunks(ranges, 'restaurant.breakfast_menu', workers=2)
+        finally:
+            os.remove(path)
+
+        self.assertEqual(stats, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 0})
+        self.assertEqual(sorted(Meal.objects.values_list('title', flat=True)), [u'Belgian Waffles', u'French Toast'])
+
+    def test_load_xml_chunks_elements(self):
+
+        chunks = split_xml(XML_FILE, 'restaurant.breakfast_menu', 1, serialize=False)
+        stats = self.map.load_xml_chunks(chunks, 'restaurant.breakfast_menu', workers=2)
+
+        self.assertEqual(stats, {'restaurant.breakfast_menu.food': 4, 'restaurant.jukebox_catalog.hits:cd': 0})
+        self.assertEqual(Meal.objects.get(title=u'French Toast').price, u'$4.50')
+
+    def test_load_xml_chunks_split(self):
+
+        chunks = split_xml(XML_FILE, 'restaurant.jukebox_catalog', 2)
+        stats = self.map.load_xml_chunks(chunks, 'restaurant.jukebox_catalog', workers=2)
+
+        self.assertEqual(stats, {'restaurant.breakfast_menu.food': 0, 'restaurant.jukebox_catalog.hits:cd': 3})
+        self.assertEqual(sorted(Music.objects.values_list('singer', flat=True)), [u'Bonnie Tyler', u'Bryan Adams', u'Dolly Parton'])
+
+    def test_load_xml_chunks_log_order(self):
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        logging.getLogger('xmlmapping').addHandler(handler)
+        try:
+            self.map.load_xml_chunks([self.menus[0], '<breakfast_menu>', self.menus[1]], 'restaurant.breakfast_menu', workers=2)
+        finally:
+            logging.getLogger('xmlmapping').removeHandler(handler)
+
+        messages = [record.getMessage() for record in records]
+        first = [i for (i, message) in enumerate(messages) if 'Element (id:1) mapped' in message]
+        error = [i for (i, message) in enumerate(messages) if 'XML chunk cannot be parsed' in message]
+        second = [i for (i, message) in enumerate(messages) if 'Element (id:2) mapped' in message]
+        self.assertEqual(len(first + error + second), 3)
+        self.assertTrue(first < error < second)
+        self.assertTrue(messages[-1].endswith('=> end'))
+
+    def test_load_xml_chunks_skip_unchanged(self):
+        self.map.data_map['restaurant.breakfast_menu.food']['skip_unchanged'] = True
+        self.map.save()
+
+        # The same element in two chunks: its digest is saved by both workers
+        stats = self.map.load_xml_chunks([self.menus[0], self.menus[0], self.menus[1]], 'restaurant.breakfast_menu', workers=2)
+
+        self.assertEqual(stats.found['restaurant.breakfast_menu.food'], 3)
+        self.assertEqual(sorted(self.map.digests.values_list('element_id', flat=True)), [u'1', u'2'])
+
+        stats = self.map.load_xml_chunks(self.menus, 'restaurant.breakfast_menu', workers=2)
+
+        self.assertEqual(stats.counts['skipped']['restaurant.breakfast_menu.food'], 2)
+
+    def test_command(self):
+
+        out = self.call('Restaurant Mapping', XML_FILE, root_path='restaurant.jukebox_catalog', workers=2, chunk_size=1)
+
+        self.assertTrue('restaurant.jukebox_catalog.hits:cd: 3 found' in out)
+        self.assertEqual(Music.objects.count(), 3)
+
+    def test_command_missing_file(self):
+
+        self.assertRaises(COMMAND_FAILED, self.call, 'Restaurant Mapping', 'missing.xml', root_path='restaurant.breakfast_menu', workers=2)
+
+    def test_command_truncated_file(self):
+        fd, path = tempfile.mkstemp(suffix='.xml')
+        os.write(fd, XML[:XML.index('</food>') + len('</food>')])
+        os.close(fd)
+        try:
+            self.assertRaises(COMMAND_FAILED, self.call, 'Restaurant Mapping', path, root_path='restaurant.breakfast_menu', workers=2, chunk_size=1)
+        finally:
+            os.remove(path)
@@ -6,7 +6,7 @@ from .models import Mapping
 
 
 class MappingAdmin(admin.ModelAdmin):
-    fields = ('label', 'data_map',)
+    fields = ('label', 'data_map', 'parser_options',)
     list_display = ('label', 'data_map',)
     search_fields = ('label',)
 
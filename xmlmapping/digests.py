@@ -0,0 +1,133 @@
+# Python stdlib
+import hashlib
+
+# Django
+from django.db import IntegrityError
+from django.utils.encoding import force_unicode
+
+# Third-party apps
+from lxml import etree  # http://lxml.de/
+
+# Internal
+from .persistence import Writer
+from .settings import BULK_BATCH_SIZE
+
+
+def element_digest(element):
+    """Calculates the MD5 digest of the serialized content of an element, its tail excluded.
+
+    Returns:
+        A string of 32 hexadecimal digits.
+    """
+    return hashlib.md5(etree.tostring(element, with_tail=False)).hexdigest()
+
+
+class DigestIndex(object):
+    """The digests of the elements mapped by the previous loads of a mapping, used to skip the unchanged elements.
+
+    All the digests of the element-mappings are loaded with one query when the index is created.
+    The digests of the new and changed elements are kept apart until save is called,
+    and an element is discarded when one of its objects cannot be persisted so it is mapped again on the next load.
+    """
+
+    def __init__(self, model, mapping, paths, batch_size=BULK_BATCH_SIZE, using=None):
+        """
+        Args:
+            model: the Model storing the digests, i.e. ElementDigest
+            mapping: the Mapping being loaded
+            paths: the paths of the element-mappings skipping their unchanged elements
+            batch_size: the number of digests written per query
+            using: the alias of the DB
+        """
+        self.model = model
+        self.mapping = mapping
+        self.batch_size = batch_size
+        self.using = using
+
+        rows = model._default_manager.db_manager(using).filter(mapping=mapping, path__in=paths).values_list('path', 'element_id', 'digest')
+        self.digests = dict(((path, element_id), digest) for (path, element_id, digest) in rows.iterator())
+        self.changed = {}  # (path, element ID) -> new digest
+
+    @staticmethod
+    def key(path, element_id):
+        # The IDs are stored as text
+        return (path, force_unicode(element_id))
+
+    def is_unchanged(self, path, element_id, digest):
+        """Returns whether the element has the same digest as when it was last loaded."""
+        return self.digests.get(self.key(path, element_id)) == digest
+
+    def set(self, path, element_id, digest):
+        """Records the new digest of an element, saved by save."""
+        self.changed[self.key(path, element_id)] = digest
+
+    def discard(self, path, element_id):
+        """Forgets the new digest of an element, e.g. because one of its objects cannot be persisted."""
+        self.changed.pop(self.key(path, element_id), None)
+
+    def save(self, writer=None):
+        """Saves the new digests. The previous digests of the changed elements are replaced.
+
+        The digest of an element may have been saved since the index was created, e.g. by a worker loading
+        another chunk holding the same element: the digests of its batch are then replaced one by one (see _replace).
+
+        Args:
+            writer: the Writer of the load, the batches are inserted in its savepoints. Default: a Writer on the DB of the index.
+
+        Returns:
+            The number of digests saved.
+        """
+        if writer is None:
+            writer = Writer(using=self.using)
+        manager = self.model._default_manager.db_manager(self.using)
+        changed = self.changed.items()
+        for i in xrange(0, len(changed), self.batch_size):
+            batch = changed[i:i + self.batch_size]
+
+            # Delete the previous digests of the changed elements, per path
+            replaced = {}
+            for key, digest in batch:
+                if key in self.digests:
+                    replaced.setdefault(key[0], []).append(key[1])
+            for path, element_ids in replaced.iteritems():
+                manager.filter(mapping=self.mapping, path=path, element_id__in=element_ids).delete()
+
+            objs = [
+                self.model(mapping=self.mapping, path=path, element_id=element_id, digest=digest)
+                for ((path, element_id), digest) in batch
+            ]
+            sid = writer.savepoint()
+            try:
+                manager.bulk_create(objs)
+            except IntegrityError:
+                writer.rollback(sid)
+                for obj in objs:
+                    self._replace(manager, obj, writer)
+            else:
+                writer.commit(sid)
+
+        self.digests.update(self.changed)
+        self.changed = {}
+        return len(changed)
+
+    def _replace(self, manager, obj, writer):
+        """Replaces the digest of an element: updates it on the unique key, inserts it if it does not exist.
+        When another worker inserts it meanwhile, the insert fails in its savepoint and the digest is updated.
+
+        Args:
+            manager: the manager of the digests on the DB of the index
+            obj: the unsaved digest
+            writer: the Writer of the load
+        """
+        previous = manager.filter(mapping=self.mapping, path=obj.path, element_id=obj.element_id)
+        if previous.update(digest=obj.digest):
+            return
+
+        sid = writer.savepoint()
+        try:
+            obj.save(using=self.using, force_insert=True)
+        except IntegrityError:
+            writer.rollback(sid)
+            previous.update(digest=obj.digest)
+        else:
+            writer.commit(sid)
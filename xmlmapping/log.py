@@ -1,6 +1,6 @@
 # Internal
 from .settings import (
-    LOGGER_NAME, LOG_FILE, LOG_SIZE, LOGGER_FORMAT, LOG_LEVEL
+    LOGGER_NAME, LOG_FILE, LOG_SIZE, LOGGER_FORMAT, LOG_LEVEL, LOG_QUEUE_SIZE, LOG_QUEUE_FULL
 )
 from .utils.loggers import DefaultLogger
 
@@ -9,5 +9,7 @@ default_logger = DefaultLogger(
     level=LOG_LEVEL,
     log_file=LOG_FILE,
     log_size=LOG_SIZE,
-    logger_format=LOGGER_FORMAT
+    logger_format=LOGGER_FORMAT,
+    queue_size=LOG_QUEUE_SIZE,
+    queue_full=LOG_QUEUE_FULL
 )
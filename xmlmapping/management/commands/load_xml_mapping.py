@@ -0,0 +1,217 @@
+# Python stdlib
+import glob
+import resource
+import threading
+import time
+from optparse import make_option
+
+# Django
+from django.core.management.base import BaseCommand, CommandError
+
+# Third-party apps
+from lxml import etree  # http://lxml.de/
+
+# Internal
+from ...models import Mapping
+from ...persistence import CREATED, UPDATED, UNCHANGED
+from ...splitter import split_xml
+from ...stats import SKIPPED, STAGES, register_sink, unregister_sink
+
+
+def rss_mb():
+    """Returns the resident memory of the process in MB, the peak one when /proc is not available."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except IOError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def progress(stats):
+    """Returns the (number of elements found, number of objects persisted) of a load so far."""
+    # The dicts are copied by values() at once: they may be updated by the thread loading
+    nb_elements = sum(stats.found.values())
+    nb_objects = sum(actions[CREATED] + actions[UPDATED] + actions[UNCHANGED] for actions in stats.objects.values())
+    return nb_elements, nb_objects
+
+
+class ProgressSink(object):
+    """A sink writing the progress of the loads every interval seconds, from their counters while they are updated:
+    the elements found and the objects persisted per second and the resident memory.
+    The writes of the workers are counted after each chunk.
+    """
+
+    def __init__(self, out, interval=1.0):
+        self.out = out
+        self.interval = interval
+        self.stats = None
+        self.started = None
+        self.stopped = None
+        self.thread = None
+
+    def start(self, mapping, stats):
+        self.stop()
+        self.stats = stats
+        self.started = time.time()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def emit(self, mapping, stats):
+        self.stop()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.report()
+
+    def report(self):
+        elapsed = max(time.time() - self.started, 1e-6)
+        nb_elements, nb_objects = progress(self.stats)
+        self.out.write('  %7.1fs %10d elements %9.0f/s %10d objects %9.0f/s %9.1f MB RSS\n' % (
+            elapsed, nb_elements, nb_elements / elapsed, nb_objects, nb_objects / elapsed, rss_mb()))
+        self.out.flush()
+
+
+class Command(BaseCommand):
+    """Django command to load XML files with a mapping."""
+    args = '<mapping label> <file or glob> [<file or glob> ...]'
+    help = ('Load XML files (compressed or not) in the DB with a mapping. '
+            'The progress is written every --progress-interval seconds, then the time spent per stage.')
+    option_list = BaseCommand.option_list + (
+        make_option('--root-path', dest='root_path', default=None,
+            help='The root (dotted path) of the XML data, needed with --workers: the path of the chunks.'),
+        make_option('--stream', action='store_true', dest='stream', default=False,
+            help='Parse the files incrementally (load_xml_stream) instead of building each document in memory.'),
+        make_option('--workers', type='int', dest='workers', default=1,
+            help='Split the files in chunks of the elements at --root-path and load them in this number of processes.'),
+        make_option('--chunk-size', type='int', dest='chunk_size', default=500,
+            help='The number of children of the root path per chunk, with --workers. Default: 500.'),
+        make_option('--bulk', action='store_true', dest='bulk', default=None,
+            help='Insert the objects in batches with bulk_create. Default: the BULK_CREATE setting.'),
+        make_option('--batch-size', type='int', dest='batch_size', default=None,
+            help='The number of objects of a Model per batch, implies --bulk. Default: the BULK_BATCH_SIZE setting.'),
+        make_option('--raw', action='store_true', dest='raw', default=False,
+            help='Insert the rows with executemany without creating instances: no save(), no signals. Batches of BULK_BATCH_SIZE.'),
+        make_option('--commit-every', type='int', dest='commit_every', default=None,
+            help='The number of elements to map between two commits. Default: each query is committed on its own.'),
+        make_option('--pipeline', action='store_true', dest='pipeline', default=False,
+            help='Parse and map the XML in a separate thread while the objects are persisted.'),
+        make_option('--progress-interval', type='float', dest='progress_interval', default=1.0,
+            help='The number of seconds between two progress lines, 0 to write none. Default: 1.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) < 2:
+            raise CommandError('A mapping label and at least one file are required.')
+
+        label = args[0]
+        try:
+            mapping = Mapping.objects.get(label=label)
+        except Mapping.DoesNotExist:
+            raise CommandError('The mapping named: "%s" cannot be found.' % (label,))
+
+        if options['workers'] > 1:
+            if options['stream']:
+                raise CommandError('--stream and --workers cannot be used together.')
+            if not options['root_path']:
+                raise CommandError('--workers requires --root-path, the path of the chunks.')
+        if options['raw'] and options['batch_size']:
+            raise CommandError('--raw and --batch-size cannot be used together.')
+
+        paths = []
+        for pattern in args[1:]:
+            # A path matching nothing is loaded as it is, so it is reported as not loaded
+            paths.extend(sorted(glob.glob(pattern)) or [pattern])
+
+        verbosity = int(options.get('verbosity', 1))
+        sink = None
+        if verbosity > 0 and options['progress_interval'] > 0:
+            sink = ProgressSink(self.stdout, options['progress_interval'])
+            register_sink(sink)
+
+        start = time.time()
+        loaded = []
+        failed = []
+        try:
+            for path in paths:
+                if verbosity > 0:
+                    self.stdout.write('Loading %s with %s\n' % (path, mapping))
+                try:
+                    stats = self.load(mapping, path, options)
+                except (IOError, etree.XMLSyntaxError) as e:
+                    failed.append(path)
+                    self.stderr.write('%s cannot be loaded: %s\n' % (path, e))
+                    continue
+                if stats.errors:
+                    # Not parsed, or only partially: the elements found before the error are loaded
+                    failed.append(path)
+                    self.stderr.write('%s cannot be loaded, see the log.\n' % (path,))
+                    continue
+                loaded.append(stats)
+                if verbosity > 0:
+                    self.write_summary(path, stats)
+        finally:
+            if sink is not None:
+                sink.stop()
+                unregister_sink(sink)
+
+        if verbosity > 0 and len(paths) > 1:
+            elapsed = time.time() - start
+            totals = [progress(load_stats) for load_stats in loaded]
+            nb_elements = sum(e for (e, o) in totals)
+            nb_objects = sum(o for (e, o) in totals)
+            self.stdout.write('Total: %s files loaded in %.3fs, %s elements (%.0f/s), %s objects (%.0f/s)\n' % (
+                len(loaded), elapsed, nb_elements, nb_elements / elapsed, nb_objects, nb_objects / elapsed))
+
+        if failed:
+            raise CommandError('%s file(s) cannot be loaded: %s' % (len(failed), ', '.join(failed)))
+
+    def load(self, mapping, path, options):
+        """Loads a file with the options of the command.
+
+        Returns:
+            The LoadStats of the load, with the error when the file cannot be read or parsed.
+
+        Raises:
+            An IOError or an etree.XMLSyntaxError if the file cannot be read or parsed when it is split for the workers.
+        """
+        bulk = options['raw'] and 'raw' or options['batch_size'] or options['bulk']
+        root_path = options['root_path']
+        commit_every = options['commit_every']
+        pipeline = options['pipeline']
+
+        if options['workers'] > 1:
+            chunks = split_xml(path, root_path, options['chunk_size'], parser_options=mapping.parser_options)
+            return mapping.load_xml_chunks(chunks, root_path, bulk, commit_every, workers=options['workers'])
+        if options['stream']:
+            return mapping.load_xml_stream(path, root_path, bulk, commit_every, pipeline)
+        return mapping.load_xml_file(path, root_path, bulk, commit_every, pipeline)
+
+    def write_summary(self, path, stats):
+        """Writes the numbers and the time per stage of the load of a file."""
+        total = stats.wall.get('total', 0.0) or 1e-6
+        nb_elements, nb_objects = progress(stats)
+        self.stdout.write('%s loaded in %.3fs: %s elements (%.0f/s), %s objects (%.0f/s), %.1f MB RSS\n' % (
+            path, total, nb_elements, nb_elements / total, nb_objects, nb_objects / total, rss_mb()))
+        self.stdout.write('  time: %s\n' % (', '.join(
+            '%s %.3fs' % (stage, stats.wall[stage]) for stage in STAGES + ('blocked', 'idle') if stage in stats.wall),))
+        counts = stats.counts
+        for element_path, nb_found in sorted(stats.found.items()):
+            self.stdout.write('  %s: %s found, %s skipped, %s created, %s updated, %s unchanged\n' % (
+                element_path,
+                nb_found,
+                counts[SKIPPED][element_path],
+                counts[CREATED][element_path],
+                counts[UPDATED][element_path],
+                counts[UNCHANGED][element_path],
+            ))
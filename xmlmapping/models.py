@@ -1,3 +1,6 @@
+# Python stdlib
+import logging
+
 # Django
 from django.db import models
 
@@ -6,27 +9,70 @@ import jsonfield  # http://pypi.python.org/pypi/django-jsonfield/
 from lxml import etree  # http://lxml.de/
 
 # Internal
+from . import parallel
+from .digests import DigestIndex, element_digest
 from .log import default_logger as logger
-from .utils.introspection import ModelFactory
-from .utils.serializers import deserialize_function
-from .utils.xmlhelper import XMLHelper
-from .utils import sum_dicts
+from .parsers import get_parser, iterparse
+from .persistence import Pending, CREATED, UPDATED, UNCHANGED, get_writer
+from .pipeline import Pipeline
+from .plan import MappingPlan
+from .settings import LOG_VERBOSITY, PIPELINE_QUEUE_SIZE
+from .sources import SOURCE_ERRORS, open_source
+from .stats import LoadStats, SKIPPED, FAILED, clock, emit_stats, start_stats
+
+
+class LoadRun(object):
+    """The state of a load.
+
+    Attributes:
+        writer: the writer persisting the objects
+        stats: the LoadStats of the load
+        counts: the counters of the load, see LoadStats.counts
+        digests: the DigestIndex of the elements, None if no element-mapping skips the unchanged elements
+        log: the logger of the elements and objects mapped, None when they are not logged
+        last_trie: the (namespace mapping, root_path, PathTrie) of the last document mapped, reused by the next chunk
+    """
+
+    def __init__(self, writer, stats, digests=None, log=None):
+        self.writer = writer
+        self.stats = stats
+        self.counts = stats.counts
+        self.digests = digests
+        self.log = log
+        self.last_trie = None
+
 
 class Mapping(models.Model):
     """A mapping configuration."""
     data_map = jsonfield.JSONField(default='{}')  # need a default value
     label = models.CharField(max_length=255, unique=True)  # label for reference
+    parser_options = jsonfield.JSONField(default='{}', blank=True)  # options of the parsers updating the PARSER_OPTIONS setting
 
     def __unicode__(self):
         return u'%s' % (
             self.label,
         )
 
+    # The compiled data_map, see the plan property
+    _plan = None
+
     @property
     def log_desc(self):
         return u'<Mapping: %s>' % (self,)
 
-    def load_xml(self, xml, root_path=None):
+    @property
+    def plan(self):
+        """The data_map compiled into a MappingPlan. It is cached until the mapping is saved."""
+        if self._plan is None:
+            self._plan = MappingPlan.compile(self.data_map)
+        return self._plan
+
+    def save(self, *args, **kwargs):
+        super(Mapping, self).save(*args, **kwargs)
+        # The data_map may have changed
+        self._plan = None
+
+    def load_xml(self, xml, root_path=None, bulk=None, commit_every=None, pipeline=None):
         """Loads a piece of XML in the DB, i.e. map XML data to a Django Model.
 
         Args:
@@ -34,203 +80,562 @@ class Mapping(models.Model):
             root_path: the root (dotted path) of the XML data. Not mandatory but needed when the XML is not the root as defined in the mapping.
                 e.g. If you defined a mapping for rss.channel.item
                 and the XML you are passing actually starts with the channel element, you must then set root_path to rss.channel
+            bulk: whether the objects are inserted in batches with bulk_create.
+                The number of objects of a Model per batch, True for the BULK_BATCH_SIZE setting,
+                'raw' to insert the rows with executemany without instances (see RawWriter). Default: the BULK_CREATE setting.
+            commit_every: the number of elements to map between two commits. Each object is written in its own savepoint
+                so a bad element only rolls back its own queries. Default: each query is committed on its own.
+            pipeline: whether the XML is mapped in a separate thread while the objects are persisted.
+                The maximum number of objects waiting to be persisted, True for the PIPELINE_QUEUE_SIZE setting. Default: not pipelined.
 
         Returns:
-            A dict summarizing the number of objects created per element-mapping.
+            A LoadStats: the dict summarizing the number of objects created per element-mapping, with the statistics of the load.
+            When the XML cannot be parsed, the error is in its errors and nothing is loaded.
             #The number of created Models per "element-mapping"
         """
         log_desc = '%s - Loading XML' % (self.log_desc,)
+        start = clock()
 
+        run = self._new_run(bulk, commit_every)
+        start_stats(self, run.stats)
         try:
             # Parse the XML
-            root = etree.fromstring(xml, parser=etree.XMLParser())
+            root = etree.fromstring(xml, parser=get_parser(self.parser_options))
         except Exception as e:
             logger.error('%s => XML cannot be parsed. [KO]\n%s' % (log_desc, e))
-            return 0
-
-        nb_created = {k: 0 for k in self.data_map.keys()}
-        # For each element-mapping
-        for e_path, conf in self.data_map.iteritems():
-            nb_created[e_path] = nb_created[e_path] + self._map_elements_by_path(e_path, conf, root, root_path)
-
-        logger.info('%s => %s' % (log_desc, ' ; '.join(['%s: %s objects created' % (k, v) for (k, v) in nb_created.items()])))
-
-        return nb_created
-
-    def load_xml_chunks(self, xml_chunks, root_path):
+            run.stats.add_error(e)
+        else:
+            run.stats.count_bytes(len(xml))
+            run.stats.add_time('parse', start)
+            with run.writer:
+                self._produce(lambda r: self._load_root(root, root_path, r), run, pipeline, log_desc)
+                self._flush_run(run)
+        self._end_load(log_desc, run.stats, root_path, start)
+
+        return run.stats
+
+    def load_xml_chunks(self, xml_chunks, root_path, bulk=None, commit_every=None, workers=None, pipeline=None):
         """Loads a collection of XML chunks being all of the same kind.
 
         Args:
-            xml_chunks: a list of XML string data to load
+            xml_chunks: a list of XML string data to load, of FileRange reading the chunks from a local file,
+                or of parsed elements (see split_xml). The chunks are parsed with the same parser.
+                The workers are only sent the ranges and read them through a memory map of the file.
+                The elements are serialized to be sent to the workers.
             root_path: the root (dotted path) of the XML data. Not mandatory but needed when the XML is not the root as defined in the mapping.
                 e.g. If you defined a mapping for rss.channel.item
                 and the XML you are passing actually starts with the channel element, you must then set root_path to rss.channel
+            bulk: whether the objects are inserted in batches with bulk_create.
+                The number of objects of a Model per batch, True for the BULK_BATCH_SIZE setting,
+                'raw' to insert the rows with executemany without instances (see RawWriter). Default: the BULK_CREATE setting.
+                The batches are shared by all the chunks.
+            commit_every: the number of elements to map between two commits. Each object is written in its own savepoint
+                so a bad element only rolls back its own queries. The interval spans the chunks. Default: each query is committed on its own.
+            workers: the number of processes loading the chunks in parallel. Each worker loads a chunk on its own
+                with its own DB connection, so the batches and the commit interval do not span the chunks,
+                and the DB connection of the calling process is closed: it must not be in a transaction.
+                Default: the chunks are loaded one after another.
+            pipeline: whether the chunks are parsed and mapped in a separate thread while the objects are persisted.
+                The maximum number of objects waiting to be persisted, True for the PIPELINE_QUEUE_SIZE setting. Default: not pipelined.
+                It is not used with workers.
 
         Returns:
-            A dict summarizing the number of objects created per element-mapping.
+            A LoadStats: the dict summarizing the number of objects created per element-mapping, with the statistics of the load.
+            The times of the workers are summed. Its errors are the ones of the chunks which cannot be parsed.
             #The number of created Models per "element-mapping"
-
-        TODO: Make it more efficient instead of a simple loop.
         """
         log_desc = '%s - Loading XML chunks' % (self.log_desc,)
         logger.info('%s => start' % (log_desc,))
+        start = clock()
+
+        if workers > 1:
+            stats = parallel.load_chunks(self, xml_chunks, root_path, bulk, commit_every, workers, log_desc)
+        else:
+            run = self._new_run(bulk, commit_every)
+            stats = run.stats
+            start_stats(self, stats)
+            with run.writer:
+                self._produce(lambda r: self._load_chunks(xml_chunks, root_path, r, log_desc), run, pipeline, log_desc)
+                self._flush_run(run)
+        self._end_load(log_desc, stats, root_path, start)
+        logger.info('%s => end' % (log_desc,))
 
-        nb_created = {}
-        for xml in xml_chunks:
-            nb_created = sum_dicts(nb_created, self.load_xml(xml, root_path))
+        return stats
 
-        logger.info('%s => end' % (log_desc,))
+    def load_xml_file(self, source, root_path=None, bulk=None, commit_every=None, pipeline=None):
+        """Loads a XML file in the DB, like load_xml but without reading the file into a string first.
+
+        The file is read and parsed in blocks and decompressed on the fly when it is compressed with gzip, bz2 or xz
+        (xz requires the lzma module). The whole document is built in memory: see load_xml_stream for large files.
 
-        return nb_created
+        Args:
+            source: a file path or a file-like object
+            root_path: the root (dotted path) of the XML data. See load_xml.
+            bulk: whether the objects are inserted in batches with bulk_create.
+                The number of objects of a Model per batch, True for the BULK_BATCH_SIZE setting,
+                'raw' to insert the rows with executemany without instances (see RawWriter). Default: the BULK_CREATE setting.
+            commit_every: the number of elements to map between two commits. Each object is written in its own savepoint
+                so a bad element only rolls back its own queries. Default: each query is committed on its own.
+            pipeline: whether the XML is mapped in a separate thread while the objects are persisted.
+                The maximum number of objects waiting to be persisted, True for the PIPELINE_QUEUE_SIZE setting. Default: not pipelined.
 
-    def _map_elements_by_path(self, path, conf, node, node_path):
-        """Maps all the elements matching the path in the node with the mapping configuration.
+        Returns:
+            A LoadStats: the dict summarizing the number of objects created per element-mapping, with the statistics of the load.
+            When the file cannot be read or parsed, the error is in its errors and nothing is loaded.
+        """
+        log_desc = '%s - Loading XML file' % (self.log_desc,)
+        start = clock()
+
+        run = self._new_run(bulk, commit_every)
+        start_stats(self, run.stats)
+        try:
+            # Parse the XML
+            with open_source(source) as reader:
+                root = etree.parse(reader, parser=get_parser(self.parser_options)).getroot()
+        except Exception as e:
+            logger.error('%s => XML cannot be parsed. [KO]\n%s' % (log_desc, e))
+            run.stats.add_error(e)
+        else:
+            run.stats.count_bytes(reader.nb_bytes)
+            run.stats.add_time('parse', start)
+            with run.writer:
+                self._produce(lambda r: self._load_root(root, root_path, r), run, pipeline, log_desc)
+                self._flush_run(run)
+        self._end_load(log_desc, run.stats, root_path, start)
+
+        return run.stats
+
+    def load_xml_stream(self, source, root_path=None, bulk=None, commit_every=None, pipeline=None):
+        """Loads a XML file in the DB without building the whole document in memory.
+
+        The file is parsed incrementally: each element matching an element-mapping is mapped as soon as it is closed,
+        then it is cleared along with its previous siblings so the memory stays flat whatever the size of the file.
+        It is decompressed on the fly when it is compressed with gzip, bz2 or xz (xz requires the lzma module).
 
         Args:
-            path: the path of the elements to seek
-            conf: the mapping configuration
-            node: the node from which to seek
-            node_path: the path of the node
+            source: a file path or a file-like object
+            root_path: the root (dotted path) of the XML data. See load_xml.
+            bulk: whether the objects are inserted in batches with bulk_create.
+                The number of objects of a Model per batch, True for the BULK_BATCH_SIZE setting,
+                'raw' to insert the rows with executemany without instances (see RawWriter). Default: the BULK_CREATE setting.
+            commit_every: the number of elements to map between two commits. Each object is written in its own savepoint
+                so a bad element only rolls back its own queries. Default: each query is committed on its own.
+            pipeline: whether the file is parsed and mapped in a separate thread while the objects are persisted.
+                The maximum number of objects waiting to be persisted, True for the PIPELINE_QUEUE_SIZE setting. Default: not pipelined.
 
         Returns:
-            The number of Models created in the DB for all the found elements.
+            A LoadStats: the dict summarizing the number of objects created per element-mapping, with the statistics of the load.
+            When the file cannot be read or parsed up to its end, the error is in its errors
+            and the elements closed before it are loaded.
         """
-        # Get the configuration
-        get_id = conf.get('get_id', None)
-        models = conf.get('models', None)
-        if models is None:
-            logger.error('%s => No models found in the configuration. [KO]\nconfiguration=%s' % (log_desc, conf))
-            return 0
+        log_desc = '%s - Loading XML stream' % (self.log_desc,)
+        start = clock()
 
-        log_desc = '%s - Mapping all the elements matching path=%s to %s Models' % (self.log_desc, path, len(models))
+        run = self._new_run(bulk, commit_every)
+        start_stats(self, run.stats)
+        with run.writer:
+            self._produce(lambda r: self._stream(source, root_path, r, log_desc), run, pipeline, log_desc)
+            self._flush_run(run)
+        self._end_load(log_desc, run.stats, root_path, start)
 
-        # Get all the matching elements
-        elems = XMLHelper.get_elements(path, node, node_path)
+        return run.stats
+
+    def _stream(self, source, root_path, run, log_desc):
+        """Parses a XML file incrementally and maps the elements as soon as they are closed, see load_xml_stream.
+        The parsing is interleaved with the mapping: the time of the parse stage is the time spent out of the mapping.
+        """
+        stats = run.stats
+        found = stats.found
+        start = clock()
+        mapped = stats.stage_time('extract', 'save')
+        opened = []  # the position in the trie of each open element, None if no element-mapping is below
+        nb_open = 0  # the number of open elements being mapped
+
+        for event, elem in self._iterparse(source, stats, log_desc):
+            if event == 'start':
+                if opened:
+                    parent = opened[-1]
+                    trie = parent and parent.children.get(elem.tag)
+                else:
+                    trie = self._trie(elem, root_path)
+
+                opened.append(trie)
+                if trie and trie.plans:
+                    nb_open = nb_open + 1
+                continue
+
+            trie = opened.pop()
+            if trie and trie.plans:
+                nb_open = nb_open - 1
+                for element_plan in trie.plans:
+                    found[element_plan.path] = found[element_plan.path] + 1
+                    self._map_element(elem, element_plan, run)
+
+            # Free the memory unless an ancestor is still being mapped
+            if nb_open == 0:
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+
+        now = stats.stage_time('extract', 'save')
+        stats.add_time('parse', (start[0] + now[0] - mapped[0], start[1] + now[1] - mapped[1]))
+
+    def _iterparse(self, source, stats, log_desc):
+        """Yields the (event, element) of a XML file parsed incrementally, see _stream.
+        The events end when the file cannot be read or parsed further: the error is logged and recorded in stats.
+        The errors of the mapping are not raised here, they go through the caller.
+        """
+        reader = None
+        try:
+            with open_source(source) as reader:
+                for event in iterparse(reader, ('start', 'end'), self.parser_options):
+                    yield event
+        except (etree.XMLSyntaxError,) + SOURCE_ERRORS as e:
+            logger.error('%s => XML cannot be parsed. [KO]\n%s' % (log_desc, e))
+            stats.add_error(e)
+        finally:
+            if reader is not None:
+                stats.count_bytes(reader.nb_bytes)
+
+    def _produce(self, produce, run, pipeline, log_desc):
+        """Parses and maps the elements of a load, in a separate thread when the load is pipelined.
+
+        Args:
+            produce: a function taking a LoadRun, it parses and maps the elements
+            run: the LoadRun of the load
+            pipeline: whether the load is pipelined, True or the maximum number of objects waiting to be persisted
+            log_desc: the description of the load in the log
+        """
+        if not pipeline:
+            produce(run)
+            return
+
+        queue_size = PIPELINE_QUEUE_SIZE if pipeline is True else pipeline
+        stats = run.stats
+        timings = Pipeline(queue_size).run(
+            lambda writer: produce(LoadRun(writer, stats, run.digests, run.log)),
+            run.writer,
+            lambda results: self._record(results, run),
+        )
+        # The producer only timed the queueing of the objects: the save stage is the writer thread
+        stats.wall['save'] = timings['write']
+        stats.cpu['save'] = None
+        stats.wall['blocked'] = timings['blocked']
+        stats.wall['idle'] = timings['idle']
+        logger.info('%s => Pipeline: parsing and mapping %.3fs (blocked %.3fs), writing %.3fs (idle %.3fs)' % (
+                log_desc,
+                timings['produce'],
+                timings['blocked'],
+                timings['write'],
+                timings['idle'],
+            )
+        )
+
+    def _new_run(self, bulk=None, commit_every=None, digests=None, paths=None):
+        """Returns the LoadRun of a new load.
+
+        Args:
+            bulk: whether the objects are inserted in batches with bulk_create
+            commit_every: the number of elements to map between two commits
+            digests: the DigestIndex to reuse. Default: the digests are loaded from the DB if needed.
+            paths: the paths of the element-mappings to count. Default: all of them.
+        """
+        if digests is None:
+            digests = self._digest_index()
+        if paths is None:
+            paths = self.data_map.keys()
+        return LoadRun(get_writer(bulk, commit_every), LoadStats(paths), digests, self._elements_logger())
+
+    def _elements_logger(self):
+        """Returns the logger of the elements and objects mapped, None when they would not be logged:
+        the LOG_VERBOSITY is summary or the INFO level is disabled.
+        The logging.Logger is returned rather than the lazy logger to save the cost of the proxy.
+        """
+        if LOG_VERBOSITY == 'summary':
+            return None
+
+        log = logger.get_logger()
+        if not log.isEnabledFor(logging.INFO):
+            return None
+        return log
+
+    def _digest_index(self):
+        """Loads the digests of the elements of the element-mappings skipping their unchanged elements.
+
+        Returns:
+            A DigestIndex, None if no element-mapping skips the unchanged elements or the mapping is not saved.
+        """
+        paths = [e.path for e in self.plan.elements if e.skip_unchanged and e.models is not None]
+        if not paths or self.pk is None:
+            return None
+        return DigestIndex(ElementDigest, self, paths)
+
+    def _load_root(self, root, root_path, run):
+        """Maps all the element-mappings found in a parsed XML.
+
+        Args:
+            root: the root element of the XML
+            root_path: the root (dotted path) of the XML data
+            run: the LoadRun of the load
+        """
+        stats = run.stats
+        start = clock()
+        # The chunks of a load usually share their namespaces: the trie of the previous one is reused
+        nsmap = root.nsmap
+        last_trie = run.last_trie
+        if last_trie is not None and last_trie[0] == nsmap and last_trie[1] == root_path:
+            trie = last_trie[2]
+        else:
+            trie = self._trie(root, root_path)
+            run.last_trie = (nsmap, root_path, trie)
+
+        # Walk the tree once for all the element-mappings
+        matches = list(trie.walk(root))
+        stats.add_time('lookup', start)
+
+        found = stats.found
+        for elem, element_plan in matches:
+            found[element_plan.path] = found[element_plan.path] + 1
+            self._map_element(elem, element_plan, run)
+
+    def _trie(self, root, root_path=None):
+        """Returns the PathTrie of the element-mappings relative to the root element of a document
+        and logs the element-mappings which cannot be mapped.
+
+        Args:
+            root: the root element (only its tag and namespaces are needed)
+            root_path: the root (dotted path) of the XML data
+        """
+        trie = self.plan.trie(root.nsmap, root_path or root.tag)
+
+        for element_plan in self.plan.elements:
+            if element_plan.models is None:
+                logger.error('%s - Mapping all the elements matching path=%s => No models found in the configuration. [KO]\nconfiguration=%s' % (self.log_desc, element_plan.path, self.data_map[element_plan.path]))
+
+        for element_plan, err in trie.unresolved:
+            logger.error('%s - Mapping all the elements matching path=%s => Namespace prefix %s not defined in the XML. [KO]' % (self.log_desc, element_plan.path, err))
+
+        return trie
+
+    def _load_chunks(self, xml_chunks, root_path, run, log_desc):
+        """Parses and maps XML chunks with the same parser."""
+        parser = get_parser(self.parser_options)
+        for xml in xml_chunks:
+            self._load_chunk(xml, root_path, run, log_desc, parser)
+
+    def _load_chunk(self, xml, root_path, run, log_desc, parser=None):
+        """Parses and maps a XML chunk, a string, a FileRange or an element, logs and records an error if it cannot be parsed.
+
+        Args:
+            parser: the XMLParser to use. Default: the one of the thread for the parser_options.
+        """
+        start = clock()
+        if parser is None:
+            parser = get_parser(self.parser_options)
+        try:
+            # Parse the XML
+            if isinstance(xml, basestring):
+                root = etree.fromstring(xml, parser=parser)
+                nb_bytes = len(xml)
+            elif etree.iselement(xml):
+                root = xml
+                nb_bytes = 0
+            else:
+                with open_source(xml) as reader:
+                    root = etree.parse(reader, parser=parser).getroot()
+                nb_bytes = reader.nb_bytes
+        except Exception as e:
+            logger.error('%s => XML chunk cannot be parsed. [KO]\n%s' % (log_desc, e))
+            run.stats.add_error(e)
+            return
+
+        run.stats.count_bytes(nb_bytes)
+        run.stats.add_time('parse', start)
+        self._load_root(root, root_path, run)
+
+    def _flush_run(self, run):
+        """Persists the pending objects and the digests of the elements."""
+        start = clock()
+        self._record(run.writer.flush(), run)
+        if run.digests is not None:
+            run.digests.save(run.writer)
+        run.stats.add_time('save', start)
+
+    def _end_load(self, log_desc, stats, node_path, start):
+        """Ends the statistics of a load started at start, logs its summary and sends them to the sinks."""
+        stats.add_time('total', start)
+        self._log_load(log_desc, stats, node_path)
+        emit_stats(self, stats)
+
+    def _log_load(self, log_desc, stats, node_path):
+        """Logs the summary of a load."""
+        counts = stats.counts
+        for element_plan in self.plan.elements:
+            if element_plan.models is not None:
+                self._log_elements_mapped(element_plan.path, element_plan.models, counts, node_path)
+
+        logger.info('%s => %s' % (log_desc, ' ; '.join(['%s: %s objects created' % (k, v) for (k, v) in counts[CREATED].items()])))
+        logger.info('%s => Stats: %s bytes parsed, %s, total %.3fs (CPU %.3fs)' % (
+                log_desc,
+                stats.bytes_parsed,
+                ', '.join(['%s %.3fs' % (stage, stats.wall[stage]) for stage in ('parse', 'lookup', 'extract', 'save') if stage in stats.wall]),
+                stats.wall['total'],
+                stats.cpu['total'],
+            )
+        )
+
+    def _log_elements_mapped(self, path, models, counts, node_path):
+        """Logs the summary of the mapping of all the elements matching a path."""
+        log_desc = '%s - Mapping all the elements matching path=%s to %s Models' % (self.log_desc, path, len(models))
+        nb_elems = counts['found'][path]
 
         # Log if no elements were found.
-        if not elems:
+        if not nb_elems:
             logger.warning('%s => No elements found. node_path=%s' % (log_desc, node_path))
-            return 0
-
-        nb_created = 0
-        for elem in elems:
-            nb_created = nb_created + self._map_element(elem, models, get_id)
+            return
 
-        nb_elems = len(elems)
-        nb_targeted = nb_elems * len(models)
-        logger.info('%s => Found: %s, Targeted Objects: %s, Created Objects: %s %s' % (
+        nb_skipped = counts[SKIPPED][path]
+        nb_targeted = (nb_elems - nb_skipped) * len(models)
+        nb_created = counts[CREATED][path]
+        nb_existing = counts[UPDATED][path] + counts[UNCHANGED][path]
+        logger.info('%s => Found: %s, %sTargeted Objects: %s, Created Objects: %s%s %s' % (
                 log_desc,
                 nb_elems,
+                nb_skipped and 'Skipped Elements: %s, ' % (nb_skipped,) or '',
                 nb_targeted,
                 nb_created,
-                (nb_targeted == nb_created and ['[OK]'] or ['=> numbers different [KO]'])[0]
+                nb_existing and ', Updated Objects: %s, Unchanged Objects: %s' % (counts[UPDATED][path], counts[UNCHANGED][path]) or '',
+                (nb_targeted == nb_created + nb_existing and ['[OK]'] or ['=> numbers different [KO]'])[0]
             )
         )
 
-        return nb_created
-
-    def _map_element(self, element, models, get_id=None):
+    def _map_element(self, element, element_plan, run):
         """Maps an element to several models.
+        When the element-mapping skips the unchanged elements, an element having the same digest
+        as when it was last loaded is skipped.
 
         Args:
             element: an XML element
-            models: the models to mapped
-            get_id: the function to use to calculate the ID of the element to identify it amongst the other.
-
-        Returns:
-            The number of Models created in the DB for the passed element.
+            element_plan: the bound element-mapping defining the models to map
+                and the function to use to calculate the ID of the element to identify it amongst the other.
+            run: the LoadRun of the load
         """
-        elem_id = '(id:%s) ' % (self._resolve_get_id(get_id)(element),)
-
-        status = {k: '[KO]' for k in models.keys()}
-        nb_created = 0
-        for app_model, fields in models.iteritems():
+        models = element_plan.models
+        path = element_plan.path
+        writer = run.writer
+        raw = writer.raw
+        log = run.log
+        stats = run.stats
+        mark = clock()
+        id_value = element_plan.get_id(element)
+
+        digests = element_plan.skip_unchanged and run.digests or None
+        if digests is not None:
+            digest = element_digest(element)
+            if digests.is_unchanged(path, id_value, digest):
+                stats.add_time('extract', mark)
+                run.counts[SKIPPED][path] = run.counts[SKIPPED][path] + 1
+                if log is not None:
+                    log.info('%s - Element (id:%s) => unchanged since the last load, skipped', self.log_desc, id_value)
+                writer.element_done()
+                return
+            digests.set(path, id_value, digest)
+
+        # The texts of the children are collected in one pass for all the models
+        texts = element_plan.collect(element)
+        # The status of the element per model, only needed in the log
+        status = dict.fromkeys([m.app_model for m in models], '[KO]') if log is not None else None
+        for model_plan in models:
+            app_model = model_plan.app_model
             try:
-                ins = self._map_to_model(element, app_model, fields)
-                status[app_model] = 'pk=%s' % (ins.pk)
-                nb_created = nb_created + 1
-                logger.info('%s - Mapping the element %sto the Model %s with fields %s => object created, pk=%s [0K]' % (
-                        self.log_desc,
-                        elem_id,
-                        app_model,
-                        fields,
-                        ins.pk,
-                    )
-                )
+                if raw and model_plan.plan.row_columns is not None:
+                    ins = model_plan.row(element, texts)
+                else:
+                    ins = model_plan.create(element, id_value, texts)
+                relations = model_plan.relation_keys(element, id_value, texts)
             except Exception as err:
-                logger.error('%s - Mapping the element %sto the Model %s with fields %s => Cannot be mapped. [K0]\n%s' % (
-                        self.log_desc,
-                        elem_id,
-                        app_model,
-                        fields,
-                        err,
-                    )
-                )
+                mark = stats.add_time('extract', mark)
+                self._record(writer.fail(Pending(path, id_value, model_plan, None), err), run)
+                continue
+            mark = stats.add_time('extract', mark)
+
+            results = writer.add(Pending(path, id_value, model_plan, ins, relations))
+            self._record(results, run)
+            mark = stats.add_time('save', mark)
+            if status is None:
+                continue
+            if ins.pk is not None:
+                status[app_model] = 'pk=%s' % (ins.pk)
+            elif writer.batched:
+                status[app_model] = 'queued'
 
-        logger.info('%s - Element %smapped to %s Models => %s' % (
+        if log is not None:
+            log.info('%s - Element (id:%s) mapped to %s Models => %s',
                 self.log_desc,
-                elem_id,
+                id_value,
                 len(models),
                 ' ; '.join(['%s: %s' % (k, v) for (k, v) in status.items()]),
             )
-        )
 
-        return nb_created
-
-    def _map_to_model(self, element, app_model, fields):
-        """Maps an element to a Model.
-
-        Args:
-            element: the XML element to map
-            app_model: the model to map defined by: app_label.model_name
-            fields: the fields mapping
-
-        Returns:
-            The instance of the created Model.
-        """
-        ins = ModelFactory.create(app_model)
-        self._map_to_fields(element, ins, fields)
-        ins.save()
-        return ins
+        writer.element_done()
 
-    def _map_to_fields(self, element, ins, fields):
-        """Maps an element to the fields.
+    def _record(self, results, run):
+        """Counts and logs the objects persisted by a writer.
+        The digest of an element is discarded when one of its objects cannot be persisted.
 
         Args:
-            element: the XML element to map
-            ins: the instance of the created Model
-            fields: the fields mapping
+            results: a list of Result
+            run: the LoadRun of the load, its counters are updated
         """
-        for field, configuration in fields.items():
-            if isinstance(configuration, basestring):
-                setattr(ins, field, XMLHelper.get_text_unescape(element, configuration))
-
-            elif isinstance(configuration, list):
-                values = (XMLHelper.get_text_unescape(element, v) for v in configuration)
-                setattr(ins, field, ' '.join(values))
+        counts = run.counts
+        stats = run.stats
+        log = run.log
+        for pending, err, action in results:
+            if err is not None:
+                self._not_mapped(run, pending.path, pending.elem_id, pending.model_plan, err)
+                continue
+
+            counts[action][pending.path] = counts[action][pending.path] + 1
+            stats.count_object(pending.model_plan.app_model, action)
+            if log is not None:
+                log.info('%s - Mapping the element (id:%s) to the Model %s with fields %s => object %s, pk=%s [0K]',
+                    self.log_desc,
+                    pending.elem_id,
+                    pending.model_plan.app_model,
+                    pending.model_plan.conf,
+                    action,
+                    pending.ins.pk,
+                )
 
-            elif isinstance(configuration, dict):
-                pass  # TODO: handles advanced transformers
+    def _not_mapped(self, run, path, elem_id, model_plan, err):
+        """Counts and logs an object which cannot be mapped or persisted and discards the digest of its element."""
+        run.stats.count_object(model_plan.app_model, FAILED)
+        if run.digests is not None:
+            run.digests.discard(path, elem_id)
 
-    def _resolve_get_id(self, get_id):
-        """Resolves which function should be used to calculate the ID of an element.
+        logger.error('%s - Mapping the element (id:%s) to the Model %s with fields %s => Cannot be mapped. [K0]\n%s' % (
+                self.log_desc,
+                elem_id,
+                model_plan.app_model,
+                model_plan.conf,
+                err,
+            )
+        )
 
-        Args:
-            get_id: a function/method or a string to use an inner element.
 
-        Returns:
-            A function that will take an element and returns an ID.
-        """
-        # Try to deserialize it
-        try:
-            return deserialize_function(get_id)
-        except:
-            pass
+class ElementDigest(models.Model):
+    """The digest of the content of an element when it was last loaded by a mapping."""
+    mapping = models.ForeignKey(Mapping, related_name='digests')
+    path = models.CharField(max_length=255)  # path of the element-mapping
+    element_id = models.CharField(max_length=255)  # ID calculated by get_id
+    digest = models.CharField(max_length=32)  # MD5 of the serialized element
 
-        # Deserialization could not figure it out
-        # so let's assume it is a tag and we want to use the text of the element
-        if isinstance(get_id, basestring):
-            return lambda x: XMLHelper.get_text(x, get_id)
+    class Meta:
+        unique_together = (('mapping', 'path', 'element_id'),)
 
-        # Nothing works, returns the get_id
-        return lambda x: get_id
+    def __unicode__(self):
+        return u'%s %s (id:%s)' % (
+            self.mapping_id,
+            self.path,
+            self.element_id,
+        )
@@ -0,0 +1,157 @@
+# Python stdlib
+import logging
+import multiprocessing
+import sys
+
+# Django
+from django.db import connection, transaction
+
+# Third-party apps
+from lxml import etree  # http://lxml.de/
+
+# Internal
+from .log import default_logger
+from .parsers import get_parser
+from .persistence import HAS_ATOMIC
+from .plan import is_reachable
+from .settings import LOGGER_NAME
+from .stats import LoadStats, start_stats
+
+# The state of a worker process, set by init_worker
+_worker = {}
+
+
+class RecordCollector(logging.Handler):
+    """Collects the log records of a worker so they are emitted by the parent process in the order of the chunks."""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        # Make the record picklable: the message is formatted and the traceback turned into text
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        self.records.append(record)
+
+    def flush_records(self):
+        """Returns the collected records and forgets them."""
+        records = self.records
+        self.records = []
+        return records
+
+
+def init_worker(mapping_class, pk, label, data_map, parser_options, root_path, bulk, commit_every, log_desc):
+    """Initializes a worker process: its own DB connection, its log records collected, the mapping and its parser."""
+    # A connection inherited from the parent process must not be used, a new one is opened when needed
+    connection.close()
+
+    collector = RecordCollector()
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.handlers = [collector]
+    logger.propagate = False
+
+    mapping = mapping_class(pk=pk, label=label, data_map=data_map, parser_options=parser_options)
+    _worker.update(
+        mapping=mapping,
+        collector=collector,
+        digests=mapping._digest_index(),
+        options=(root_path, bulk, commit_every, log_desc),
+        parser=get_parser(mapping.parser_options),
+        # Only the element-mappings reachable from the root_path are counted per chunk
+        paths=[path for path in data_map if is_reachable(path, root_path)],
+        last_trie=None,
+    )
+
+
+def load_chunk(xml):
+    """Loads a XML chunk in a worker process.
+
+    Returns:
+        A tuple (LoadStats of the chunk, list of the log records).
+    """
+    mapping = _worker['mapping']
+    root_path, bulk, commit_every, log_desc = _worker['options']
+
+    run = mapping._new_run(bulk, commit_every, _worker['digests'], _worker['paths'])
+    run.last_trie = _worker['last_trie']
+    with run.writer:
+        mapping._load_chunk(xml, root_path, run, log_desc, _worker['parser'])
+        mapping._flush_run(run)
+    _worker['last_trie'] = run.last_trie
+
+    return run.stats, _worker['collector'].flush_records()
+
+
+def load_chunks(mapping, xml_chunks, root_path, bulk, commit_every, workers, log_desc):
+    """Loads XML chunks with a pool of worker processes, each worker loading a chunk on its own.
+    The log records of the workers are emitted by the calling process in the order of the chunks.
+
+    Args:
+        mapping: the Mapping to use
+        xml_chunks: an iterable of XML string data, FileRange or elements to load
+        root_path: the root (dotted path) of the XML data
+        bulk: whether the objects are inserted in batches with bulk_create
+        commit_every: the number of elements to map between two commits within a chunk
+        workers: the number of worker processes
+        log_desc: the description of the load in the log
+
+    Returns:
+        The LoadStats of the load, summed over the chunks.
+
+    Raises:
+        A TransactionManagementError if the DB connection is in a transaction: it is closed for the workers.
+        The error raised by xml_chunks, e.g. by split_xml when the file cannot be read or parsed,
+        once the chunks yielded before it are loaded.
+    """
+    stats = LoadStats(mapping.data_map.keys())
+    start_stats(mapping, stats)
+
+    # The connection must not be shared with the forked workers, it is opened again when needed.
+    # So the load must not be called within a transaction: its work would be lost.
+    if _in_transaction():
+        raise transaction.TransactionManagementError('The chunks cannot be loaded by workers within a transaction.')
+    connection.close()
+    pool = multiprocessing.Pool(
+        workers,
+        init_worker,
+        (type(mapping), mapping.pk, mapping.label, mapping.data_map, mapping.parser_options, root_path, bulk, commit_every, log_desc)
+    )
+    try:
+        errors = []
+        for chunk_stats, records in pool.imap(load_chunk, _picklable_chunks(xml_chunks, errors)):
+            for record in records:
+                default_logger.handle(record)
+            stats.merge(chunk_stats)
+        if errors:
+            raise errors[0][0], errors[0][1], errors[0][2]
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    return stats
+
+
+def _in_transaction():
+    """Returns whether the DB connection is in a transaction."""
+    if HAS_ATOMIC:
+        return connection.in_atomic_block
+    return transaction.is_managed() or transaction.is_dirty()
+
+
+def _picklable_chunks(xml_chunks, errors):
+    """Yields the chunks to send to the workers, the elements being serialized as they cannot be pickled.
+    The chunks are iterated by a thread of the pool which may lose an error: it is added to errors as an exc_info.
+    """
+    try:
+        for xml in xml_chunks:
+            yield etree.tostring(xml) if etree.iselement(xml) else xml
+    except Exception:
+        errors.append(sys.exc_info())
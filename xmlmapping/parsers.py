@@ -0,0 +1,69 @@
+# Python stdlib
+import threading
+from StringIO import StringIO
+
+# Third-party apps
+from lxml import etree  # http://lxml.de/
+
+# Internal
+from .log import default_logger as logger
+from .settings import PARSER_OPTIONS
+
+# The parsers of each thread per profile: a parser must not be used by two threads at once
+_local = threading.local()
+# Whether each (kind, option) is supported by the installed lxml, kind being parser or iterparse
+_supported = {}
+
+
+def _is_supported(kind, name, value):
+    """Tells whether an option is supported by the installed lxml, logs a warning the first time it is not."""
+    key = (kind, name)
+    supported = _supported.get(key)
+    if supported is None:
+        try:
+            if kind == 'parser':
+                etree.XMLParser(**{name: value})
+            else:
+                etree.iterparse(StringIO('<a/>'), **{name: value})
+            supported = True
+        except TypeError:
+            supported = False
+            logger.warning('Parser option %s => Not supported by lxml %s, ignored. [KO]' % (
+                name, '.'.join(str(v) for v in etree.LXML_VERSION)))
+        _supported[key] = supported
+    return supported
+
+
+def parser_options(options=None, kind='parser'):
+    """Returns the parser profile: the PARSER_OPTIONS setting updated with options,
+    without the options the installed lxml does not support.
+
+    Args:
+        options: a dict of keyword arguments of etree.XMLParser overriding the setting, e.g. {'huge_tree': True}
+        kind: parser for the options of etree.XMLParser, iterparse for the ones of etree.iterparse
+    """
+    profile = dict(PARSER_OPTIONS)
+    if options:
+        profile.update(options)
+    return dict((name, value) for name, value in profile.iteritems() if _is_supported(kind, name, value))
+
+
+def get_parser(options=None):
+    """Returns the XMLParser of the current thread for a parser profile, see parser_options.
+    The parsers are created once per thread and profile, then reused by the following loads.
+    """
+    profile = parser_options(options)
+    key = tuple(sorted(profile.items()))
+    parsers = getattr(_local, 'parsers', None)
+    if parsers is None:
+        parsers = _local.parsers = {}
+
+    parser = parsers.get(key)
+    if parser is None:
+        parser = parsers[key] = etree.XMLParser(**profile)
+    return parser
+
+
+def iterparse(source, events=('end',), options=None):
+    """Returns an etree.iterparse of a file-like object configured with a parser profile, see parser_options."""
+    return etree.iterparse(source, events=events, **parser_options(options, 'iterparse'))
@@ -0,0 +1,697 @@
+# Python stdlib
+from collections import namedtuple
+
+# Django
+from django.db import connections, router, transaction
+try:
+    from django.db.models import SubfieldBase
+except ImportError:
+    SubfieldBase = None  # removed in Django 1.10
+
+# Internal
+from .settings import BULK_CREATE, BULK_BATCH_SIZE, BULK_MEMORY_CAP, RELATION_CACHE_SIZE
+
+# Django >= 1.6 replaced the transaction management by atomic blocks
+HAS_ATOMIC = hasattr(transaction, 'atomic')
+
+# The maximum number of parameters of a query, the lowest default limit being SQLite's
+MAX_QUERY_PARAMS = 999
+
+
+class Pending(namedtuple('Pending', 'path elem_id model_plan ins relations')):
+    """An unsaved instance of a Model mapped from an element.
+
+    Attributes:
+        path: the path of the element-mapping
+        elem_id: the ID of the element calculated by get_id
+        model_plan: the bound element-model mapping
+        ins: the unsaved instance, None if it cannot be mapped
+        relations: a tuple of (BoundRelation, key) of the foreign keys to resolve, None if there are none
+    """
+
+    def __new__(cls, path, elem_id, model_plan, ins, relations=None):
+        return super(Pending, cls).__new__(cls, path, elem_id, model_plan, ins, relations)
+
+
+# The actions of a writer on an instance
+CREATED = 'created'
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+
+
+class Result(namedtuple('Result', 'pending error action')):
+    """The result of the persistence of an instance.
+
+    Attributes:
+        pending: the Pending instance
+        error: the exception raised, None if the instance has been persisted
+        action: CREATED, UPDATED or UNCHANGED when an existing object has been found with the id_field
+    """
+
+
+class _Rollback(Exception):
+    pass
+
+
+class RelationCache(object):
+    """The primary keys of the related objects by key, for the relations of the instances of a load.
+
+    The keys of a batch of instances missing from the cache are looked up with one query per related Model
+    and key field, instead of one query per instance. The objects persisted with an id_field are added to the cache
+    once one of their keys has been looked up, so the siblings saved one by one are not looked up again.
+    The cache is cleared when it is full.
+    """
+
+    def __init__(self, max_size=RELATION_CACHE_SIZE, using=None):
+        self.max_size = max_size
+        self.using = using
+        self.pks = {}  # (Model class, key field) -> dict of the primary keys by key
+        self.size = 0
+
+    def resolve(self, batch):
+        """Sets the foreign keys of a batch of instances to the primary keys of their related objects.
+
+        Args:
+            batch: a list of Pending
+
+        Returns:
+            A tuple (list of Result of the instances whose related objects cannot be found, list of the resolved Pending).
+        """
+        if self.size >= self.max_size:
+            self.pks.clear()
+            self.size = 0
+
+        pks = self.pks
+        missing = {}
+        for pending in batch:
+            for relation, key in pending.relations or ():
+                target = (relation.model_class, relation.key)
+                if key not in pks.get(target, ()):
+                    missing.setdefault(target, set()).add(key)
+
+        errors = {}
+        for target, keys in missing.iteritems():
+            model_class, key_field = target
+            manager = model_class._default_manager.db_manager(self.using)
+            try:
+                found = manager.filter(**{'%s__in' % key_field: keys}).values_list(key_field, 'pk')
+                self.add(target, found)
+            except Exception as err:
+                errors[target] = err
+
+        failed = []
+        resolved = []
+        for pending in batch:
+            err = None
+            for relation, key in pending.relations or ():
+                target = (relation.model_class, relation.key)
+                pk = pks.get(target, {}).get(key)
+                if pk is None:
+                    err = errors.get(target) or relation.model_class.DoesNotExist(
+                        '%s matching %s=%r not found' % (relation.model_class.__name__, relation.key, key))
+                    break
+                setattr(pending.ins, relation.attname, pk)
+
+            if err is None:
+                resolved.append(pending)
+            else:
+                failed.append(Result(pending, err, None))
+
+        return failed, resolved
+
+    def add(self, target, items):
+        """Adds the (key, primary key) of the objects of a related Model and key field to the cache."""
+        pks = self.pks.setdefault(target, {})
+        nb_pks = len(pks)
+        pks.update(items)
+        self.size = self.size + len(pks) - nb_pks
+
+    def remember(self, results):
+        """Adds the objects persisted with an id_field to the cache, when their id_field is a key already looked up."""
+        pks = self.pks
+        if not pks:
+            return
+        for pending, err, action in results:
+            id_field = pending.model_plan.id_field
+            if err is not None or id_field is None or pending.ins.pk is None:
+                continue
+            target = (type(pending.ins), id_field)
+            if target in pks:
+                self.add(target, [(getattr(pending.ins, id_field), pending.ins.pk)])
+
+
+def get_writer(bulk=None, commit_every=None):
+    """Returns the writer to use to persist the instances.
+
+    Args:
+        bulk: whether the instances are inserted in batches.
+            The number of instances of a Model per batch, True for the BULK_BATCH_SIZE setting,
+            'raw' to insert the rows with executemany (see RawWriter). Default: the BULK_CREATE setting.
+        commit_every: the number of elements to map between two commits. Default: each query is committed on its own.
+    """
+    if bulk is None:
+        bulk = BULK_CREATE
+
+    if bulk == 'raw':
+        return RawWriter(commit_every=commit_every)
+    if bulk is True:
+        return BulkWriter(commit_every=commit_every)
+    if bulk:
+        return BulkWriter(batch_size=bulk, commit_every=commit_every)
+    return SaveWriter(commit_every=commit_every)
+
+
+class Writer(object):
+    """Base class of the writers.
+
+    A writer returns the results of the instances it persisted as a list of Result.
+    The instances of a Model having an id_field are upserted: the existing objects are looked up by batch,
+    only the changed ones are updated and the others are created.
+
+    The foreign keys of the relations are resolved before the instances are persisted, see RelationCache.
+
+    It must be used as a context manager. When commit_every is set, the whole load runs in a transaction
+    committed every commit_every elements, each write being protected by a savepoint so a bad element
+    only rolls back its own queries. Otherwise each query is committed on its own.
+    """
+    batched = False
+    # Whether the objects which need no instance are added as Row, see RawWriter
+    raw = False
+
+    def __init__(self, commit_every=None, using=None):
+        self.commit_every = commit_every
+        self.using = using
+        self.nb_elements = 0
+        self.relations = RelationCache(using=using)
+        self._atomic = None
+
+    def __enter__(self):
+        if self.commit_every:
+            self._begin()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.commit_every:
+            self._end(commit=exc_type is None)
+
+    def add(self, pending):
+        """Adds an instance to persist.
+
+        Returns:
+            A list of Result, the results of the instances persisted in the meantime.
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """Persists the pending instances.
+
+        Returns:
+            A list of Result.
+        """
+        return []
+
+    def fail(self, pending, err):
+        """Reports an instance which cannot be mapped, so it is counted with the results of the writer.
+
+        Returns:
+            A list of Result, the failure of the instance.
+        """
+        return [Result(pending, err, None)]
+
+    def element_done(self):
+        """Notifies that an element has been mapped. It commits the transaction every commit_every elements."""
+        self.nb_elements = self.nb_elements + 1
+        if self.commit_every and self.nb_elements % self.commit_every == 0:
+            self._end(commit=True)
+            self._begin()
+
+    def _begin(self):
+        if HAS_ATOMIC:
+            self._atomic = transaction.atomic(using=self.using)
+            self._atomic.__enter__()
+        else:
+            transaction.enter_transaction_management(using=self.using)
+            transaction.managed(True, using=self.using)
+
+    def _end(self, commit):
+        if HAS_ATOMIC:
+            if commit:
+                self._atomic.__exit__(None, None, None)
+            else:
+                self._atomic.__exit__(_Rollback, _Rollback(), None)
+            self._atomic = None
+        else:
+            if commit:
+                transaction.commit(using=self.using)
+            else:
+                transaction.rollback(using=self.using)
+            transaction.leave_transaction_management(using=self.using)
+
+    def in_transaction(self):
+        if HAS_ATOMIC:
+            return transaction.get_connection(using=self.using).in_atomic_block
+        return transaction.is_managed(using=self.using)
+
+    def savepoint(self):
+        """Creates a savepoint when in a transaction, otherwise each query is committed on its own."""
+        if self.in_transaction():
+            return transaction.savepoint(using=self.using)
+        return None
+
+    def rollback(self, sid):
+        if sid is not None:
+            if HAS_ATOMIC:
+                # The failed query marked the atomic block for rollback: rolling back the savepoint is enough
+                transaction.set_rollback(False, using=self.using)
+            transaction.savepoint_rollback(sid, using=self.using)
+        elif not HAS_ATOMIC:
+            transaction.rollback_unless_managed(using=self.using)
+
+    def commit(self, sid):
+        if sid is not None:
+            transaction.savepoint_commit(sid, using=self.using)
+
+    def save(self, pending):
+        """Saves one instance in its own savepoint.
+
+        Returns:
+            A Result.
+        """
+        sid = self.savepoint()
+        try:
+            pending.ins.save(using=self.using)
+        except Exception as err:
+            self.rollback(sid)
+            return Result(pending, err, CREATED)
+
+        self.commit(sid)
+        return Result(pending, None, CREATED)
+
+    def update(self, pending, values):
+        """Updates the values of an existing object in its own savepoint.
+
+        Returns:
+            A Result.
+        """
+        ins = pending.ins
+        sid = self.savepoint()
+        try:
+            type(ins)._default_manager.db_manager(self.using).filter(pk=ins.pk).update(**values)
+        except Exception as err:
+            self.rollback(sid)
+            return Result(pending, err, UPDATED)
+
+        self.commit(sid)
+        return Result(pending, None, UPDATED)
+
+    def update_batch(self, model_class, changed):
+        """Updates the changed values of existing objects with one query per batch of objects,
+        each column being set with a CASE on the primary key. When the query fails, the objects are updated
+        one by one to find the ones failing.
+
+        Args:
+            model_class: the Model of the objects
+            changed: a list of (Pending, dict of the changed values by attname) of distinct objects
+
+        Returns:
+            A list of Result.
+        """
+        if len(changed) < 2:
+            return [self.update(pending, values) for (pending, values) in changed]
+
+        connection = connections[self.using or router.db_for_write(model_class)]
+        qn = connection.ops.quote_name
+        meta = model_class._meta
+        pk = meta.pk
+        attnames = set()
+        for pending, values in changed:
+            attnames.update(values)
+        fields = [field for field in meta.fields if field.attname in attnames]
+        # 2 parameters per object and field at most, and the primary keys
+        per_query = max(1, MAX_QUERY_PARAMS // (2 * len(fields) + 1))
+
+        results = []
+        for i in xrange(0, len(changed), per_query):
+            part = changed[i:i + per_query]
+            sid = self.savepoint()
+            try:
+                pks = [pk.get_db_prep_value(pending.ins.pk, connection=connection) for (pending, values) in part]
+                params = []
+                columns = []
+                for field in fields:
+                    cases = []
+                    for (pending, values), pk_value in zip(part, pks):
+                        if field.attname in values:
+                            cases.append('WHEN %s THEN %s')
+                            params.append(pk_value)
+                            params.append(field.get_db_prep_save(values[field.attname], connection=connection))
+                    columns.append('%s = CASE %s %s ELSE %s END' % (qn(field.column), qn(pk.column), ' '.join(cases), qn(field.column)))
+                params.extend(pks)
+
+                connection.cursor().execute('UPDATE %s SET %s WHERE %s IN (%s)' % (
+                    qn(meta.db_table),
+                    ', '.join(columns),
+                    qn(pk.column),
+                    ', '.join(['%s'] * len(pks)),
+                ), params)
+            except Exception:
+                self.rollback(sid)
+                results.extend([self.update(pending, values) for (pending, values) in part])
+                continue
+
+            self.commit(sid)
+            if not HAS_ATOMIC:
+                transaction.commit_unless_managed(using=self.using)
+            results.extend([Result(pending, None, UPDATED) for (pending, values) in part])
+        return results
+
+    def upsert_existing(self, model_class, batch):
+        """Looks up the existing objects of a batch of instances with one query on their id_field,
+        updates the changed ones in batches (see update_batch) and skips the unchanged ones.
+        When several instances of the batch have the same ID, the last one wins: the previous ones are not persisted
+        and are reported as unchanged, so each object is counted once.
+
+        Args:
+            model_class: the Model of the instances
+            batch: a list of Pending of the same Model and id_field
+
+        Returns:
+            A tuple (list of Result of the existing objects, list of Pending to create).
+        """
+        id_field = batch[0].model_plan.id_field
+        manager = model_class._default_manager.db_manager(self.using)
+        try:
+            # Compare the values as they are stored in the DB
+            meta = model_class._meta
+            fields = [meta.get_field(name) for name in batch[0].model_plan.field_names]
+            for pending in batch:
+                for field in fields:
+                    setattr(pending.ins, field.attname, field.to_python(getattr(pending.ins, field.attname)))
+
+            keys = set(getattr(p.ins, id_field) for p in batch)
+            existing = dict((getattr(obj, id_field), obj) for obj in manager.filter(**{'%s__in' % id_field: keys}))
+        except Exception as err:
+            return [Result(p, err, None) for p in batch], []
+
+        results = []
+        new = []  # the Pending to create
+        new_index = {}  # ID -> index in new
+        changed = []  # the (Pending, changed values) to update
+        changed_index = {}  # ID -> index in changed
+        for pending in batch:
+            ins = pending.ins
+            key = getattr(ins, id_field)
+            obj = existing.get(key)
+            if obj is None:
+                if key in new_index:
+                    # Superseded in the batch
+                    results.append(Result(new[new_index[key]], None, UNCHANGED))
+                    new[new_index[key]] = pending
+                else:
+                    new_index[key] = len(new)
+                    new.append(pending)
+                continue
+
+            ins.pk = obj.pk
+            values = {}
+            for field in fields:
+                value = getattr(ins, field.attname)
+                if getattr(obj, field.attname) != value:
+                    values[field.attname] = value
+
+            if not values:
+                results.append(Result(pending, None, UNCHANGED))
+            elif key in changed_index:
+                # Superseded in the batch
+                results.append(Result(changed[changed_index[key]][0], None, UNCHANGED))
+                changed[changed_index[key]] = (pending, values)
+            else:
+                changed_index[key] = len(changed)
+                changed.append((pending, values))
+
+        results.extend(self.update_batch(model_class, changed))
+        return results, new
+
+
+class SaveWriter(Writer):
+    """Saves each instance as soon as it is added."""
+
+    def add(self, pending):
+        if pending.relations:
+            failed, resolved = self.relations.resolve([pending])
+            if failed:
+                return failed
+
+        if pending.model_plan.id_field is None:
+            return [self.save(pending)]
+
+        results, new = self.upsert_existing(type(pending.ins), [pending])
+        results = results + [self.save(p) for p in new]
+        self.relations.remember(results)
+        return results
+
+
+class BulkWriter(Writer):
+    """Collects the instances per Model and inserts them in batches with bulk_create.
+
+    A batch is flushed when it reaches batch_size instances, all the batches are flushed
+    when the estimated size of the pending values reaches memory_cap.
+    When a batch cannot be inserted, its instances are saved one by one to find the ones failing.
+    With an id_field, the existing objects of a batch are looked up with one query.
+    The batches of the siblings referenced by the relations of a batch are flushed before it.
+    """
+    batched = True
+
+    def __init__(self, batch_size=BULK_BATCH_SIZE, memory_cap=BULK_MEMORY_CAP, commit_every=None, using=None):
+        super(BulkWriter, self).__init__(commit_every, using)
+        self.batch_size = batch_size
+        self.memory_cap = memory_cap
+        self.batches = {}  # Model class -> list of Pending
+        self.sizes = {}  # Model class -> estimated size of the pending values
+        self.size = 0
+
+    def add(self, pending):
+        key = self.batch_key(pending)
+        batch = self.batches.setdefault(key, [])
+        batch.append(pending)
+
+        size = self.estimate_size(pending.ins)
+        self.sizes[key] = self.sizes.get(key, 0) + size
+        self.size = self.size + size
+
+        if self.size >= self.memory_cap:
+            return self.flush()
+        if len(batch) >= self.batch_size:
+            return self.flush_batch(key)
+        return []
+
+    def batch_key(self, pending):
+        """Returns the key of the batch of an instance: the instances are batched per Model and id_field."""
+        return (type(pending.ins), pending.model_plan.id_field)
+
+    def flush(self):
+        results = []
+        for key in self.batches.keys():
+            results.extend(self.flush_batch(key))
+        return results
+
+    def flush_batch(self, key):
+        """Persists the pending instances of a Model and id_field."""
+        batch = self.batches.pop(key, [])
+        self.size = self.size - self.sizes.pop(key, 0)
+        if not batch:
+            return []
+
+        model_class, id_field = key
+        flushed = []
+        results = []
+        if any(p.relations for p in batch):
+            # The related objects mapped from the same elements must be persisted first
+            targets = set(relation.model_class for p in batch for (relation, k) in p.relations or ())
+            for other_key in self.batches.keys():
+                if other_key[0] in targets:
+                    flushed.extend(self.flush_batch(other_key))
+            results, batch = self.relations.resolve(batch)
+            if not batch:
+                return flushed + results
+
+        if id_field is not None:
+            existing, batch = self.upsert_existing(model_class, batch)
+            self.relations.remember(existing)
+            results = results + existing
+            if not batch:
+                return flushed + results
+
+        sid = self.savepoint()
+        try:
+            model_class._default_manager.db_manager(self.using).bulk_create([p.ins for p in batch], batch_size=self.batch_size)
+        except Exception:
+            self.rollback(sid)
+            saved = self.save_each(batch)
+            self.relations.remember(saved)
+            return flushed + results + saved
+
+        self.commit(sid)
+        return flushed + results + [Result(p, None, CREATED) for p in batch]
+
+    def save_each(self, batch):
+        """Saves the instances one by one to report which ones fail."""
+        return [self.save(pending) for pending in batch]
+
+    @staticmethod
+    def estimate_size(ins):
+        """Estimates the size of the values of an instance, i.e. the length of its strings."""
+        return sum(len(v) for v in ins.__dict__.itervalues() if isinstance(v, basestring))
+
+
+class RawWriter(BulkWriter):
+    """Inserts the objects which need no instance as rows with executemany, bypassing the Models:
+    no save(), no signals and no pre_save. The objects are added as Row (see row_columns), their SQL statement
+    and the converters of their values are prepared once per Model and mapped fields.
+    The other objects (upserted with an id_field or having relations) are persisted like with the BulkWriter.
+    When a batch of rows cannot be inserted, the rows are inserted one by one to find the ones failing.
+    In a transaction on a DB without savepoints (SQLite before Django 1.6), the rows inserted before a failing one
+    could not be rolled back: the rows are then always inserted one by one.
+    """
+    raw = True
+
+    def __init__(self, batch_size=BULK_BATCH_SIZE, memory_cap=BULK_MEMORY_CAP, commit_every=None, using=None):
+        super(RawWriter, self).__init__(batch_size, memory_cap, commit_every, using)
+        self.statements = {}  # (Model class, columns, DB alias) -> (SQL, function converting a Row to the values to insert)
+
+    def batch_key(self, pending):
+        """Returns the key of the batch of an object: the rows are batched per Model and columns."""
+        columns = pending.model_plan.plan.row_columns
+        if columns is None:
+            return super(RawWriter, self).batch_key(pending)
+        return (pending.model_plan.plan.model_class, columns)
+
+    def flush_batch(self, key):
+        model_class, columns = key
+        if not isinstance(columns, tuple):
+            return super(RawWriter, self).flush_batch(key)
+
+        batch = self.batches.pop(key, [])
+        self.size = self.size - self.sizes.pop(key, 0)
+        if not batch:
+            return []
+
+        connection = connections[self.using or router.db_for_write(model_class)]
+        sql, prepare = self.statement(model_class, columns, connection)
+        results = []
+        rows = []
+        inserted = []
+        for pending in batch:
+            try:
+                rows.append(prepare(pending.ins))
+            except Exception as err:
+                results.append(Result(pending, err, CREATED))
+                continue
+            inserted.append(pending)
+
+        cursor = connection.cursor()
+        if self.in_transaction() and not connection.features.uses_savepoints:
+            return results + self.insert_each(cursor, sql, inserted, rows)
+        try:
+            self.insert_all(cursor, sql, rows)
+        except Exception:
+            return results + self.insert_each(cursor, sql, inserted, rows)
+
+        return results + [Result(p, None, CREATED) for p in inserted]
+
+    def insert_all(self, cursor, sql, rows):
+        """Inserts the rows with executemany, all of them or none."""
+        if HAS_ATOMIC:
+            # In autocommit mode there is no savepoint: the rows inserted before a failing one would stay
+            with transaction.atomic(using=self.using):
+                cursor.executemany(sql, rows)
+            return
+
+        sid = self.savepoint()
+        try:
+            cursor.executemany(sql, rows)
+        except Exception:
+            # Out of a transaction, the queries not committed yet are rolled back
+            self.rollback(sid)
+            raise
+        self.commit(sid)
+        self.commit_unless_managed()
+
+    def insert_each(self, cursor, sql, batch, rows):
+        """Inserts the rows one by one to report which ones fail."""
+        results = []
+        for pending, row in zip(batch, rows):
+            sid = self.savepoint()
+            try:
+                cursor.execute(sql, row)
+            except Exception as err:
+                self.rollback(sid)
+                results.append(Result(pending, err, CREATED))
+                continue
+            self.commit(sid)
+            self.commit_unless_managed()
+            results.append(Result(pending, None, CREATED))
+        return results
+
+    def commit_unless_managed(self):
+        """Commits the queries of the cursor when each query is committed on its own (Django < 1.6)."""
+        if not HAS_ATOMIC:
+            transaction.commit_unless_managed(using=self.using)
+
+    def statement(self, model_class, columns, connection):
+        """Returns the SQL statement inserting the rows of a Model and the function converting a Row
+        to the values of the statement. They are prepared once.
+
+        Args:
+            model_class: the Model class
+            columns: the columns of the rows, see row_columns
+            connection: the DB connection
+
+        Returns:
+            A tuple (SQL, function taking a Row and returning the list of values).
+        """
+        key = (model_class, columns, connection.alias)
+        statement = self.statements.get(key)
+        if statement is not None:
+            return statement
+
+        qn = connection.ops.quote_name
+        sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+            qn(model_class._meta.db_table),
+            ', '.join([qn(field.column) for (field, position) in columns]),
+            ', '.join(['%s'] * len(columns)),
+        )
+
+        def converter(field):
+            """Returns the function converting a value to the value inserted, like assigning it to an instance saved then."""
+            prep = field.get_db_prep_save
+            if SubfieldBase is not None and isinstance(type(field), SubfieldBase):
+                # The fields of a SubfieldBase convert the values assigned to the instances
+                to_python = field.to_python
+                return lambda value: prep(to_python(value), connection=connection)
+            return lambda value: prep(value, connection=connection)
+
+        # The values of the columns not mapped are the same for all the rows
+        defaults = [
+            converter(field)(field.get_default()) if position is None else None
+            for (field, position) in columns
+        ]
+        converters = tuple(
+            (i, position, converter(field))
+            for (i, (field, position)) in enumerate(columns) if position is not None
+        )
+
+        def prepare(row):
+            values = list(defaults)
+            for i, position, convert in converters:
+                values[i] = convert(row[position])
+            return values
+
+        statement = self.statements[key] = (sql, prepare)
+        return statement
+
+    @staticmethod
+    def estimate_size(ins):
+        if isinstance(ins, tuple):
+            return sum(len(v) for v in ins if isinstance(v, basestring))
+        return BulkWriter.estimate_size(ins)
@@ -0,0 +1,131 @@
+# Python stdlib
+import sys
+import threading
+import time
+from Queue import Queue, Empty
+
+# Internal
+from .persistence import Result, Writer
+from .settings import PIPELINE_QUEUE_SIZE
+
+# The markers put in the queue along with the Pending
+_ELEMENT_DONE = object()
+_END = object()
+
+
+class PipelineStopped(Exception):
+    """Raised in the producer thread when the writer stage has failed."""
+    pass
+
+
+class QueueWriter(Writer):
+    """The writer of the producer stage: it puts the instances in a bounded queue to be persisted by the writer stage.
+    The producer blocks while the queue is full.
+    """
+    batched = True
+
+    def __init__(self, queue, raw=False):
+        super(QueueWriter, self).__init__()
+        self.queue = queue
+        self.raw = raw
+        self.stopped = False
+        self.blocked = 0.0  # the time spent waiting for room in the queue
+
+    def add(self, pending):
+        self._put(pending)
+        return []
+
+    def fail(self, pending, err):
+        # Counted by the writer stage, the stats are only updated in its thread
+        self._put(Result(pending, err, None))
+        return []
+
+    def element_done(self):
+        self._put(_ELEMENT_DONE)
+
+    def _put(self, item):
+        if self.stopped:
+            raise PipelineStopped()
+        start = time.time()
+        self.queue.put(item)
+        self.blocked = self.blocked + time.time() - start
+
+
+class Pipeline(object):
+    """Runs the parsing and the mapping of a load in a producer thread while the calling thread persists the objects.
+
+    The stages are connected by a queue of at most queue_size items, so the producer cannot outrun the DB.
+    The DB writes stay in the calling thread which owns the DB connection and the transaction.
+    """
+
+    def __init__(self, queue_size=PIPELINE_QUEUE_SIZE):
+        self.queue_size = queue_size
+
+    def run(self, produce, writer, record):
+        """Runs the pipeline until the producer is done.
+
+        Args:
+            produce: a function taking a QueueWriter, it parses and maps the elements
+            writer: the writer persisting the objects in the calling thread
+            record: a function taking the list of Result returned by the writer
+
+        Returns:
+            A dict of the time spent in seconds per stage: produce (parsing and mapping), blocked (producer waiting
+            for room in the queue), write (persisting and recording) and idle (writer waiting for objects).
+
+        Raises:
+            The exception raised by the producer or the writer.
+        """
+        queue = Queue(self.queue_size)
+        producer_writer = QueueWriter(queue, writer.raw)
+        timings = dict.fromkeys(('produce', 'blocked', 'write', 'idle'), 0.0)
+        errors = []
+
+        def producer():
+            start = time.time()
+            try:
+                produce(producer_writer)
+            except PipelineStopped:
+                pass
+            except:
+                errors.append(sys.exc_info())
+            finally:
+                timings['produce'] = time.time() - start
+                queue.put(_END)
+
+        thread = threading.Thread(target=producer, name='xmlmapping-producer')
+        thread.daemon = True
+        thread.start()
+
+        try:
+            while True:
+                start = time.time()
+                item = queue.get()
+                now = time.time()
+                timings['idle'] = timings['idle'] + now - start
+                if item is _END:
+                    break
+
+                if item is _ELEMENT_DONE:
+                    writer.element_done()
+                elif isinstance(item, Result):
+                    record([item])
+                else:
+                    record(writer.add(item))
+                timings['write'] = timings['write'] + time.time() - now
+        except:
+            # Unblock the producer so it stops
+            producer_writer.stopped = True
+            while thread.is_alive():
+                try:
+                    queue.get(timeout=0.1)
+                except Empty:
+                    pass
+            raise
+
+        thread.join()
+        timings['blocked'] = producer_writer.blocked
+        if errors:
+            exc_type, exc_value, traceback = errors[0]
+            raise exc_type, exc_value, traceback
+        return timings
@@ -0,0 +1,740 @@
+# Python stdlib
+import re
+from collections import namedtuple
+
+# Internal
+from .transformers import TransformError, compile_transform
+from .utils import html
+from .utils.introspection import ModelFactory, ModelDoesNotExist
+from .utils.serializers import deserialize_function
+from .utils.xmlhelper import XMLHelper, ElementNotFound
+
+# A tag (with its namespace URI) matching the children of an element, and nothing else in XPath
+CHILD_TAG_PATTERN = re.compile(r'^(\{[^}]*\})?[A-Za-z_][\w-]*$')
+
+
+def is_reachable(path, node_path):
+    """Tells whether the elements of an element-mapping can be found from a node.
+    A path below the node is reachable, as well as a path which does not start at the root of the document
+    (it is then relative to the node). A path starting at the root but not below the node is not.
+
+    Args:
+        path: the dotted path of the element-mapping
+        node_path: the dotted path of the node, None for the root of the document
+    """
+    if not node_path or path == node_path or path.startswith(node_path + '.'):
+        return True
+    return path.split('.', 1)[0] != node_path.split('.', 1)[0]
+
+
+def resolve_get_id(get_id, nsmap):
+    """Resolves which function should be used to calculate the ID of an element.
+
+    Args:
+        get_id: a function/method or a string to use an inner element.
+        nsmap: the namespace mapping to use when get_id is an inner element
+
+    Returns:
+        A function that will take an element and returns an ID.
+    """
+    # Try to deserialize it
+    try:
+        return deserialize_function(get_id)
+    except:
+        pass
+
+    # Deserialization could not figure it out
+    # so let's assume it is a tag and we want to use the text of the element
+    if isinstance(get_id, basestring):
+        try:
+            return XMLHelper.text_finder(get_id, nsmap, unescape=False)
+        except Exception as err:
+            return _raiser(err)
+
+    # Nothing works, returns the get_id
+    return lambda x: get_id
+
+
+def _raiser(err):
+    """Returns a function raising the error whatever the element, used to defer a compilation error to the mapping."""
+    def raise_error(element, *args):
+        raise err
+    return raise_error
+
+
+def child_tag(tag, nsmap):
+    """Returns the tag of the children of an element matching a dotted path, None if the path is not a child tag.
+
+    Args:
+        tag: the dotted path of an inner element
+        nsmap: the namespace mapping to use
+    """
+    tags = XMLHelper.to_tags(tag, nsmap)
+    if len(tags) != 1 or not CHILD_TAG_PATTERN.match(tags[0]):
+        return None
+    try:
+        # lxml returns the ASCII tags as str: they are compared faster with str
+        return tags[0].encode('ascii')
+    except UnicodeError:
+        return tags[0]
+
+
+def init_row(model_class, names):
+    """Returns the positional arguments creating an instance of a Model with the default values of its fields,
+    and the position of each of the mapped fields in them. Creating the instances from positional arguments
+    skips the handling of the keyword arguments and of the default values in Model.__init__.
+
+    Args:
+        model_class: the Model class
+        names: the names of the mapped fields
+
+    Returns:
+        A tuple (tuple of the default values, dict of the positions by name), None if a field has a callable default
+        or a name is not the attname of a field: the instances are then created empty and their fields set one by one.
+    """
+    fields = model_class._meta.fields
+    positions = {}
+    for i, field in enumerate(fields):
+        if field.has_default() and callable(field.default):
+            return None
+        positions[field.attname] = i
+
+    if any(name not in positions for name in names):
+        return None
+    return tuple(field.get_default() for field in fields), dict((name, positions[name]) for name in names)
+
+
+def row_columns(model_class, names):
+    """Returns the columns of the rows of a Model inserted without creating instances (see RawWriter)
+    and the position of the values of the mapped fields in the rows.
+
+    Args:
+        model_class: the Model class
+        names: the names of the mapped fields, in the order of the values of the rows
+
+    Returns:
+        A tuple of (field, position of its value in the rows or None if the column takes the default value of the field),
+        None if the rows cannot be inserted without instances: the Model inherits from another one, a field has a callable
+        default or is set when the instances are saved (auto_now, auto_now_add), or a name is not the attname of a field.
+    """
+    meta = model_class._meta
+    if meta.parents:
+        return None
+
+    positions = dict((name, i) for (i, name) in enumerate(names))
+    columns = []
+    for field in meta.local_fields:
+        if field is meta.auto_field:
+            continue
+        if (field.has_default() and callable(field.default)) or getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            return None
+        columns.append((field, positions.pop(field.attname, None)))
+
+    if positions:
+        return None
+    return tuple(columns)
+
+
+class Row(tuple):
+    """The values of the mapped fields of an object inserted without creating an instance, see row_columns.
+    Like an unsaved instance, it has no primary key.
+    """
+    __slots__ = ()
+    pk = None
+
+
+def collect_texts(element, tags):
+    """Returns the text of the first child of an element for each tag, in one pass over the children.
+    Testing the tags in Python is cheaper than filtering the children with iterchildren(*tags).
+
+    Args:
+        element: an XML element
+        tags: a frozenset of the tags of the children, see child_tag
+
+    Returns:
+        A dict of the texts by tag, without the tags not found.
+    """
+    texts = {}
+    if not tags:
+        return texts
+    for child in element:
+        tag = child.tag
+        if tag in tags and tag not in texts:
+            texts[tag] = child.text or ''
+    return texts
+
+
+def _text_getter(tag, nsmap):
+    """Returns a function getting the unescaped text of an inner element from an element and its collected texts,
+    like XMLHelper.text_finder. The texts of the children are taken from the collected texts (see collect_texts),
+    the other inner elements are looked up in the element.
+
+    Returns:
+        A tuple (function, tag of the child or None).
+    """
+    # The texts of a field often repeat, e.g. prices or codes
+    unescape = html.memoized_unescape()
+    child = child_tag(tag, nsmap)
+    if child is None:
+        find = XMLHelper.text_finder(tag, nsmap, unescape=False)
+        return (lambda element, texts: unescape(find(element))), None
+
+    err_msg = '%s (path=%s) not found in the element' % (tag, XMLHelper.to_xpath(tag, nsmap))
+
+    def get_text(element, texts):
+        text = texts.get(child)
+        if text is None:
+            raise ElementNotFound(err_msg)
+        return unescape(text)
+
+    return get_text, child
+
+
+class FieldPlan(namedtuple('FieldPlan', 'name tags is_list transform')):
+    """A compiled field mapping.
+
+    Attributes:
+        name: the name of the model field
+        tags: a tuple of the dotted paths of the inner elements to use
+        is_list: whether the values of the inner elements are joined with a space
+        transform: the function transforming the value, see compile_transform. None if the value is the text.
+    """
+
+    def __new__(cls, name, tags, is_list, transform=None):
+        return super(FieldPlan, cls).__new__(cls, name, tags, is_list, transform)
+
+    @classmethod
+    def compile(cls, name, conf):
+        """Compiles a field mapping defined by a dict: the tag (or list of tags) of the inner elements
+        and the transformers of the value, e.g. {"tag": "price", "transform": [{"regex": "([0-9.]+)"}, "decimal"]}.
+        An invalid configuration fails the mapping of the field.
+        """
+        tags = conf.get('tag', None)
+        is_list = isinstance(tags, list)
+        tags = tuple(tags) if is_list else ((tags,) if tags is not None else ())
+
+        transform = None
+        if conf.get('transform', None):
+            try:
+                transform = compile_transform(conf['transform'])
+            except TransformError as err:
+                transform = _raiser(err)
+
+        return cls(name, tags, is_list, transform)
+
+    def bind(self, nsmap):
+        """Returns a function that extracts the value of the field from an element and the collected texts
+        of its children, and the tags of the children it needs.
+
+        Returns:
+            A tuple (function, tuple of tags), see collect_texts.
+        """
+        try:
+            if not self.tags:
+                raise TransformError('No tag defined for the field %s' % (self.name,))
+            getters = [_text_getter(tag, nsmap) for tag in self.tags]
+        except Exception as err:
+            return _raiser(err), ()
+
+        tags = tuple(child for (getter, child) in getters if child is not None)
+        if not self.is_list:
+            extract = getters[0][0]
+        else:
+            getters = tuple(getter for (getter, child) in getters)
+            join = ' '.join
+            extract = lambda element, texts: join([get(element, texts) for get in getters])
+
+        transform = self.transform
+        if transform is None:
+            return extract, tags
+        return (lambda element, texts: transform(extract(element, texts))), tags
+
+
+class RelationPlan(namedtuple('RelationPlan', 'name app_model key value')):
+    """A compiled relation of a foreign key to another Model. The related objects are identified by a key
+    (a natural key or their id_field) and the writer resolves the keys to their primary keys, see RelationCache.
+
+    Attributes:
+        name: the name of the foreign key field
+        app_model: the related model defined by app_label.model_name
+        key: the field of the related Model identifying its objects, None if it cannot be determined
+        value: the FieldPlan of the value of the key, None for a sibling: the related object is then mapped
+            from the same element and its key is the ID of the element
+    """
+
+    @property
+    def is_sibling(self):
+        return self.value is None
+
+    @classmethod
+    def compile(cls, name, conf, siblings):
+        """Compiles a relation defined by a dict, either to the object of another model mapped from the same element
+        ({"sibling": "app_label.Model"}, the model requires an id_field) or to an existing object looked up by the value
+        of a key field ({"related": "app_label.Model", "key": "field", "tag": ..., "transform": ...}).
+
+        Args:
+            name: the name of the foreign key field
+            conf: the configuration of the field
+            siblings: the id_field of the models mapped from the same element by app_model
+        """
+        if 'sibling' in conf:
+            return cls(name, conf['sibling'], siblings.get(conf['sibling'], None), None)
+        return cls(name, conf['related'], conf.get('key', None), FieldPlan.compile(name, conf))
+
+    def bind(self, model_class, nsmap):
+        """Returns the BoundRelation of the relation for the instances of a Model.
+        An invalid relation fails the mapping of the instances.
+        """
+        try:
+            if self.key is None:
+                if self.is_sibling:
+                    raise ValueError('The sibling %s of the field %s is not mapped or has no id_field' % (self.app_model, self.name))
+                raise ValueError('No key defined for the field %s' % (self.name,))
+
+            attname = self.name
+            if model_class is not None:
+                attname = model_class._meta.get_field(self.name).attname
+            related_class = ModelFactory.get_model_class(self.app_model)
+            to_python = related_class._meta.get_field(self.key).to_python
+        except Exception as err:
+            return BoundRelation(self.name, None, self.key, _raiser(err), ())
+
+        if self.is_sibling:
+            return BoundRelation(attname, related_class, self.key, lambda element, texts, elem_id: to_python(elem_id), ())
+
+        extract, tags = self.value.bind(nsmap)
+        return BoundRelation(attname, related_class, self.key, lambda element, texts, elem_id: to_python(extract(element, texts)), tags)
+
+
+class BoundRelation(namedtuple('BoundRelation', 'attname model_class key extract tags')):
+    """A relation ready to be run on the elements of a document.
+
+    Attributes:
+        attname: the attribute of the instances storing the primary key of the related object
+        model_class: the related Model class
+        key: the field of the related Model identifying its objects
+        extract: a function taking an element, the collected texts of its children and its ID, returning the key
+        tags: the tags of the children whose texts are collected, see collect_texts
+    """
+
+
+def order_models(model_plans):
+    """Orders the models of an element-mapping so that the siblings referenced by a relation come before the models
+    referencing them: they are then persisted first.
+
+    Args:
+        model_plans: a tuple of ModelPlan
+
+    Returns:
+        A tuple of ModelPlan.
+    """
+    by_model = dict((m.app_model, m) for m in model_plans)
+    ordered = []
+    visited = set()
+
+    def visit(model_plan):
+        if model_plan.app_model in visited:
+            return
+        visited.add(model_plan.app_model)
+        for relation in model_plan.relations:
+            if relation.is_sibling and relation.app_model in by_model:
+                visit(by_model[relation.app_model])
+        ordered.append(model_plan)
+
+    for model_plan in model_plans:
+        visit(model_plan)
+    return tuple(ordered)
+
+
+class ModelPlan(namedtuple('ModelPlan', 'app_model model_class fields conf id_field init_row relations row_columns')):
+    """A compiled element-model mapping.
+
+    Attributes:
+        app_model: the model defined by app_label.model_name
+        model_class: the resolved Model class, None if it does not exist
+        fields: a tuple of FieldPlan
+        conf: the fields mapping as defined in the data_map
+        id_field: the field storing the ID of the element and used to look up the existing objects, None if not defined
+        init_row: the positional arguments of the instances and the positions of the fields, see init_row.
+            None if the Model does not exist or its instances cannot be created from positional arguments.
+        relations: a tuple of RelationPlan, the foreign keys resolved by the writer
+        row_columns: the columns of the rows inserted without instances, see row_columns. None if the objects
+            need instances: the Model does not exist, the objects are upserted with an id_field or have relations.
+    """
+
+    def __new__(cls, app_model, model_class, fields, conf, id_field, init_row=None, relations=(), row_columns=None):
+        return super(ModelPlan, cls).__new__(cls, app_model, model_class, fields, conf, id_field, init_row, relations, row_columns)
+
+    @classmethod
+    def compile(cls, app_model, conf, id_field=None, siblings=None):
+        """Compiles an element-model mapping.
+
+        Args:
+            app_model: the model defined by app_label.model_name
+            conf: the fields mapping
+            id_field: the field storing the ID of the element
+            siblings: the id_field of the models mapped from the same element by app_model, see RelationPlan
+        """
+        try:
+            model_class = ModelFactory.get_model_class(app_model)
+        except ModelDoesNotExist:
+            model_class = None
+
+        fields = []
+        relations = []
+        for field, configuration in conf.items():
+            if isinstance(configuration, basestring):
+                fields.append(FieldPlan(field, (configuration,), False))
+
+            elif isinstance(configuration, list):
+                fields.append(FieldPlan(field, tuple(configuration), True))
+
+            elif isinstance(configuration, dict) and ('sibling' in configuration or 'related' in configuration):
+                relations.append(RelationPlan.compile(field, configuration, siblings or {}))
+
+            elif isinstance(configuration, dict):
+                fields.append(FieldPlan.compile(field, configuration))
+
+        row = None
+        columns = None
+        if model_class is not None:
+            row = init_row(model_class, [f.name for f in fields] + ([id_field] if id_field is not None else []))
+            if id_field is None and not relations:
+                columns = row_columns(model_class, [f.name for f in fields])
+
+        return cls(app_model, model_class, tuple(fields), conf, id_field, row, tuple(relations), columns)
+
+    def bind(self, nsmap):
+        extractors = []
+        tags = []
+        for field in self.fields:
+            extract, field_tags = field.bind(nsmap)
+            extractors.append((field.name, extract))
+            tags.extend(field_tags)
+
+        relations = tuple(relation.bind(self.model_class, nsmap) for relation in self.relations)
+        for relation in relations:
+            tags.extend(relation.tags)
+        return BoundModelPlan(self, tuple(extractors), frozenset(tags), relations)
+
+
+class BoundModelPlan(namedtuple('BoundModelPlan', 'plan extractors tags relations')):
+    """An element-model mapping ready to be run on the elements of a document.
+
+    Attributes:
+        plan: the ModelPlan
+        extractors: a tuple of (field name, function taking an element and the collected texts of its children)
+        tags: the tags of the children whose texts are collected, see collect_texts
+        relations: a tuple of BoundRelation
+    """
+
+    def __new__(cls, plan, extractors, tags, relations=()):
+        return super(BoundModelPlan, cls).__new__(cls, plan, extractors, tags, relations)
+
+    @property
+    def app_model(self):
+        return self.plan.app_model
+
+    @property
+    def conf(self):
+        return self.plan.conf
+
+    @property
+    def id_field(self):
+        return self.plan.id_field
+
+    @property
+    def field_names(self):
+        """The names of the mapped fields, including the id_field and the foreign keys of the relations."""
+        names = [name for (name, extract) in self.extractors]
+        if self.plan.id_field is not None:
+            names.append(self.plan.id_field)
+        names.extend(relation.name for relation in self.plan.relations)
+        return names
+
+    def extract(self, element, texts=None):
+        """Extracts the values of the fields from an element.
+
+        Args:
+            element: the XML element to map
+            texts: the collected texts of the children of the element. Default: they are collected.
+
+        Returns:
+            A dict of the values by field name.
+
+        Raises:
+            An ElementNotFound exception when an inner element cannot be found in the element.
+        """
+        if texts is None:
+            texts = collect_texts(element, self.tags)
+        return dict((name, extract(element, texts)) for (name, extract) in self.extractors)
+
+    def create(self, element, elem_id=None, texts=None):
+        """Creates an instance of the Model with the values of the element.
+
+        Args:
+            element: the XML element to map
+            elem_id: the ID of the element, set to the id_field if it is defined
+            texts: the collected texts of the children of the element. Default: they are collected.
+
+        Returns:
+            An object. The returned object has not been saved in the DB yet.
+
+        Raises:
+            A ModelDoesNotExist if the Model cannot be found.
+        """
+        plan = self.plan
+        model_class = plan.model_class or ModelFactory.get_model_class(plan.app_model)
+        if texts is None:
+            texts = collect_texts(element, self.tags)
+
+        if plan.init_row is not None:
+            defaults, positions = plan.init_row
+            row = list(defaults)
+            for name, extract in self.extractors:
+                row[positions[name]] = extract(element, texts)
+            if plan.id_field is not None:
+                row[positions[plan.id_field]] = elem_id
+            return model_class(*row)
+
+        ins = model_class()
+        for name, extract in self.extractors:
+            setattr(ins, name, extract(element, texts))
+        if plan.id_field is not None:
+            setattr(ins, plan.id_field, elem_id)
+        return ins
+
+    def row(self, element, texts=None):
+        """Extracts the values of the fields from an element in a Row, in the order of the fields of the plan.
+
+        Args:
+            element: the XML element to map
+            texts: the collected texts of the children of the element. Default: they are collected.
+
+        Returns:
+            A Row, see row_columns for its columns.
+        """
+        if texts is None:
+            texts = collect_texts(element, self.tags)
+        return Row([extract(element, texts) for (name, extract) in self.extractors])
+
+    def relation_keys(self, element, elem_id=None, texts=None):
+        """Extracts the keys of the related objects of an element, resolved to their primary keys by the writer.
+
+        Args:
+            element: the XML element to map
+            elem_id: the ID of the element, the key of the siblings
+            texts: the collected texts of the children of the element. Default: they are collected.
+
+        Returns:
+            A tuple of (BoundRelation, key), None if the Model has no relations.
+        """
+        if not self.relations:
+            return None
+        if texts is None:
+            texts = collect_texts(element, self.tags)
+        return tuple((relation, relation.extract(element, texts, elem_id)) for relation in self.relations)
+
+
+class ElementPlan(namedtuple('ElementPlan', 'path get_id models skip_unchanged')):
+    """A compiled element-mapping.
+
+    Attributes:
+        path: the dotted path of the elements
+        get_id: the get_id as defined in the data_map
+        models: a tuple of ModelPlan, None if no models are defined
+        skip_unchanged: whether the elements unchanged since the last load are skipped, it requires a get_id
+    """
+
+    @classmethod
+    def compile(cls, path, conf):
+        models = conf.get('models', None)
+        if models is not None:
+            # The id_field is either the same field for all the models or defined per model
+            id_field = conf.get('id_field', None)
+            if not isinstance(id_field, dict):
+                id_field = dict.fromkeys(models.keys(), id_field)
+
+            models = order_models(tuple(
+                ModelPlan.compile(app_model, fields, id_field.get(app_model, None), id_field)
+                for (app_model, fields) in models.iteritems()
+            ))
+
+        get_id = conf.get('get_id', None)
+        return cls(path, get_id, models, bool(conf.get('skip_unchanged', False)) and get_id is not None)
+
+    def bind(self, nsmap):
+        models = self.models
+        if models is not None:
+            models = tuple(m.bind(nsmap) for m in models)
+
+        tags = frozenset()
+        if models is not None:
+            tags = frozenset(tag for m in models for tag in m.tags)
+
+        return BoundElementPlan(self.path, resolve_get_id(self.get_id, nsmap), models, self.skip_unchanged, tags)
+
+
+class BoundElementPlan(namedtuple('BoundElementPlan', 'path get_id models skip_unchanged tags')):
+    """An element-mapping ready to be run on the elements of a document.
+
+    Attributes:
+        tags: the tags of the children whose texts are collected once for all the models, see collect_texts
+    """
+
+    def collect(self, element):
+        """Returns the texts of the children of an element needed by the models, see collect_texts."""
+        return collect_texts(element, self.tags)
+
+
+class PathTrie(object):
+    """The bound element-mappings of a document arranged in a trie of tags relative to a node.
+
+    Walking the trie visits only the elements on the path of an element-mapping, once,
+    whatever the number of element-mappings.
+
+    Attributes:
+        plans: the BoundElementPlan of the elements at this position
+        children: the sub-tries by tag
+        unresolved: a list of (BoundElementPlan, error) of the paths which cannot be resolved, only set on the root
+    """
+    __slots__ = ('plans', 'children', 'unresolved')
+
+    def __init__(self):
+        self.plans = []
+        self.children = {}
+        self.unresolved = []
+
+    @classmethod
+    def build(cls, element_plans, nsmap, node_path):
+        """Builds the trie of element-mappings.
+        Element-mappings without models or not reachable from the node are left out.
+
+        Args:
+            element_plans: the BoundElementPlan
+            nsmap: the namespace mapping of the document
+            node_path: the dotted path of the node from which the trie is walked
+
+        Returns:
+            The root PathTrie, matching the node itself.
+        """
+        root = cls()
+        for element_plan in element_plans:
+            if element_plan.models is None or not is_reachable(element_plan.path, node_path):
+                continue
+
+            try:
+                tags = XMLHelper.to_tags(XMLHelper.relative_path(element_plan.path, node_path), nsmap)
+            except KeyError as err:
+                # A namespace prefix is not defined in the document
+                root.unresolved.append((element_plan, err))
+                continue
+
+            trie = root
+            for tag in tags:
+                child = trie.children.get(tag)
+                if child is None:
+                    child = trie.children[tag] = cls()
+                trie = child
+            trie.plans.append(element_plan)
+
+        return root
+
+    def walk(self, node):
+        """Finds the elements matching the element-mappings from a node.
+
+        Args:
+            node: the node matching the root of the trie
+
+        Returns:
+            An iterator of (element, BoundElementPlan) in document order.
+        """
+        for element_plan in self.plans:
+            yield node, element_plan
+
+        children = self.children
+        if not children:
+            return
+
+        if len(children) == 1:
+            # Let lxml filter the children
+            tag, trie = children.items()[0]
+            for child in node.iterchildren(tag):
+                if trie.children:
+                    for match in trie.walk(child):
+                        yield match
+                else:
+                    for element_plan in trie.plans:
+                        yield child, element_plan
+            return
+
+        for child in node:
+            trie = children.get(child.tag)
+            if trie is None:
+                continue
+            if trie.children:
+                for match in trie.walk(child):
+                    yield match
+            else:
+                for element_plan in trie.plans:
+                    yield child, element_plan
+
+
+class MappingPlan(object):
+    """A data_map compiled once to be run on many elements.
+
+    The namespace prefixes used in the data_map can only be resolved against a document,
+    so the plan is bound to the namespace mapping of each document and the bound plans are cached.
+    """
+    # Maximum number of bound plans to keep
+    MAX_BOUND = 32
+
+    def __init__(self, elements):
+        self.elements = elements
+        self._bound = {}
+        self._tries = {}
+
+    @classmethod
+    def compile(cls, data_map):
+        """Compiles a data_map.
+
+        Args:
+            data_map: the mapping configuration
+
+        Returns:
+            A MappingPlan.
+        """
+        return cls(tuple(ElementPlan.compile(path, conf) for (path, conf) in data_map.iteritems()))
+
+    def bind(self, nsmap):
+        """Binds the plan to a namespace mapping.
+
+        Args:
+            nsmap: the namespace mapping of the document
+
+        Returns:
+            A tuple of BoundElementPlan.
+        """
+        key = frozenset(nsmap.iteritems())
+        bound = self._bound.get(key)
+        if bound is None:
+            if len(self._bound) >= self.MAX_BOUND:
+                self._bound.clear()
+            bound = self._bound[key] = tuple(e.bind(nsmap) for e in self.elements)
+        return bound
+
+    def trie(self, nsmap, node_path):
+        """Returns the PathTrie of the element-mappings bound to a namespace mapping, relative to a node.
+        The tries are cached.
+
+        Args:
+            nsmap: the namespace mapping of the document
+            node_path: the dotted path of the node from which the trie is walked
+        """
+        key = (frozenset(nsmap.iteritems()), node_path)
+        trie = self._tries.get(key)
+        if trie is None:
+            if len(self._tries) >= self.MAX_BOUND:
+                self._tries.clear()
+            trie = self._tries[key] = PathTrie.build(self.bind(nsmap), nsmap, node_path)
+        return trie
@@ -17,6 +17,53 @@ DEFAULT_SETTINGS = {
     # Maximum size of one log file: when the size is reached, the file is archived and a new file is created.
     'LOG_SIZE': 5 * 1024 * 2 ** 10,  # 5 MB
     'LOG_LEVEL': logging.INFO,
+    # What a load logs at the INFO level: each element and object mapped (elements) or only the summary (summary).
+    # The errors are always logged.
+    'LOG_VERBOSITY': 'elements',
+    # Maximum number of records waiting to be written by the default file handler running in a background thread,
+    # 0 to write them in the thread logging.
+    'LOG_QUEUE_SIZE': 0,
+    # What logging does when the queue is full: wait for room (block) or drop the record (drop), the drops are counted in the log.
+    'LOG_QUEUE_FULL': 'block',
+
+    # Parsing settings
+    # Number of bytes read at once from the files loaded with load_xml_file and load_xml_stream, before they are decompressed.
+    'READ_BLOCK_SIZE': 64 * 2 ** 10,  # 64 KB
+    # Read the local files through a memory map instead of reading them with system calls.
+    'MMAP_FILES': True,
+    # Keyword arguments of the lxml parsers (etree.XMLParser and etree.iterparse), updated by the parser_options of each Mapping.
+    # The options not supported by the installed lxml are ignored. huge_tree lifts the limits of libxml2 on deep or large documents.
+    'PARSER_OPTIONS': {
+        'remove_blank_text': True,
+        'remove_comments': True,
+        'remove_pis': True,
+        'resolve_entities': False,
+        'load_dtd': False,
+        'no_network': True,
+        'collect_ids': False,
+        'huge_tree': False,
+    },
+
+    # Persistence settings
+    # Insert the objects in batches with bulk_create instead of saving them one by one.
+    'BULK_CREATE': False,
+    # Number of objects of a Model inserted per batch.
+    'BULK_BATCH_SIZE': 500,
+    # Maximum size of the pending values: when the size is reached, all the batches are inserted.
+    'BULK_MEMORY_CAP': 16 * 2 ** 20,  # 16 MB
+    # Maximum number of primary keys of related objects cached by a load: when the size is reached, the cache is cleared.
+    'RELATION_CACHE_SIZE': 100000,
+    # Maximum number of objects waiting in the queue between the parsing and the writing stages of a pipelined load.
+    'PIPELINE_QUEUE_SIZE': 1000,
+
+    # Statistics settings
+    # Dotted paths of the classes (or functions) creating the sinks the statistics of each load are sent to,
+    # e.g. xmlmapping.stats.StatsdSink.
+    'STATS_SINKS': (),
+    # Address of the statsd server and prefix of the metrics of the StatsdSink.
+    'STATSD_HOST': 'localhost',
+    'STATSD_PORT': 8125,
+    'STATSD_PREFIX': 'xmlmapping',
 }
 
 # Get the user settings to update the default settings.
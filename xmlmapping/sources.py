@@ -0,0 +1,186 @@
+# Python stdlib
+import bz2
+import mmap
+import zlib
+from collections import namedtuple
+from contextlib import contextmanager
+
+# Third-party apps
+try:
+    import lzma  # Python 3.3+
+except ImportError:
+    try:
+        from backports import lzma  # http://pypi.python.org/pypi/backports.lzma/
+    except ImportError:
+        lzma = None
+
+# Internal
+from .settings import MMAP_FILES, READ_BLOCK_SIZE
+
+
+class UnsupportedCompression(Exception):
+    pass
+
+
+# The errors raised when a source cannot be read: missing file, corrupted or unsupported compression
+SOURCE_ERRORS = (EnvironmentError, zlib.error, UnsupportedCompression) + ((lzma.LZMAError,) if lzma is not None else ())
+
+
+def _gzip_decompressor():
+    # 16 + MAX_WBITS: a gzip header and trailer are expected
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+
+def _xz_decompressor():
+    if lzma is None:
+        raise UnsupportedCompression('The source is compressed with xz: the lzma module (or backports.lzma) is required.')
+    return lzma.LZMADecompressor()
+
+
+# The compressions recognized by the magic number at the start of the source
+COMPRESSIONS = (
+    ('gzip', '\x1f\x8b', _gzip_decompressor),
+    ('bz2', 'BZh', bz2.BZ2Decompressor),
+    ('xz', '\xfd7zXZ\x00', _xz_decompressor),
+)
+
+
+class FileRange(namedtuple('FileRange', 'path start stop')):
+    """A range of bytes of a local file, e.g. a chunk of a large file to be loaded by load_xml_chunks.
+    It is read through a memory map: the worker processes loading the ranges of a file share its pages
+    in the page cache, and only the range is sent to them instead of the XML.
+
+    Attributes:
+        path: the path of the file
+        start: the offset of the first byte of the range
+        stop: the offset after the last byte of the range
+    """
+
+
+class MappedRange(object):
+    """A file-like object reading a range of a memory map (or of a string), a slice at a time."""
+
+    def __init__(self, data, start=0, stop=None):
+        self.data = data
+        self.pos = start
+        self.stop = len(data) if stop is None else min(stop, len(data))
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            end = self.stop
+        else:
+            end = min(self.pos + size, self.stop)
+        data = self.data[self.pos:end]
+        self.pos = end
+        return data
+
+
+def _map_file(f):
+    """Returns a read-only memory map of an open file, None if it cannot be mapped, e.g. an empty file or a pipe."""
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, EnvironmentError):
+        return None
+
+
+class SourceReader(object):
+    """A file-like object reading a XML source in blocks and decompressing it on the fly
+    when it is compressed with gzip, bz2 or xz, so the source is never held in memory as a whole.
+
+    Attributes:
+        compression: the name of the compression of the source, None if it is not compressed
+        nb_bytes: the number of (decompressed) bytes read so far
+    """
+
+    def __init__(self, fileobj, block_size=READ_BLOCK_SIZE):
+        self.fileobj = fileobj
+        self.block_size = block_size
+        self.compression = None
+        self.nb_bytes = 0
+
+        head = fileobj.read(block_size)
+        new_decompressor = None
+        for compression, magic, factory in COMPRESSIONS:
+            if head.startswith(magic):
+                self.compression = compression
+                new_decompressor = factory
+                break
+
+        self._blocks = self._iter_blocks(head, new_decompressor)
+        self._buffer = ''
+        self._pos = 0
+
+    def _iter_blocks(self, raw, new_decompressor):
+        """Yields the blocks of the source, decompressed."""
+        decompressor = new_decompressor and new_decompressor()
+        while raw:
+            if decompressor is None:
+                yield raw
+            else:
+                try:
+                    data = decompressor.decompress(raw)
+                except EOFError:
+                    # bz2 and xz: the previous stream ended with the previous block
+                    decompressor = new_decompressor()
+                    data = decompressor.decompress(raw)
+                # A compressed file may be made of several streams, e.g. concatenated gzip files
+                while decompressor.unused_data:
+                    unused = decompressor.unused_data
+                    decompressor = new_decompressor()
+                    data = data + decompressor.decompress(unused)
+                if data:
+                    yield data
+            raw = self.fileobj.read(self.block_size)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self._buffer[self._pos:] + ''.join(self._blocks)
+            self._buffer = ''
+            self._pos = 0
+        else:
+            if self._pos >= len(self._buffer):
+                self._buffer = next(self._blocks, '')
+                self._pos = 0
+            data = self._buffer[self._pos:self._pos + size]
+            self._pos = self._pos + len(data)
+
+        self.nb_bytes = self.nb_bytes + len(data)
+        return data
+
+
+@contextmanager
+def open_source(source, block_size=READ_BLOCK_SIZE):
+    """Opens a XML source to be read in blocks, decompressed on the fly, see SourceReader.
+    A file opened from a path is closed at the end, a file-like object is left open.
+    The local files are read through a memory map when the MMAP_FILES setting is on, the file ranges always.
+
+    Args:
+        source: a file path, a FileRange or a file-like object
+        block_size: the number of bytes read from the source at once
+
+    Returns:
+        A SourceReader.
+    """
+    if isinstance(source, FileRange):
+        with open(source.path, 'rb') as f:
+            mapped = _map_file(f)
+            try:
+                # An empty file cannot be mapped, its ranges are empty
+                yield SourceReader(MappedRange(mapped or '', source.start, source.stop), block_size)
+            finally:
+                if mapped is not None:
+                    mapped.close()
+
+    elif isinstance(source, basestring):
+        with open(source, 'rb') as f:
+            mapped = MMAP_FILES and _map_file(f) or None
+            if mapped is None:
+                yield SourceReader(f, block_size)
+            else:
+                try:
+                    yield SourceReader(MappedRange(mapped), block_size)
+                finally:
+                    mapped.close()
+
+    else:
+        yield SourceReader(source, block_size)
@@ -0,0 +1,82 @@
+# Third-party apps
+from lxml import etree  # http://lxml.de/
+
+# Internal
+from .parsers import iterparse
+from .sources import open_source
+from .utils.xmlhelper import XMLHelper
+
+
+def split_xml(source, path, batch_size=500, serialize=True, parser_options=None):
+    """Splits a XML document into chunks to be loaded by load_xml_chunks with path as root_path,
+    without building the whole document in memory.
+
+    The document is parsed incrementally. Each chunk is a copy of an element matching path (its tag, attributes
+    and namespaces) holding batch_size of its children. The children are moved to the chunk when it is yielded,
+    and the elements which are not below path are freed as soon as they are closed.
+    e.g. the chunks of split_xml('feed.xml', 'rss.channel', 500) are channel elements of 500 children each:
+
+        mapping.load_xml_chunks(split_xml('feed.xml', 'rss.channel', 500), 'rss.channel', workers=4)
+
+    Args:
+        source: a file path, a FileRange or a file-like object, see open_source
+        path: the dotted path of the elements to split, from the root of the document.
+            The prefixes are resolved with the namespaces declared on the root element.
+        batch_size: the maximum number of children of an element per chunk
+        serialize: whether the chunks are serialized. Otherwise the chunk elements are yielded
+            and load_xml_chunks maps them without parsing them again.
+        parser_options: the options of the parser updating the PARSER_OPTIONS setting,
+            e.g. the parser_options of the Mapping loading the chunks
+
+    Returns:
+        A generator of XML strings, or of elements when serialize is False.
+
+    Raises:
+        An etree.XMLSyntaxError if the document cannot be parsed.
+    """
+    tags = None  # the tags of path
+    stack = []  # the tags of the open elements
+    parent = None  # the element matching path being split
+    batch = []
+
+    with open_source(source) as reader:
+        for event, elem in iterparse(reader, ('start', 'end'), parser_options):
+            if event == 'start':
+                if tags is None:
+                    tags = list(XMLHelper.to_tags(path, elem.nsmap))
+                stack.append(elem.tag)
+                if len(stack) == len(tags) and stack == tags:
+                    parent = elem
+                continue
+
+            depth = len(stack)
+            stack.pop()
+
+            if parent is None:
+                # Not below path: free the memory
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+
+            elif depth == len(tags) + 1:
+                # A child of the element being split
+                batch.append(elem)
+                if len(batch) >= batch_size:
+                    yield _chunk(parent, batch, serialize)
+                    batch = []
+
+            elif elem is parent:
+                if batch:
+                    yield _chunk(parent, batch, serialize)
+                    batch = []
+                parent = None
+                elem.clear()
+
+
+def _chunk(parent, children, serialize):
+    """Moves children to a copy of their parent, serialized or not."""
+    chunk = etree.Element(parent.tag, dict(parent.attrib), nsmap=parent.nsmap)
+    chunk.extend(children)
+    if serialize:
+        return etree.tostring(chunk)
+    return chunk
@@ -0,0 +1,256 @@
+# Python stdlib
+import re
+import socket
+import time
+
+# Internal
+from .log import default_logger as logger
+from .persistence import CREATED, UPDATED, UNCHANGED
+from .settings import STATS_SINKS, STATSD_HOST, STATSD_PORT, STATSD_PREFIX
+from .utils.serializers import deserialize_function
+
+# The counter of the elements skipped because they are unchanged since the last load
+SKIPPED = 'skipped'
+# The action counted for the objects which cannot be mapped or persisted
+FAILED = 'failed'
+
+# The counters per element-mapping and the actions counted per Model
+COUNTERS = ('found', SKIPPED, CREATED, UPDATED, UNCHANGED)
+ACTIONS = (CREATED, UPDATED, UNCHANGED, FAILED)
+
+# The stages of a load:
+#   parse: parsing the XML (and finding the elements of a streamed file)
+#   lookup: finding the elements of the element-mappings in a parsed XML
+#   extract: calculating the ID and the fields of the elements and instantiating the objects
+#   save: persisting the objects and the digests of the elements
+#   total: the whole load
+STAGES = ('parse', 'lookup', 'extract', 'save', 'total')
+
+
+class LoadStats(dict):
+    """The statistics of a load.
+
+    It is the dict of the number of objects created per element-mapping, returned by the loads before,
+    so it can be used the same way. The other statistics are attributes.
+
+    Attributes:
+        counts: a dict of the counters (found, skipped, created, updated, unchanged) by name,
+            each one being a dict of numbers per element-mapping
+        objects: a dict of the actions (created, updated, unchanged, failed) by Model, each one being a dict of numbers by action
+        bytes_parsed: the size of the XML parsed, None when it is not known
+        errors: the messages of the errors which stopped the parsing of the XML or of a chunk,
+            empty when the whole XML was parsed. The elements found before an error are loaded.
+        wall: the wall-clock time spent in seconds per stage, see STAGES
+        cpu: the CPU time of the process spent in seconds per stage.
+            When the load is pipelined, the CPU time of the save stage is None as the stages run in two threads,
+            and the wall-clock time the producer was blocked and the writer idle are added to wall.
+    """
+
+    def __init__(self, paths=()):
+        super(LoadStats, self).__init__(dict.fromkeys(paths, 0))
+        self.counts = dict((k, dict.fromkeys(paths, 0)) for k in COUNTERS)
+        # The created counter is the dict itself
+        self.counts[CREATED] = self
+        self.objects = {}
+        self.bytes_parsed = 0
+        self.errors = []
+        self.wall = {}
+        self.cpu = {}
+
+    def __reduce__(self):
+        # Pickled for the worker processes: the created counter is the dict itself
+        counts = dict((k, v) for (k, v) in self.counts.items() if k != CREATED)
+        return (LoadStats, (), (counts, self.objects, self.bytes_parsed, self.errors, self.wall, self.cpu), None, self.iteritems())
+
+    def __setstate__(self, state):
+        counts, self.objects, self.bytes_parsed, self.errors, self.wall, self.cpu = state
+        self.counts.update(counts)
+
+    @property
+    def found(self):
+        """The number of elements found per element-mapping."""
+        return self.counts['found']
+
+    def count_object(self, app_model, action):
+        """Counts an object of a Model created, updated, unchanged or failed."""
+        actions = self.objects.get(app_model)
+        if actions is None:
+            actions = self.objects[app_model] = dict.fromkeys(ACTIONS, 0)
+        actions[action] = actions[action] + 1
+
+    def count_bytes(self, nb_bytes):
+        """Adds the size of a XML parsed, None if it is not known."""
+        if nb_bytes is None or self.bytes_parsed is None:
+            self.bytes_parsed = None
+        else:
+            self.bytes_parsed = self.bytes_parsed + nb_bytes
+
+    def add_error(self, error):
+        """Records an error which stopped the parsing of the XML or of a chunk."""
+        self.errors.append('%s' % (error,))
+
+    def add_time(self, stage, start):
+        """Adds the time spent in a stage since start.
+
+        Args:
+            stage: the name of the stage, see STAGES
+            start: the (wall-clock time, CPU time) returned by clock when the stage started
+
+        Returns:
+            The current (wall-clock time, CPU time), so the next stage can start from it.
+        """
+        now = clock()
+        self.wall[stage] = self.wall.get(stage, 0.0) + now[0] - start[0]
+        cpu = self.cpu.get(stage, 0.0)
+        if cpu is not None:
+            self.cpu[stage] = cpu + now[1] - start[1]
+        return now
+
+    def stage_time(self, *stages):
+        """Returns the (wall-clock time, CPU time) spent so far in some stages."""
+        return (
+            sum(self.wall.get(stage, 0.0) for stage in stages),
+            sum(self.cpu.get(stage) or 0.0 for stage in stages),
+        )
+
+    def merge(self, other):
+        """Adds the statistics of another load, e.g. a chunk loaded by a worker. The times are summed.
+
+        Returns:
+            The LoadStats itself.
+        """
+        for k in other.counts:
+            _add_numbers(self.counts.setdefault(k, {}), other.counts[k])
+        for app_model, actions in other.objects.items():
+            _add_numbers(self.objects.setdefault(app_model, dict.fromkeys(ACTIONS, 0)), actions)
+        self.count_bytes(other.bytes_parsed)
+        self.errors.extend(other.errors)
+        _add_numbers(self.wall, other.wall)
+        _add_numbers(self.cpu, other.cpu)
+        return self
+
+
+def _add_numbers(numbers, other):
+    """Adds the numbers of a dict to the numbers of another dict, by key."""
+    for k, v in other.iteritems():
+        numbers[k] = numbers.get(k, 0) + v
+
+
+def clock():
+    """Returns the current (wall-clock time, CPU time of the process), see LoadStats.add_time."""
+    return time.time(), time.clock()
+
+
+class MemorySink(object):
+    """A sink keeping the statistics of the loads in memory, e.g. for the tests.
+
+    Attributes:
+        loads: a list of (Mapping label, LoadStats)
+    """
+
+    def __init__(self):
+        self.loads = []
+
+    def emit(self, mapping, stats):
+        self.loads.append((mapping.label, stats))
+
+
+class StatsdSink(object):
+    """A sink sending the statistics of the loads to a statsd server over UDP.
+
+    The metrics are named <prefix>.<mapping label>.<metric>, the label and the paths being made of word characters only:
+        - found.<path>, skipped.<path>: counters of the elements
+        - objects.<app_model>.<action>: counters of the objects
+        - bytes: counter of the bytes parsed
+        - time.<stage>: timers of the wall-clock time per stage, in milliseconds
+    """
+    # The maximum size of the UDP packets
+    PACKET_SIZE = 512
+
+    def __init__(self, host=STATSD_HOST, port=STATSD_PORT, prefix=STATSD_PREFIX):
+        self.address = (host, port)
+        self.prefix = prefix
+
+    @staticmethod
+    def metric_name(name):
+        return re.sub(r'\W+', '_', name).strip('_')
+
+    def metrics(self, mapping, stats):
+        """Returns the metrics of a load as a list of statsd lines."""
+        prefix = '%s.%s' % (self.prefix, self.metric_name(mapping.label))
+        lines = []
+        for counter in ('found', SKIPPED):
+            for path, value in sorted(stats.counts[counter].items()):
+                lines.append('%s.%s.%s:%s|c' % (prefix, counter, self.metric_name(path), value))
+        for app_model, actions in sorted(stats.objects.items()):
+            for action, value in sorted(actions.items()):
+                lines.append('%s.objects.%s.%s:%s|c' % (prefix, self.metric_name(app_model), action, value))
+        if stats.bytes_parsed is not None:
+            lines.append('%s.bytes:%s|c' % (prefix, stats.bytes_parsed))
+        for stage, seconds in sorted(stats.wall.items()):
+            lines.append('%s.time.%s:%d|ms' % (prefix, stage, seconds * 1000))
+        return lines
+
+    def emit(self, mapping, stats):
+        packets = []
+        for line in self.metrics(mapping, stats):
+            if packets and len(packets[-1]) + len(line) < self.PACKET_SIZE:
+                packets[-1] = '%s\n%s' % (packets[-1], line)
+            else:
+                packets.append(line)
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            for packet in packets:
+                sock.sendto(packet, self.address)
+        finally:
+            sock.close()
+
+
+# The sinks the statistics of the loads are sent to, see get_sinks
+_sinks = None
+
+
+def get_sinks():
+    """Returns the sinks the statistics of the loads are sent to.
+    They are first created from the STATS_SINKS setting: the dotted paths of classes or functions returning a sink.
+    """
+    global _sinks
+    if _sinks is None:
+        _sinks = [deserialize_function(name)() for name in STATS_SINKS]
+    return _sinks
+
+
+def register_sink(sink):
+    """Sends the statistics of the loads to a sink, i.e. an object having an emit(mapping, stats) method.
+    If it has a start(mapping, stats) method too, it is given the LoadStats of each load when it starts, see start_stats.
+    """
+    get_sinks().append(sink)
+
+
+def unregister_sink(sink):
+    """Stops sending the statistics of the loads to a sink."""
+    get_sinks().remove(sink)
+
+
+def start_stats(mapping, stats):
+    """Gives the LoadStats of a load starting to the sinks having a start method, e.g. to report the progress of the load
+    from its counters while they are updated. A sink failing is logged and does not fail the load.
+    """
+    for sink in get_sinks():
+        start = getattr(sink, 'start', None)
+        if start is None:
+            continue
+        try:
+            start(mapping, stats)
+        except Exception as e:
+            logger.error('%s - Starting the statistics of %s => Failed. [KO]\n%s' % (mapping.log_desc, sink, e))
+
+
+def emit_stats(mapping, stats):
+    """Sends the statistics of a load to the sinks. A sink failing is logged and does not fail the load."""
+    for sink in get_sinks():
+        try:
+            sink.emit(mapping, stats)
+        except Exception as e:
+            logger.error('%s - Sending the statistics to %s => Failed. [KO]\n%s' % (mapping.log_desc, sink, e))
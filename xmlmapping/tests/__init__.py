@@ -1,4 +1,15 @@
 from .utils.xmlhelper import *
+from .utils.html import *
 from .utils.loggers import *
 from .utils.serializers import *
 from .utils.introspection import *
+from .plan import *
+from .persistence import *
+from .digests import *
+from .parallel import *
+from .pipeline import *
+from .stats import *
+from .sources import *
+from .splitter import *
+from .parsers import *
+from .transformers import *
@@ -0,0 +1,94 @@
+# Django
+from django.test import TestCase
+
+# Third-party apps
+from lxml import etree  # http://lxml.de/
+
+# Internal
+from ..digests import DigestIndex, element_digest
+from ..models import Mapping, ElementDigest
+from ..persistence import Writer
+
+PATH = 'rss.channel.item'
+
+
+class ElementDigestKnownValues(TestCase):
+
+    def test_same_content(self):
+        doc = etree.fromstring('<channel><item><guid>1</guid></item>tail<item><guid>1</guid></item></channel>')
+
+        self.assertEqual(element_digest(doc[0]), element_digest(doc[1]))
+        self.assertEqual(len(element_digest(doc[0])), 32)
+
+    def test_changed_content(self):
+        doc = etree.fromstring('<channel><item><guid>1</guid></item><item><guid>2</guid></item></channel>')
+
+        self.assertNotEqual(element_digest(doc[0]), element_digest(doc[1]))
+
+
+class DigestIndexTestCase(TestCase):
+
+    def setUp(self):
+        self.mapping = Mapping.objects.create(label='digests')
+
+    def index(self):
+        return DigestIndex(ElementDigest, self.mapping, [PATH])
+
+    def test_save(self):
+        index = self.index()
+        index.set(PATH, 1, 'a')
+        index.set(PATH, 2, 'b')
+
+        self.assertFalse(index.is_unchanged(PATH, 1, 'a'))
+        self.assertEqual(index.save(), 2)
+
+        index = self.index()
+        self.assertTrue(index.is_unchanged(PATH, 1, 'a'))
+        self.assertTrue(index.is_unchanged(PATH, u'2', 'b'))
+        self.assertFalse(index.is_unchanged(PATH, 2, 'c'))
+        self.assertFalse(index.is_unchanged('rss.channel', 2, 'b'))
+
+    def test_replace(self):
+        index = self.index()
+        index.set(PATH, 1, 'a')
+        index.save()
+
+        index = self.index()
+        index.set(PATH, 1, 'b')
+        index.save()
+
+        self.assertEqual(list(ElementDigest.objects.filter(mapping=self.mapping).values_list('element_id', 'digest')), [(u'1', u'b')])
+
+    def test_saved_meanwhile(self):
+        # e.g. two workers loading the same element
+        index = self.index()
+        other = self.index()
+        index.set(PATH, 1, 'a')
+        index.set(PATH, 2, 'a')
+        other.set(PATH, 1, 'b')
+        other.save()
+
+        self.assertEqual(index.save(), 2)
+        self.assertEqual(sorted(ElementDigest.objects.filter(mapping=self.mapping).values_list('element_id', 'digest')), [(u'1', u'a'), (u'2', u'a')])
+
+    def test_inserted_meanwhile(self):
+        mapping = self.mapping
+
+        class RacingWriter(Writer):
+            def savepoint(self):
+                # another worker inserts the digest between the update and the insert of the replacement
+                ElementDigest.objects.create(mapping=mapping, path=PATH, element_id='1', digest='b')
+                return super(RacingWriter, self).savepoint()
+
+        obj = ElementDigest(mapping=mapping, path=PATH, element_id='1', digest='a')
+        self.index()._replace(ElementDigest.objects, obj, RacingWriter())
+
+        self.assertEqual(list(ElementDigest.objects.filter(mapping=self.mapping).values_list('element_id', 'digest')), [(u'1', u'a')])
+
+    def test_discard(self):
+        index = self.index()
+        index.set(PATH, 1, 'a')
+        index.discard(PATH, 1)
+
+        self.assertEqual(index.save(), 0)
+        self.assertEqual(ElementDigest.objects.count(), 0)
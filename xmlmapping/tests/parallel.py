@@ -0,0 +1,29 @@
+# Python stdlib
+import logging
+import pickle
+import sys
+
+# Django
+from django.test import TestCase
+
+# Internal
+from ..parallel import RecordCollector
+
+
+class RecordCollectorTestCase(TestCase):
+
+    def test_records_are_picklable(self):
+        collector = RecordCollector()
+        try:
+            raise ValueError('bad element')
+        except ValueError:
+            exc_info = sys.exc_info()
+        collector.handle(logging.LogRecord('xmlmapping', logging.ERROR, __file__, 1, '%s => %s', ('a', object()), exc_info))
+
+        records = pickle.loads(pickle.dumps(collector.flush_records()))
+
+        self.assertEqual(len(records), 1)
+        self.assertTrue(records[0].getMessage().startswith('a => <object'))
+        self.assertTrue('bad element' in records[0].exc_text)
+        self.assertEqual(collector.flush_records(), [])
+
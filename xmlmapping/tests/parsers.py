@@ -0,0 +1,74 @@
+# Python stdlib
+import threading
+from StringIO import StringIO
+
+# Django
+from django.test import TestCase
+
+# Third-party apps
+from lxml import etree  # http://lxml.de/
+
+# Internal
+from .. import parsers
+from ..parsers import get_parser, iterparse, parser_options
+
+XML = '<a>\n  <!-- comment -->\n  <b id="1">b</b>\n  <?pi data?>\n</a>'
+
+
+class ParserOptionsKnownValues(TestCase):
+
+    def test_setting(self):
+        self.assertEqual(parser_options(), parsers.PARSER_OPTIONS)
+
+    def test_options(self):
+        options = parser_options({'huge_tree': True, 'remove_comments': False})
+
+        self.assertEqual(options['huge_tree'], True)
+        self.assertEqual(options['remove_comments'], False)
+        self.assertEqual(options['resolve_entities'], False)
+
+    def test_unsupported_option(self):
+        self.assertFalse('not_an_option' in parser_options({'not_an_option': True}))
+        self.assertFalse('not_an_option' in parser_options({'not_an_option': True}, 'iterparse'))
+
+
+class GetParserTestCase(TestCase):
+
+    def test_profile(self):
+        root = etree.fromstring(XML, parser=get_parser())
+
+        self.assertEqual(etree.tostring(root), '<a><b id="1">b</b></a>')
+
+    def test_options(self):
+        root = etree.fromstring(XML, parser=get_parser({'remove_comments': False}))
+
+        self.assertEqual(root[0].tag, etree.Comment)
+
+    def test_reused(self):
+        self.assertTrue(get_parser() is get_parser())
+        self.assertTrue(get_parser({'huge_tree': True}) is get_parser({'huge_tree': True}))
+        self.assertFalse(get_parser({'huge_tree': True}) is get_parser())
+
+    def test_per_thread(self):
+        parser = get_parser()
+        other = []
+        thread = threading.Thread(target=lambda: other.append(get_parser()))
+        thread.start()
+        thread.join()
+
+        self.assertFalse(other[0] is parser)
+
+
+class IterparseTestCase(TestCase):
+
+    def test_profile(self):
+        tags = [elem.tag for event, elem in iterparse(StringIO(XML))]
+
+        self.assertEqual(tags, ['b', 'a'])
+
+    def test_options(self):
+        events = iterparse(StringIO(XML), ('start',), {'remove_comments': False})
+        for event, elem in events:
+            pass
+
+        self.assertEqual(events.root[0].tag, etree.Comment)
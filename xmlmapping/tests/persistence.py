@@ -0,0 +1,295 @@
+# Django
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+# Internal
+from ..models import ElementDigest, Mapping
+from ..persistence import Pending, RelationCache, SaveWriter, BulkWriter, RawWriter, CREATED, UPDATED, UNCHANGED, BULK_BATCH_SIZE, HAS_ATOMIC, get_writer
+from ..plan import ModelPlan, Row
+
+
+def nb_queries(nb_statements, nb_savepoints=0):
+    """Returns the number of queries of statements run in a TestCase, nb_savepoints of them in their own savepoint:
+    creating and releasing a savepoint are queries when the DB supports them.
+    """
+    if connection.features.uses_savepoints:
+        return nb_statements + 2 * nb_savepoints
+    return nb_statements
+
+
+def pending(label, path='rss.channel.item', id_field=None):
+    model_plan = ModelPlan('xmlmapping.Mapping', Mapping, (), {}, id_field).bind({})
+    return Pending(path, label, model_plan, Mapping(label=label))
+
+
+class SaveWriterTestCase(TestCase):
+
+    def test_add(self):
+        writer = SaveWriter()
+        results = writer.add(pending('a'))
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][1], None)
+        self.assertTrue(results[0][0].ins.pk is not None)
+        self.assertEqual(writer.flush(), [])
+
+
+class GetWriterTestCase(TestCase):
+
+    def test_writers(self):
+        self.assertTrue(isinstance(get_writer(False), SaveWriter))
+        self.assertEqual(get_writer(True).batch_size, BULK_BATCH_SIZE)
+        self.assertEqual(get_writer(10).batch_size, 10)
+        self.assertEqual(get_writer(1, 5).batch_size, 1)
+        self.assertEqual(get_writer(1, 5).commit_every, 5)
+        self.assertTrue(isinstance(get_writer('raw'), RawWriter))
+
+
+class BulkWriterTestCase(TestCase):
+
+    def test_flush_on_batch_size(self):
+        writer = BulkWriter(batch_size=2)
+
+        self.assertEqual(writer.add(pending('a')), [])
+        results = writer.add(pending('b'))
+
+        self.assertEqual([err for (p, err, action) in results], [None, None])
+        self.assertEqual(Mapping.objects.filter(label__in=['a', 'b']).count(), 2)
+        self.assertEqual(writer.flush(), [])
+
+    def test_flush_on_memory_cap(self):
+        writer = BulkWriter(batch_size=100, memory_cap=5)
+
+        self.assertEqual(writer.add(pending('a')), [])
+        results = writer.add(pending('abcdef'))
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(writer.size, 0)
+
+    def test_flush(self):
+        writer = BulkWriter(batch_size=100)
+        writer.add(pending('a'))
+        writer.add(pending('b'))
+
+        self.assertEqual(Mapping.objects.filter(label__in=['a', 'b']).count(), 0)
+        self.assertEqual(len(writer.flush()), 2)
+        self.assertEqual(Mapping.objects.filter(label__in=['a', 'b']).count(), 2)
+
+    def test_failed_batch(self):
+        writer = BulkWriter(batch_size=100)
+        writer.add(pending('a'))
+        writer.add(pending('a'))
+        writer.add(pending('b'))
+
+        results = writer.flush()
+
+        self.assertEqual([p.ins.label for (p, err, action) in results], ['a', 'a', 'b'])
+        self.assertEqual([err is None for (p, err, action) in results], [True, False, True])
+        self.assertEqual(Mapping.objects.filter(label__in=['a', 'b']).count(), 2)
+
+
+def row(label, path='rss.channel.item'):
+    model_plan = ModelPlan.compile('xmlmapping.Mapping', {'label': 'label'}).bind({})
+    return Pending(path, label, model_plan, Row([label]))
+
+
+class RawWriterTestCase(TransactionTestCase):
+
+    def test_flush_on_batch_size(self):
+        writer = RawWriter(batch_size=2)
+
+        self.assertEqual(writer.add(row('a')), [])
+        # Out of a transaction, the atomic block of the batch begins one (Django >= 1.6)
+        with self.assertNumQueries(2 if HAS_ATOMIC and connection.vendor == 'sqlite' else 1):
+            results = writer.add(row('b'))
+
+        self.assertEqual([(err, action) for (p, err, action) in results], [(None, CREATED), (None, CREATED)])
+        self.assertEqual(Mapping.objects.get(label='a').parser_options, {})
+        self.assertEqual(writer.flush(), [])
+
+    def test_failed_batch(self):
+        writer = RawWriter(batch_size=100)
+        for label in ['a', 'a', 'b']:
+            writer.add(row(label))
+
+        results = writer.flush()
+
+        self.assertEqual([(p.ins[0], err is None) for (p, err, action) in results], [('a', True), ('a', False), ('b', True)])
+        self.assertEqual(Mapping.objects.filter(label__in=['a', 'b']).count(), 2)
+
+    def test_commit_every(self):
+        with RawWriter(batch_size=100, commit_every=10) as writer:
+            for label in ['a', 'a', 'b']:
+                writer.add(row(label))
+            results = writer.flush()
+
+        self.assertEqual([err is None for (p, err, action) in results], [True, False, True])
+        self.assertEqual(Mapping.objects.filter(label__in=['a', 'b']).count(), 2)
+
+    def test_instances(self):
+        writer = RawWriter(batch_size=100)
+        writer.add(row('a'))
+        writer.add(pending('b', id_field='label'))
+
+        results = writer.flush()
+
+        self.assertEqual(sorted(action for (p, err, action) in results), [CREATED, CREATED])
+        self.assertEqual(Mapping.objects.filter(label__in=['a', 'b']).count(), 2)
+
+
+class UpsertTestCase(TestCase):
+
+    def test_save_writer(self):
+        writer = SaveWriter()
+        created = writer.add(pending('a', id_field='label'))
+        unchanged = writer.add(pending('a', id_field='label'))
+
+        self.assertEqual([(err, action) for (p, err, action) in created], [(None, CREATED)])
+        self.assertEqual([(err, action) for (p, err, action) in unchanged], [(None, UNCHANGED)])
+        self.assertEqual(unchanged[0].pending.ins.pk, created[0].pending.ins.pk)
+        self.assertEqual(Mapping.objects.filter(label='a').count(), 1)
+
+    def test_bulk_writer(self):
+        Mapping.objects.create(label='a')
+        writer = BulkWriter(batch_size=100)
+        for label in ['a', 'b', 'c', 'b']:
+            writer.add(pending(label, id_field='label'))
+
+        results = writer.flush()
+
+        self.assertEqual(sorted((p.ins.label, action) for (p, err, action) in results), [('a', UNCHANGED), ('b', CREATED), ('b', UNCHANGED), ('c', CREATED)])
+        self.assertEqual(Mapping.objects.filter(label__in=['a', 'b', 'c']).count(), 3)
+
+    def test_duplicate_in_batch(self):
+        writer = BulkWriter(batch_size=100)
+        first = pending('a', id_field='label')
+        last = pending('a', id_field='label')
+        writer.add(first)
+        writer.add(last)
+
+        results = writer.flush()
+
+        self.assertEqual([(p, action) for (p, err, action) in results], [(first, UNCHANGED), (last, CREATED)])
+        self.assertEqual(Mapping.objects.filter(label='a').count(), 1)
+
+    def test_update_batch(self):
+        batch = []
+        for label in ['a', 'b']:
+            changed = pending(label)
+            changed.ins.pk = Mapping.objects.create(label=label).pk
+            batch.append((changed, {'label': label + '2'}))
+
+        with self.assertNumQueries(nb_queries(1, nb_savepoints=1)):
+            results = SaveWriter().update_batch(Mapping, batch)
+
+        self.assertEqual([(err, action) for (p, err, action) in results], [(None, UPDATED), (None, UPDATED)])
+        self.assertEqual(sorted(Mapping.objects.filter(pk__in=[p.ins.pk for (p, values) in batch]).values_list('label', flat=True)), ['a2', 'b2'])
+
+    def test_wrong_id_field(self):
+        results = SaveWriter().add(pending('a', id_field='wrong'))
+
+        self.assertTrue(results[0].error is not None)
+
+
+def digest(label, element_id):
+    """Returns the Pending of an ElementDigest related to the Mapping whose label is the given one."""
+    model_plan = ModelPlan.compile('xmlmapping.ElementDigest', {
+        'mapping': {'related': 'xmlmapping.Mapping', 'key': 'label', 'tag': 'label'},
+    }).bind({})
+    relations = ((model_plan.relations[0], label),)
+    return Pending('rss.channel.item', element_id, model_plan, ElementDigest(path='p', element_id=element_id, digest='d'), relations)
+
+
+class RelationCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.pks = dict((label, Mapping.objects.create(label=label).pk) for label in ['a', 'b'])
+
+    def test_resolve_batch(self):
+        cache = RelationCache()
+        batch = [digest('a', '1'), digest('b', '2'), digest('a', '3')]
+
+        # 1 query for all the keys of the batch
+        with self.assertNumQueries(1):
+            failed, resolved = cache.resolve(batch)
+        # The keys are cached
+        with self.assertNumQueries(0):
+            cache.resolve([digest('b', '4')])
+
+        self.assertEqual(failed, [])
+        self.assertEqual([p.ins.mapping_id for p in resolved], [self.pks['a'], self.pks['b'], self.pks['a']])
+        self.assertEqual(cache.size, 2)
+
+    def test_not_found(self):
+        failed, resolved = RelationCache().resolve([digest('a', '1'), digest('c', '2')])
+
+        self.assertEqual([p.ins.mapping_id for p in resolved], [self.pks['a']])
+        self.assertEqual([p.elem_id for (p, err, action) in failed], ['2'])
+        self.assertTrue(isinstance(failed[0].error, Mapping.DoesNotExist))
+
+    def test_cleared_when_full(self):
+        cache = RelationCache(max_size=1)
+        cache.resolve([digest('a', '1'), digest('b', '2')])
+
+        with self.assertNumQueries(1):
+            cache.resolve([digest('a', '3')])
+        self.assertEqual(cache.size, 1)
+
+    def test_remember(self):
+        cache = RelationCache()
+        cache.resolve([digest('a', '1')])
+        results = SaveWriter().add(pending('c', id_field='label'))
+
+        cache.remember(results)
+
+        with self.assertNumQueries(0):
+            failed, resolved = cache.resolve([digest('c', '2')])
+        self.assertEqual(resolved[0].ins.mapping_id, Mapping.objects.get(label='c').pk)
+
+    def test_bulk_writer(self):
+        writer = BulkWriter(batch_size=100)
+        writer.add(digest('a', '1'))
+        writer.add(digest('c', '2'))
+
+        results = writer.flush()
+
+        self.assertEqual([(p.elem_id, err is None) for (p, err, action) in results], [('2', False), ('1', True)])
+        self.assertEqual(ElementDigest.objects.get(element_id='1').mapping_id, self.pks['a'])
+
+
+class CommitEveryTestCase(TransactionTestCase):
+
+    def test_commit_every(self):
+        with SaveWriter(commit_every=2) as writer:
+            self.assertTrue(writer.in_transaction())
+            errors = []
+            for label in ['a', 'a', 'b']:
+                errors.extend(err is None for (p, err, action) in writer.add(pending(label)))
+                writer.element_done()
+
+        self.assertEqual(errors, [True, False, True])
+        self.assertFalse(SaveWriter().in_transaction())
+        self.assertEqual(Mapping.objects.filter(label__in=['a', 'b']).count(), 2)
+
+    def test_bulk_commit_every(self):
+        with BulkWriter(batch_size=2, commit_every=2) as writer:
+            results = []
+            for label in ['a', 'b', 'c']:
+                results.extend(writer.add(pending(label)))
+                writer.element_done()
+            results.extend(writer.flush())
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(Mapping.objects.filter(label__in=['a', 'b', 'c']).count(), 3)
+
+    def test_rollback_on_exception(self):
+        try:
+            with SaveWriter(commit_every=10) as writer:
+                writer.add(pending('a'))
+                writer.element_done()
+                raise ValueError()
+        except ValueError:
+            pass
+
+        self.assertFalse(SaveWriter().in_transaction())
+        self.assertEqual(Mapping.objects.filter(label='a').count(), 0)
@@ -0,0 +1,64 @@
+# Python stdlib
+import threading
+
+# Django
+from django.test import TestCase
+
+# Internal
+from ..models import Mapping
+from ..persistence import SaveWriter
+from ..pipeline import Pipeline
+from .persistence import pending
+
+
+class PipelineTestCase(TestCase):
+
+    def test_run(self):
+        results = []
+
+        def produce(writer):
+            for label in ('a', 'b', 'c'):
+                self.assertEqual(writer.add(pending(label)), [])
+                writer.element_done()
+
+        timings = Pipeline(queue_size=1).run(produce, SaveWriter(), results.extend)
+
+        self.assertEqual([(p.elem_id, err) for (p, err, action) in results], [('a', None), ('b', None), ('c', None)])
+        self.assertEqual(Mapping.objects.filter(label__in=['a', 'b', 'c']).count(), 3)
+        self.assertEqual(sorted(timings.keys()), ['blocked', 'idle', 'produce', 'write'])
+
+    def test_fail(self):
+        # The failures of the producer are recorded in the writer thread
+        results = []
+        threads = []
+        err = ValueError('not mapped')
+
+        def produce(writer):
+            self.assertEqual(writer.fail(pending('a'), err), [])
+            writer.add(pending('b'))
+
+        def record(items):
+            threads.append(threading.current_thread())
+            results.extend(items)
+
+        Pipeline().run(produce, SaveWriter(), record)
+
+        self.assertEqual([(p.elem_id, e) for (p, e, action) in results], [('a', err), ('b', None)])
+        self.assertEqual(set(threads), set([threading.current_thread()]))
+
+    def test_producer_error(self):
+        def produce(writer):
+            writer.add(pending('a'))
+            raise ValueError('bad XML')
+
+        self.assertRaises(ValueError, Pipeline().run, produce, SaveWriter(), lambda results: None)
+
+    def test_writer_error(self):
+        def produce(writer):
+            for i in range(100):
+                writer.add(pending('label %s' % (i,)))
+
+        def record(results):
+            raise ValueError('bad DB')
+
+        self.assertRaises(ValueError, Pipeline(queue_size=1).run, produce, SaveWriter(), record)
@@ -0,0 +1,289 @@
+# Django
+from django.test import TestCase
+
+# Third-party apps
+from lxml import etree  # http://lxml.de/
+
+# Internal
+from ..models import Mapping
+from ..plan import ElementPlan, MappingPlan, ModelPlan, Row, child_tag, collect_texts, init_row, is_reachable, row_columns
+from ..transformers import TransformError
+from ..utils.xmlhelper import ElementNotFound
+
+XML = """<?xml version="1.0" encoding="utf-8"?>
+        <rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/">
+            <channel>
+                <item>
+                    <guid>1</guid>
+                    <title>Title item 1</title>
+                    <media:desc>Desc item 1</media:desc>
+                </item>
+            </channel>
+        </rss>
+    """
+DOC = etree.fromstring(XML)
+ITEM = DOC.find('channel/item')
+
+DATA_MAP = {
+    'rss.channel.item': {
+        'get_id': 'guid',
+        'models': {
+            'xmlmapping.Mapping': {
+                'label': ['title', 'media:desc'],
+            }
+        }
+    },
+    'rss.channel': {
+        'get_id': 'xmlmapping.tests.plan.get_id',
+    }
+}
+
+
+def get_id(element):
+    return element.tag
+
+
+class MappingPlanKnownValues(TestCase):
+
+    def setUp(self):
+        self.plan = MappingPlan.compile(DATA_MAP)
+        self.bound = dict((e.path, e) for e in self.plan.bind(DOC.nsmap))
+
+    def test_extract(self):
+        model_plan = self.bound['rss.channel.item'].models[0]
+
+        self.assertEqual(model_plan.app_model, 'xmlmapping.Mapping')
+        self.assertEqual(model_plan.extract(ITEM), {'label': 'Title item 1 Desc item 1'})
+
+    def test_create(self):
+        ins = self.bound['rss.channel.item'].models[0].create(ITEM)
+
+        self.assertTrue(isinstance(ins, Mapping))
+        self.assertEqual(ins.label, 'Title item 1 Desc item 1')
+        self.assertEqual(ins.pk, None)
+
+    def test_create_collected_texts(self):
+        element_plan = self.bound['rss.channel.item']
+        texts = element_plan.collect(ITEM)
+
+        self.assertEqual(texts, {'title': 'Title item 1', '{http://search.yahoo.com/mrss/}desc': 'Desc item 1'})
+        self.assertEqual(element_plan.models[0].create(ITEM, None, texts).label, 'Title item 1 Desc item 1')
+
+    def test_missing_element(self):
+        model_plan = self.bound['rss.channel.item'].models[0]
+
+        self.assertRaises(ElementNotFound, model_plan.extract, DOC)
+
+    def test_inner_path(self):
+        model_plan = ModelPlan.compile('xmlmapping.Mapping', {'label': ['channel.item.title', 'channel.item.guid']}).bind(DOC.nsmap)
+
+        self.assertEqual(model_plan.tags, frozenset())
+        self.assertEqual(model_plan.create(DOC).label, 'Title item 1 1')
+
+    def test_transform(self):
+        model_plan = ModelPlan.compile('xmlmapping.Mapping', {
+            'label': {'tag': 'guid', 'transform': 'int'},
+            'title': {'tag': ['title', 'guid'], 'transform': {'regex': r'item (\d \d)'}},
+        }).bind(DOC.nsmap)
+
+        self.assertEqual(model_plan.extract(ITEM), {'label': 1, 'title': '1 1'})
+
+    def test_transform_invalid(self):
+        for conf in ({'tag': 'guid', 'transform': 'unknown'}, {'transform': 'int'}, {'tag': 'title', 'transform': 'int'}):
+            model_plan = ModelPlan.compile('xmlmapping.Mapping', {'label': conf}).bind(DOC.nsmap)
+
+            self.assertRaises(TransformError, model_plan.extract, ITEM)
+
+    def test_not_a_field(self):
+        model_plan = ModelPlan.compile('xmlmapping.Mapping', {'label': 'title', 'title': 'title'}).bind(DOC.nsmap)
+        ins = model_plan.create(ITEM)
+
+        self.assertEqual(model_plan.plan.init_row, None)
+        self.assertEqual((ins.label, ins.title), ('Title item 1', 'Title item 1'))
+
+    def test_get_id(self):
+        self.assertEqual(self.bound['rss.channel.item'].get_id(ITEM), '1')
+        self.assertEqual(self.bound['rss.channel'].get_id(ITEM), 'item')
+
+    def test_no_models(self):
+        self.assertEqual(self.bound['rss.channel'].models, None)
+
+    def test_bind_cached(self):
+        self.assertTrue(self.plan.bind(DOC.nsmap) is self.plan.bind(dict(DOC.nsmap)))
+
+
+class CollectTextsKnownValues(TestCase):
+
+    def test_first_child(self):
+        item = etree.fromstring('<item><!-- c --><title>1</title><title>2</title><guid/><link>3</link></item>')
+
+        self.assertEqual(collect_texts(item, frozenset(['title', 'guid', 'desc'])), {'title': '1', 'guid': ''})
+
+    def test_no_tags(self):
+        self.assertEqual(collect_texts(ITEM, frozenset()), {})
+
+
+class ChildTagKnownValues(TestCase):
+
+    def test_child(self):
+        self.assertEqual(child_tag('title', DOC.nsmap), 'title')
+        self.assertTrue(isinstance(child_tag(u'title', DOC.nsmap), str))
+        self.assertEqual(child_tag('media:desc', DOC.nsmap), '{http://search.yahoo.com/mrss/}desc')
+
+    def test_not_a_child(self):
+        self.assertEqual(child_tag('item.title', DOC.nsmap), None)
+        self.assertEqual(child_tag('*', DOC.nsmap), None)
+        self.assertEqual(child_tag('@id', DOC.nsmap), None)
+
+
+class InitRowKnownValues(TestCase):
+
+    def test_fields(self):
+        defaults, positions = init_row(Mapping, ['label'])
+
+        self.assertEqual(len(defaults), len(Mapping._meta.fields))
+        self.assertEqual(Mapping(*defaults).data_map, Mapping().data_map)
+        self.assertEqual(positions, {'label': [f.attname for f in Mapping._meta.fields].index('label')})
+
+    def test_not_a_field(self):
+        self.assertEqual(init_row(Mapping, ['label', 'title']), None)
+
+
+class RowColumnsKnownValues(TestCase):
+
+    def test_columns(self):
+        columns = row_columns(Mapping, ['label'])
+
+        self.assertEqual([(field.attname, position) for (field, position) in columns], [
+            ('data_map', None), ('label', 0), ('parser_options', None),
+        ])
+
+    def test_not_a_field(self):
+        self.assertEqual(row_columns(Mapping, ['label', 'title']), None)
+
+    def test_model_plan(self):
+        model_plan = ModelPlan.compile('xmlmapping.Mapping', {'label': 'title'})
+
+        self.assertEqual(len(model_plan.row_columns), 3)
+        self.assertEqual(model_plan.bind(DOC.nsmap).row(ITEM), ('Title item 1',))
+        self.assertTrue(isinstance(model_plan.bind(DOC.nsmap).row(ITEM), Row))
+        # The upserted objects need instances
+        self.assertEqual(ModelPlan.compile('xmlmapping.Mapping', {'data_map': 'title'}, 'label').row_columns, None)
+
+
+class RelationPlanKnownValues(TestCase):
+
+    def test_related(self):
+        model_plan = ModelPlan.compile('xmlmapping.ElementDigest', {
+            'mapping': {'related': 'xmlmapping.Mapping', 'key': 'label', 'tag': 'title'},
+        }).bind(DOC.nsmap)
+
+        ((relation, key),) = model_plan.relation_keys(ITEM, '1')
+
+        self.assertEqual((relation.attname, relation.model_class, relation.key, key), ('mapping_id', Mapping, 'label', 'Title item 1'))
+        self.assertTrue('title' in model_plan.tags)
+        self.assertEqual(model_plan.field_names, ['mapping'])
+
+    def test_sibling(self):
+        element_plan = ElementPlan.compile('rss.channel.item', {
+            'get_id': 'guid',
+            'id_field': {'xmlmapping.Mapping': 'label'},
+            'models': {
+                'xmlmapping.ElementDigest': {'path': 'title', 'mapping': {'sibling': 'xmlmapping.Mapping'}},
+                'xmlmapping.Mapping': {},
+            }
+        })
+
+        # The sibling is persisted first
+        self.assertEqual([m.app_model for m in element_plan.models], ['xmlmapping.Mapping', 'xmlmapping.ElementDigest'])
+        model_plan = element_plan.models[1].bind(DOC.nsmap)
+        self.assertEqual([key for (relation, key) in model_plan.relation_keys(ITEM, '1')], ['1'])
+        self.assertEqual(element_plan.models[0].bind(DOC.nsmap).relation_keys(ITEM, '1'), None)
+
+    def test_invalid(self):
+        for conf in ({'sibling': 'xmlmapping.Mapping'}, {'related': 'xmlmapping.Mapping', 'tag': 'title'},
+                     {'related': 'restaurant.Unknown', 'key': 'label', 'tag': 'title'}):
+            model_plan = ModelPlan.compile('xmlmapping.ElementDigest', {'mapping': conf}).bind(DOC.nsmap)
+
+            self.assertRaises(Exception, model_plan.relation_keys, ITEM, '1')
+
+
+class PathTrieKnownValues(TestCase):
+
+    def setUp(self):
+        self.plan = MappingPlan.compile({
+            'rss.channel': {'models': {'xmlmapping.Mapping': {'label': 'title'}}},
+            'rss.channel.item': {'models': {'xmlmapping.Mapping': {'label': 'title'}}},
+            'rss.channel.item.media:desc': {'models': {'xmlmapping.Mapping': {'label': 'title'}}},
+            'rss.channel.item.unknown:desc': {'models': {'xmlmapping.Mapping': {'label': 'title'}}},
+            'rss.channel.title': {'get_id': 'guid'},
+        })
+        self.doc = etree.fromstring(
+            '<rss xmlns:media="http://search.yahoo.com/mrss/"><channel>'
+            '<item><media:desc>1</media:desc></item><title/><item/><item><media:desc>3</media:desc></item>'
+            '</channel></rss>'
+        )
+
+    def test_walk_in_document_order(self):
+        trie = self.plan.trie(self.doc.nsmap, 'rss')
+        paths = [(elem.tag, element_plan.path) for (elem, element_plan) in trie.walk(self.doc)]
+
+        self.assertEqual(paths, [
+            ('channel', 'rss.channel'),
+            ('item', 'rss.channel.item'),
+            ('{http://search.yahoo.com/mrss/}desc', 'rss.channel.item.media:desc'),
+            ('item', 'rss.channel.item'),
+            ('item', 'rss.channel.item'),
+            ('{http://search.yahoo.com/mrss/}desc', 'rss.channel.item.media:desc'),
+        ])
+
+    def test_node_path(self):
+        trie = self.plan.trie(self.doc.nsmap, 'rss.channel')
+        channel = self.doc[0]
+
+        self.assertEqual(len([e for (e, element_plan) in trie.walk(channel) if element_plan.path == 'rss.channel.item']), 3)
+        self.assertEqual(trie.plans[0].path, 'rss.channel')
+
+    def test_unresolved(self):
+        trie = self.plan.trie(self.doc.nsmap, 'rss')
+
+        self.assertEqual([element_plan.path for (element_plan, err) in trie.unresolved], ['rss.channel.item.unknown:desc'])
+
+    def test_unreachable_left_out(self):
+        trie = self.plan.trie(self.doc.nsmap, 'rss.channel.item')
+
+        self.assertEqual([element_plan.path for element_plan in trie.plans], ['rss.channel.item'])
+        self.assertEqual(trie.children.keys(), ['{http://search.yahoo.com/mrss/}desc'])
+
+    def test_trie_cached(self):
+        self.assertTrue(self.plan.trie(self.doc.nsmap, 'rss') is self.plan.trie(dict(self.doc.nsmap), 'rss'))
+        self.assertFalse(self.plan.trie(self.doc.nsmap, 'rss') is self.plan.trie(self.doc.nsmap, 'rss.channel'))
+
+
+class IsReachableKnownValues(TestCase):
+
+    def test_below(self):
+        self.assertTrue(is_reachable('rss.channel.item', 'rss.channel'))
+        self.assertTrue(is_reachable('rss.channel', 'rss.channel'))
+        self.assertTrue(is_reachable('rss.channel', None))
+
+    def test_relative(self):
+        self.assertTrue(is_reachable('item', 'rss.channel'))
+
+    def test_not_below(self):
+        self.assertFalse(is_reachable('rss.image.url', 'rss.channel'))
+        self.assertFalse(is_reachable('rss', 'rss.channel'))
+        self.assertFalse(is_reachable('rss.channelx', 'rss.channel'))
+
+
+class MappingPlanCacheTestCase(TestCase):
+
+    def test_invalidated_on_save(self):
+        mapping = Mapping(label='plan', data_map=DATA_MAP)
+        plan = mapping.plan
+
+        self.assertTrue(mapping.plan is plan)
+
+        mapping.save()
+
+        self.assertFalse(mapping.plan is plan)
@@ -0,0 +1,127 @@
+# Python stdlib
+import bz2
+import gzip
+import os
+import tempfile
+import unittest
+from StringIO import StringIO
+
+# Django
+from django.test import TestCase
+
+# Internal
+from ..sources import FileRange, SourceReader, UnsupportedCompression, lzma, open_source
+
+XML = '<rss><channel>%s</channel></rss>' % (''.join(['<item><guid>%s</guid></item>' % (i,) for i in xrange(100)]),)
+
+
+def gzipped(data):
+    f = StringIO()
+    with gzip.GzipFile(fileobj=f, mode='wb') as g:
+        g.write(data)
+    return f.getvalue()
+
+
+def read_all(reader, size=10):
+    blocks = []
+    for block in iter(lambda: reader.read(size), ''):
+        blocks.append(block)
+    return ''.join(blocks)
+
+
+class SourceReaderKnownValues(TestCase):
+
+    def test_plain(self):
+        reader = SourceReader(StringIO(XML), block_size=7)
+
+        self.assertEqual(read_all(reader), XML)
+        self.assertEqual(reader.compression, None)
+        self.assertEqual(reader.nb_bytes, len(XML))
+
+    def test_gzip(self):
+        reader = SourceReader(StringIO(gzipped(XML)), block_size=7)
+
+        self.assertEqual(read_all(reader), XML)
+        self.assertEqual(reader.compression, 'gzip')
+        self.assertEqual(reader.nb_bytes, len(XML))
+
+    def test_gzip_concatenated(self):
+        reader = SourceReader(StringIO(gzipped(XML[:50]) + gzipped(XML[50:])), block_size=7)
+
+        self.assertEqual(read_all(reader), XML)
+
+    def test_bz2(self):
+        reader = SourceReader(StringIO(bz2.compress(XML)), block_size=7)
+
+        self.assertEqual(read_all(reader, 1000), XML)
+        self.assertEqual(reader.compression, 'bz2')
+
+    def test_bz2_concatenated_at_block_boundary(self):
+        first = bz2.compress(XML[:50])
+        reader = SourceReader(StringIO(first + bz2.compress(XML[50:])), block_size=len(first))
+
+        self.assertEqual(read_all(reader), XML)
+
+    @unittest.skipIf(lzma is None, 'lzma is not available')
+    def test_xz(self):
+        reader = SourceReader(StringIO(lzma.compress(XML)), block_size=7)
+
+        self.assertEqual(read_all(reader), XML)
+        self.assertEqual(reader.compression, 'xz')
+
+    @unittest.skipIf(lzma is not None, 'lzma is available')
+    def test_xz_unsupported(self):
+        reader = SourceReader(StringIO('\xfd7zXZ\x00 compressed'))
+
+        self.assertRaises(UnsupportedCompression, reader.read, 10)
+
+    def test_read_all(self):
+        reader = SourceReader(StringIO(gzipped(XML)), block_size=7)
+
+        self.assertEqual(reader.read(5) + reader.read(), XML)
+        self.assertEqual(reader.read(), '')
+
+
+class OpenSourceTestCase(TestCase):
+
+    def test_path(self):
+        fd, path = tempfile.mkstemp(suffix='.xml.gz')
+        os.write(fd, gzipped(XML))
+        os.close(fd)
+        try:
+            with open_source(path) as reader:
+                self.assertEqual(reader.read(), XML)
+            # The memory map is closed
+            self.assertRaises(ValueError, reader.fileobj.data.read, 1)
+        finally:
+            os.remove(path)
+
+    def test_file_range(self):
+        fd, path = tempfile.mkstemp(suffix='.xml')
+        os.write(fd, 'garbage' + XML + 'garbage')
+        os.close(fd)
+        try:
+            with open_source(FileRange(path, 7, 7 + len(XML)), block_size=10) as reader:
+                self.assertEqual(read_all(reader), XML)
+            with open_source(FileRange(path, 0, 100000)) as reader:
+                self.assertEqual(len(reader.read()), len(XML) + 14)
+        finally:
+            os.remove(path)
+
+    def test_empty_file(self):
+        fd, path = tempfile.mkstemp(suffix='.xml')
+        os.close(fd)
+        try:
+            with open_source(path) as reader:
+                self.assertEqual(reader.read(), '')
+            with open_source(FileRange(path, 0, 10)) as reader:
+                self.assertEqual(reader.read(), '')
+        finally:
+            os.remove(path)
+
+    def test_file_object_left_open(self):
+        f = StringIO(XML)
+        with open_source(f) as reader:
+            self.assertEqual(reader.read(), XML)
+
+        self.assertFalse(f.closed)
@@ -0,0 +1,64 @@
+# Python stdlib
+import bz2
+from StringIO import StringIO
+
+# Django
+from django.test import TestCase
+
+# Third-party apps
+from lxml import etree  # http://lxml.de/
+
+# Internal
+from ..splitter import split_xml
+
+XML = ('<rss xmlns:media="http://search.yahoo.com/mrss/"><head>h</head>'
+       '<channel id="1"><title>t</title><item><media:title>1</media:title></item><item>2</item><item>3</item></channel>'
+       '<channel id="2"><item>4</item></channel></rss>')
+
+
+class SplitXMLKnownValues(TestCase):
+
+    def test_batches(self):
+        chunks = list(split_xml(StringIO(XML), 'rss.channel', 2))
+
+        self.assertEqual(chunks, [
+            '<channel xmlns:media="http://search.yahoo.com/mrss/" id="1"><title>t</title><item><media:title>1</media:title></item></channel>',
+            '<channel xmlns:media="http://search.yahoo.com/mrss/" id="1"><item>2</item><item>3</item></channel>',
+            '<channel xmlns:media="http://search.yahoo.com/mrss/" id="2"><item>4</item></channel>',
+        ])
+
+    def test_elements(self):
+        chunks = list(split_xml(StringIO(XML), 'rss.channel', 2, serialize=False))
+
+        self.assertEqual([etree.tostring(chunk) for chunk in chunks], list(split_xml(StringIO(XML), 'rss.channel', 2)))
+        self.assertEqual(chunks[0].getparent(), None)
+
+    def test_chunks_are_parsable(self):
+        for chunk in split_xml(StringIO(XML), 'rss.channel', 10):
+            root = etree.fromstring(chunk)
+            self.assertEqual(root.tag, 'channel')
+            self.assertEqual(root.nsmap, {'media': 'http://search.yahoo.com/mrss/'})
+
+    def test_root(self):
+        chunks = list(split_xml(StringIO(XML), 'rss', 10))
+
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(len(etree.fromstring(chunks[0])), 3)
+
+    def test_namespaced_path(self):
+        xml = '<rss xmlns:media="http://search.yahoo.com/mrss/"><media:group><media:content/></media:group></rss>'
+
+        chunks = list(split_xml(StringIO(xml), 'rss.media:group', 10))
+
+        self.assertEqual(chunks, ['<media:group xmlns:media="http://search.yahoo.com/mrss/"><media:content/></media:group>'])
+
+    def test_no_match(self):
+        self.assertEqual(list(split_xml(StringIO(XML), 'rss.channel.link', 10)), [])
+
+    def test_compressed(self):
+        self.assertEqual(list(split_xml(StringIO(bz2.compress(XML)), 'rss.channel', 2)), list(split_xml(StringIO(XML), 'rss.channel', 2)))
+
+    def test_invalid(self):
+        chunks = split_xml(StringIO('<rss><channel><item></channel>'), 'rss.channel', 2)
+
+        self.assertRaises(etree.XMLSyntaxError, list, chunks)
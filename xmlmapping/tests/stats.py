@@ -0,0 +1,164 @@
+# Python stdlib
+import pickle
+import socket
+
+# Django
+from django.test import TestCase
+
+# Internal
+from ..models import Mapping
+from ..stats import LoadStats, MemorySink, StatsdSink, FAILED, clock, emit_stats, register_sink, start_stats, unregister_sink
+
+PATH = 'rss.channel.item'
+
+
+class LoadStatsTestCase(TestCase):
+
+    def stats(self):
+        stats = LoadStats([PATH, 'rss.channel'])
+        stats.counts['found'][PATH] = 3
+        stats.counts['created'][PATH] = 2
+        stats.count_object('myapp.Item', 'created')
+        stats.count_object('myapp.Item', 'created')
+        stats.count_object('myapp.Item', FAILED)
+        stats.count_bytes(100)
+        stats.add_error('Premature end of data')
+        stats.wall['parse'] = stats.cpu['parse'] = 1.0
+        return stats
+
+    def test_is_the_created_counter(self):
+        stats = self.stats()
+
+        self.assertEqual(stats, {PATH: 2, 'rss.channel': 0})
+        self.assertTrue(stats.counts['created'] is stats)
+        self.assertEqual(stats.found, {PATH: 3, 'rss.channel': 0})
+
+    def test_count_object(self):
+        self.assertEqual(self.stats().objects, {'myapp.Item': {'created': 2, 'updated': 0, 'unchanged': 0, 'failed': 1}})
+
+    def test_count_bytes_unknown(self):
+        stats = self.stats()
+        stats.count_bytes(None)
+        stats.count_bytes(10)
+
+        self.assertEqual(stats.bytes_parsed, None)
+
+    def test_add_time(self):
+        stats = LoadStats()
+        start = clock()
+        now = stats.add_time('extract', start)
+        stats.add_time('save', now)
+
+        self.assertEqual(sorted(stats.wall), ['extract', 'save'])
+        self.assertTrue(stats.wall['extract'] >= 0)
+        self.assertEqual(stats.stage_time('extract', 'save')[0], stats.wall['extract'] + stats.wall['save'])
+
+    def test_add_time_cpu_unknown(self):
+        stats = LoadStats()
+        stats.cpu['save'] = None
+        stats.add_time('save', clock())
+
+        self.assertEqual(stats.cpu['save'], None)
+        self.assertTrue(stats.wall['save'] >= 0)
+
+    def test_merge(self):
+        stats = self.stats()
+        stats.merge(self.stats())
+
+        self.assertEqual(stats, {PATH: 4, 'rss.channel': 0})
+        self.assertEqual(stats.found[PATH], 6)
+        self.assertEqual(stats.objects['myapp.Item']['failed'], 2)
+        self.assertEqual(stats.bytes_parsed, 200)
+        self.assertEqual(stats.errors, ['Premature end of data', 'Premature end of data'])
+        self.assertEqual(stats.wall, {'parse': 2.0})
+
+    def test_pickle(self):
+        stats = pickle.loads(pickle.dumps(self.stats(), pickle.HIGHEST_PROTOCOL))
+
+        self.assertEqual(stats, {PATH: 2, 'rss.channel': 0})
+        self.assertTrue(stats.counts['created'] is stats)
+        self.assertEqual(stats.found[PATH], 3)
+        self.assertEqual(stats.objects['myapp.Item']['created'], 2)
+        self.assertEqual(stats.bytes_parsed, 100)
+        self.assertEqual(stats.errors, ['Premature end of data'])
+        self.assertEqual(stats.wall, {'parse': 1.0})
+
+
+class StatsdSinkTestCase(TestCase):
+
+    def setUp(self):
+        self.mapping = Mapping(label='My feed')
+        self.stats = LoadStats([PATH])
+        self.stats.counts['found'][PATH] = 3
+        self.stats.count_object('myapp.Item', 'created')
+        self.stats.count_bytes(100)
+        self.stats.wall['total'] = 0.25
+
+    def test_metrics(self):
+        lines = StatsdSink(prefix='xml').metrics(self.mapping, self.stats)
+
+        self.assertTrue('xml.My_feed.found.rss_channel_item:3|c' in lines)
+        self.assertTrue('xml.My_feed.skipped.rss_channel_item:0|c' in lines)
+        self.assertTrue('xml.My_feed.objects.myapp_Item.created:1|c' in lines)
+        self.assertTrue('xml.My_feed.objects.myapp_Item.failed:0|c' in lines)
+        self.assertTrue('xml.My_feed.bytes:100|c' in lines)
+        self.assertTrue('xml.My_feed.time.total:250|ms' in lines)
+
+    def test_emit(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        server.settimeout(5)
+        try:
+            sink = StatsdSink('127.0.0.1', server.getsockname()[1], 'xml')
+            sink.emit(self.mapping, self.stats)
+            packet = server.recv(sink.PACKET_SIZE)
+        finally:
+            server.close()
+
+        self.assertEqual(packet.split('\n'), sink.metrics(self.mapping, self.stats))
+
+
+class SinksTestCase(TestCase):
+
+    class FailingSink(object):
+        def start(self, mapping, stats):
+            raise IOError('sink down')
+
+        def emit(self, mapping, stats):
+            raise IOError('sink down')
+
+    class StartedSink(MemorySink):
+        def start(self, mapping, stats):
+            self.loads.append(('started', stats))
+
+    def test_emit_stats(self):
+        mapping = Mapping(label='sinks')
+        stats = LoadStats()
+        failing = self.FailingSink()
+        sink = MemorySink()
+        register_sink(failing)
+        register_sink(sink)
+        try:
+            emit_stats(mapping, stats)
+        finally:
+            unregister_sink(failing)
+            unregister_sink(sink)
+        emit_stats(mapping, stats)
+
+        self.assertEqual(sink.loads, [('sinks', stats)])
+
+    def test_start_stats(self):
+        mapping = Mapping(label='sinks')
+        stats = LoadStats()
+        failing = self.FailingSink()
+        memory = MemorySink()  # no start method
+        sink = self.StartedSink()
+        for s in (failing, memory, sink):
+            register_sink(s)
+        try:
+            start_stats(mapping, stats)
+        finally:
+            for s in (failing, memory, sink):
+                unregister_sink(s)
+
+        self.assertEqual(sink.loads, [('started', stats)])
@@ -0,0 +1,83 @@
+# Python stdlib
+import datetime
+import decimal
+
+# Django
+from django.test import TestCase
+
+# Internal
+from .. import transformers
+from ..transformers import TransformError, compile_transform
+
+
+def parse_flag(value):
+    return value == 'yes'
+
+
+class CompileTransformKnownValues(TestCase):
+
+    def test_transformers(self):
+        self.assertEqual(compile_transform('strip')(' a '), 'a')
+        self.assertEqual(compile_transform({'strip': '$'})('$5$'), '5')
+        self.assertEqual(compile_transform('int')(' 650 '), 650)
+        self.assertEqual(compile_transform('decimal')('5.95'), decimal.Decimal('5.95'))
+        self.assertEqual(compile_transform({'date': '%d/%m/%Y'})('24/12/2012'), datetime.date(2012, 12, 24))
+        self.assertEqual(compile_transform({'datetime': '%Y-%m-%dT%H:%M'})('2012-12-24T20:30'), datetime.datetime(2012, 12, 24, 20, 30))
+        self.assertEqual(compile_transform({'regex': r'\$([0-9.]+)'})('only $5.95'), '5.95')
+        self.assertEqual(compile_transform({'regex': r'[0-9]+'})('650 cal'), '650')
+        self.assertEqual(compile_transform({'lookup': {'Y': True, 'N': False}})('N'), False)
+        self.assertEqual(compile_transform({'function': 'xmlmapping.tests.transformers.parse_flag'})('yes'), True)
+
+    def test_chain(self):
+        transform = compile_transform(['strip', {'regex': r'\$([0-9.]+)'}, 'decimal'])
+
+        self.assertEqual(transform(' $5.95 '), decimal.Decimal('5.95'))
+
+    def test_failure(self):
+        self.assertRaises(TransformError, compile_transform('int'), 'abc')
+        self.assertRaises(TransformError, compile_transform('decimal'), 'abc')
+        self.assertRaises(TransformError, compile_transform({'regex': r'\d'}), 'abc')
+        self.assertRaises(TransformError, compile_transform({'lookup': {}}), 'abc')
+
+    def test_invalid(self):
+        self.assertRaises(TransformError, compile_transform, 'unknown')
+        self.assertRaises(TransformError, compile_transform, {'int': None, 'strip': None})
+        self.assertRaises(TransformError, compile_transform, 'date')
+        self.assertRaises(TransformError, compile_transform, {'regex': '('})
+        self.assertRaises(TransformError, compile_transform, {'lookup': ['Y']})
+        self.assertRaises(TransformError, compile_transform, {'function': 'xmlmapping.tests.transformers.unknown'})
+
+
+class MemoTestCase(TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+    def count(self, value):
+        self.calls.append(value)
+        return value
+
+    def test_pure_memoized(self):
+        transform = compile_transform({'date': '%Y-%m-%d'})
+
+        self.assertTrue(transform('2012-12-24') is transform('2012-12-24'))
+
+    def test_function_not_memoized(self):
+        transform = compile_transform(['strip', {'function': self.count}])
+        transform('a')
+        transform('a')
+
+        self.assertEqual(self.calls, ['a', 'a'])
+
+    def test_bounded(self):
+        size = transformers.MEMO_SIZE
+        transformers.MEMO_SIZE = 2
+        try:
+            transform = compile_transform('decimal')
+            first = transform('1')
+            transform('2')
+            transform('3')
+
+            self.assertFalse(transform('1') is first)
+        finally:
+            transformers.MEMO_SIZE = size
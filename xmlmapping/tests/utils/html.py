@@ -0,0 +1,83 @@
+# Python stdlib
+import re
+import htmlentitydefs
+
+# Django
+from django.test import TestCase
+
+# Internal
+from ...utils.html import unescape, memoized_unescape
+
+
+def legacy_unescape(text):
+    """The unescape function before the precompiled table, to check the output is the same."""
+    def fixup(m):
+        text = m.group(0)
+        if text[:2] == "&#":
+            try:
+                if text[:3] == "&#x":
+                    return unichr(int(text[3:-1], 16))
+                else:
+                    return unichr(int(text[2:-1]))
+            except ValueError:
+                pass
+        else:
+            try:
+                if text[1:-1] == "amp":
+                    text = "&amp;amp;"
+                elif text[1:-1] == "gt":
+                    text = "&amp;gt;"
+                elif text[1:-1] == "lt":
+                    text = "&amp;lt;"
+                else:
+                    text = unichr(htmlentitydefs.name2codepoint[text[1:-1]])
+            except KeyError:
+                pass
+        return text
+    return re.sub("&#?\w+;", fixup, text)
+
+
+TEXTS = [
+    '', '$5.95', 'USA', u'Caf\xe9', 'Bryan Adams',
+    'Fish &amp; Chips', '1 &lt; 2 &gt; 0', u'Cr&egrave;me br&ucirc;l&eacute;e', 'caf&#233;', 'caf&#xe9;',
+    '&unknown;', '&#xZZ;', '&#99999999;', '& alone', '&amp', 'A&B;C', '&nbsp;&copy;&#8364;',
+]
+
+
+class UnescapeKnownValues(TestCase):
+
+    def test_no_entity(self):
+        text = 'two of our famous Belgian Waffles'
+
+        self.assertTrue(unescape(text) is text)
+
+    def test_entities(self):
+        self.assertEqual(unescape(u'Cr&egrave;me &#233;&#xe9;'), u'Cr\xe8me \xe9\xe9')
+
+    def test_keep_markup(self):
+        self.assertEqual(unescape('Fish &amp; Chips &lt;3'), 'Fish &amp;amp; Chips &amp;lt;3')
+
+    def test_same_as_legacy(self):
+        for text in TEXTS + [name.join('&;') for name in htmlentitydefs.name2codepoint]:
+            result = unescape(text)
+            expected = legacy_unescape(text)
+            self.assertEqual(result, expected)
+            self.assertEqual(type(result), type(expected))
+
+
+class MemoizedUnescapeTestCase(TestCase):
+
+    def test_same_as_unescape(self):
+        unescape_text = memoized_unescape(size=4, max_length=12)
+
+        for i in range(3):
+            for text in TEXTS:
+                result = unescape_text(text)
+                self.assertEqual(result, unescape(text))
+                self.assertEqual(type(result), type(unescape(text)))
+
+    def test_str_and_unicode(self):
+        unescape_text = memoized_unescape()
+
+        self.assertEqual(type(unescape_text('&amp;')), str)
+        self.assertEqual(type(unescape_text(u'&amp;')), unicode)
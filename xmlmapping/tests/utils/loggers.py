@@ -1,12 +1,14 @@
 # Python stdlib
+import logging
 import os
+import tempfile
 from datetime import timedelta, tzinfo, datetime
 
 # Django
 from django.test import TestCase
 
 # Internal
-from ...utils.loggers import windows_safe, make_safe, to_unicode
+from ...utils.loggers import windows_safe, make_safe, to_unicode, DefaultLogger, ImproperlyConfigured, QueueHandler, QueueListener, DROP
 
 
 class LoggersPathUtilsKnownValues(TestCase):
@@ -83,3 +85,87 @@ class LoggersUnicodeUtilsTestCase(TestCase):
 
         self.assertEqual(u_a, u1_int_converted)
         self.assertEqual(u_b, u2_int_converted)
+
+
+class DefaultLoggerTestCase(TestCase):
+
+    def test_get_logger(self):
+        logger = DefaultLogger(logger_name='xmlmapping.tests.get_logger', log_file=os.path.join(tempfile.mkdtemp(), 'test.log'))
+
+        wrapped = logger.get_logger()
+
+        self.assertTrue(isinstance(wrapped, logging.Logger))
+        self.assertEqual(wrapped.name, 'xmlmapping.tests.get_logger')
+        self.assertEqual(len(wrapped.handlers), 1)
+        self.assertTrue(logger.get_logger() is wrapped)
+
+    def test_queue(self):
+        log_file = os.path.join(tempfile.mkdtemp(), 'test.log')
+        logger = DefaultLogger(logger_name='xmlmapping.tests.queue', log_file=log_file, queue_size=10)
+
+        wrapped = logger.get_logger()
+        for i in range(25):
+            wrapped.info('record %s', i)
+        logger.flush_queue()
+
+        self.assertTrue(isinstance(wrapped.handlers[0], QueueHandler))
+        with open(log_file) as f:
+            self.assertEqual(len(f.readlines()), 25)
+        logger.listener.stop()
+
+    def test_invalid_policy(self):
+        self.assertRaises(ImproperlyConfigured, DefaultLogger, logger_name='xmlmapping.tests.policy', log_file='test.log', queue_size=10, queue_full='wait')
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class QueueHandlerTestCase(TestCase):
+
+    def record(self, msg):
+        return logging.makeLogRecord({'name': 'test', 'levelno': logging.INFO, 'msg': msg})
+
+    def test_drop(self):
+        target = ListHandler()
+        listener = QueueListener([target], size=2, interval=10)
+        handler = QueueHandler(listener, DROP)
+        # The thread does not run: the queue is not drained
+        listener.thread = 'running'
+
+        for msg in ['a', 'b', 'c', 'd']:
+            handler.emit(self.record(msg))
+        listener.drain()
+        handler.emit(self.record('e'))
+        listener.drain()
+
+        self.assertEqual(target.messages, ['a', 'b', '2 log records dropped: the log queue was full.', 'e'])
+
+    def test_forked(self):
+        target = ListHandler()
+        listener = QueueListener([target])
+        handler = QueueHandler(listener)
+        handler.pid = -1
+
+        handler.emit(self.record('a'))
+
+        # Handled by the process logging
+        self.assertEqual(target.messages, ['a'])
+        self.assertEqual(listener.thread, None)
+
+    def test_stop(self):
+        target = ListHandler()
+        listener = QueueListener([target], interval=10)
+        handler = QueueHandler(listener)
+
+        handler.emit(self.record('a'))
+        handler.emit(self.record('b'))
+        listener.stop()
+
+        self.assertEqual(target.messages, ['a', 'b'])
+        self.assertEqual(listener.thread, None)
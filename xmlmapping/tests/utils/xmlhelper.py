@@ -5,7 +5,7 @@ from django.test import TestCase
 from lxml import etree  # http://lxml.de/
 
 # Internal
-from ...utils.xmlhelper import XMLHelper
+from ...utils.xmlhelper import XMLHelper, ElementNotFound, PathCache
 
 XML = """<?xml version="1.0" encoding="utf-8"?>
         <rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/">
@@ -93,6 +93,26 @@ class GetTextKnownValues(TestCase):
         self.assertEqual(value, 'Desc item 4')
 
 
+class TextFinderKnownValues(TestCase):
+
+    def test_text_tag_element(self):
+        elems = XMLHelper.get_elements('rss.channel.item', DOC)
+        find_text = XMLHelper.text_finder('title', DOC.nsmap)
+
+        self.assertEqual(find_text(elems[1]), XMLHelper.get_text(elems[1], 'title'))
+
+    def test_text_tag_element_with_ns(self):
+        elems = XMLHelper.get_elements('rss.channel.item', DOC)
+        find_text = XMLHelper.text_finder('media:desc', DOC.nsmap)
+
+        self.assertEqual(find_text(elems[2]), 'Desc item 3')
+
+    def test_not_found(self):
+        find_text = XMLHelper.text_finder('media:desc', DOC.nsmap)
+
+        self.assertRaises(ElementNotFound, find_text, DOC)
+
+
 class PrefixToURIKnownValues(TestCase):
     tag = 'ns1:tag1.ns2:tag2.ns1:tag3'
     tag_backslash = 'ns1:tag1/ns2:tag2/ns1:tag3'
@@ -132,3 +152,60 @@ class XPathKnownValues(TestCase):
 
         xpath_a = XMLHelper.to_xpath(self.path, self.ns_map)
         self.assertEqual(xpath_a, self.xpath)
+
+
+class PathCacheTestCase(TestCase):
+    ns_map = {'ns1': 'http://www.ns1.com'}
+
+    def setUp(self):
+        self.cache = PathCache(max_size=2)
+
+    def test_hits_and_misses(self):
+        upper = lambda path, nsmap: path.upper()
+
+        self.assertEqual(self.cache.resolve(upper, 'a', self.ns_map), 'A')
+        self.assertEqual(self.cache.resolve(upper, 'a', dict(self.ns_map)), 'A')
+        self.assertEqual(self.cache.resolve(upper, 'a', {}), 'A')
+
+        self.assertEqual(self.cache.info(), (1, 2, 2, 2))
+
+    def test_bounded(self):
+        upper = lambda path, nsmap: path.upper()
+
+        for path in ('a', 'b', 'c'):
+            self.cache.resolve(upper, path, self.ns_map)
+
+        self.assertEqual(self.cache.info().size, 1)
+
+    def test_errors_not_cached(self):
+        self.assertRaises(KeyError, self.cache.resolve, XMLHelper._to_xpath, 'ns2:tag', self.ns_map)
+        self.assertEqual(self.cache.info().size, 0)
+
+    def test_xml_helper(self):
+        XMLHelper.to_xpath('ns1:tag1.tag2', self.ns_map)
+        info = XMLHelper.path_cache_info()
+
+        self.assertEqual(XMLHelper.to_xpath('ns1:tag1.tag2', self.ns_map), '{http://www.ns1.com}tag1/tag2')
+        self.assertEqual(XMLHelper.path_cache_info().hits, info.hits + 1)
+        self.assertEqual(XMLHelper.ns_uri_to_prefix('{http://www.ns1.com}tag1', self.ns_map), 'ns1:tag1')
+
+
+class ToTagsKnownValues(TestCase):
+    path = 'ns1:tag1.tag2.ns2:tag3'
+    ns_map = {
+            'ns1': 'http://www.ns1.com',
+            'ns2': 'http://www.ns2.com'
+        }
+    tags = ('{http://www.ns1.com}tag1', 'tag2', '{http://www.ns2.com}tag3')
+
+    def test_basic(self):
+        self.assertEqual(XMLHelper.to_tags(self.path, self.ns_map), self.tags)
+
+    def test_empty(self):
+        self.assertEqual(XMLHelper.to_tags('', self.ns_map), ())
+
+    def test_relative_path(self):
+        self.assertEqual(XMLHelper.relative_path('rss.channel.item', 'rss'), 'channel.item')
+        self.assertEqual(XMLHelper.relative_path('rss.channel.item', 'rss.channel'), 'item')
+        self.assertEqual(XMLHelper.relative_path('rss.channel', 'rss.channel'), '')
+        self.assertEqual(XMLHelper.relative_path('rssfeed.item', 'rss'), 'rssfeed.item')
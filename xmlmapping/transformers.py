@@ -0,0 +1,157 @@
+# Python stdlib
+import datetime
+import decimal
+import re
+
+# Internal
+from .utils.serializers import deserialize_function
+
+
+class TransformError(ValueError):
+    pass
+
+
+# The maximum number of values memoized per field: the memo is cleared when it is full
+MEMO_SIZE = 4096
+
+
+def _strip(chars=None):
+    return lambda value: value.strip(chars)
+
+
+def _int(arg=None):
+    return lambda value: int(value.strip())
+
+
+def _decimal(arg=None):
+    return lambda value: decimal.Decimal(value.strip())
+
+
+def _check_format(date_format):
+    if not isinstance(date_format, basestring):
+        raise TransformError('A format is required, e.g. %Y-%m-%d')
+
+
+def _date(date_format):
+    _check_format(date_format)
+    strptime = datetime.datetime.strptime
+    return lambda value: strptime(value.strip(), date_format).date()
+
+
+def _datetime(date_format):
+    _check_format(date_format)
+    strptime = datetime.datetime.strptime
+    return lambda value: strptime(value.strip(), date_format)
+
+
+def _regex(pattern):
+    search = re.compile(pattern, re.UNICODE).search
+
+    def capture(value):
+        match = search(value)
+        if match is None:
+            raise TransformError('%s does not match' % (pattern,))
+        # The first group if the pattern captures one, the whole match otherwise
+        return match.group(1) if match.re.groups else match.group(0)
+
+    return capture
+
+
+def _lookup(table):
+    if not isinstance(table, dict):
+        raise TransformError('A table is required')
+    return lambda value: table[value]
+
+
+def _function(name):
+    func = deserialize_function(name)
+    if not callable(func):
+        raise TransformError('A function is required')
+    return func
+
+
+# The transformers by name: (function taking the argument and returning the transformation, whether it is pure).
+# A pure transformation always returns the same value for the same input, so its results are memoized.
+TRANSFORMERS = {
+    'strip': (_strip, True),
+    'int': (_int, True),
+    'decimal': (_decimal, True),
+    'date': (_date, True),
+    'datetime': (_datetime, True),
+    'regex': (_regex, True),
+    'lookup': (_lookup, True),
+    'function': (_function, False),
+}
+
+
+def compile_transform(specs):
+    """Compiles the transformers of a field into a function applying them in turn to the text of the field.
+
+    Each transformer is defined by its name, or by a dict of its name and its argument, e.g.:
+        ["strip", {"regex": "\\$([0-9.]+)"}, "decimal"]
+        {"date": "%Y-%m-%d"}
+        {"lookup": {"Y": true, "N": false}}
+        {"function": "myapp.utils.parse_price"}
+
+    When all the transformers are pure, the values are memoized: the high-cardinality repeated values
+    (e.g. dates, prices, codes) are only converted once.
+
+    Args:
+        specs: a list of transformers, or a single one
+
+    Returns:
+        A function taking a value and returning it transformed.
+        It raises a TransformError when a transformer fails on a value.
+
+    Raises:
+        A TransformError if a transformer is unknown or its argument is invalid.
+    """
+    if not isinstance(specs, list):
+        specs = [specs]
+
+    steps = []
+    pure = True
+    for spec in specs:
+        if isinstance(spec, basestring):
+            name, arg = spec, None
+        elif isinstance(spec, dict) and len(spec) == 1:
+            name, arg = spec.items()[0]
+        else:
+            raise TransformError('Invalid transformer: %r' % (spec,))
+
+        if name not in TRANSFORMERS:
+            raise TransformError('Unknown transformer: %s' % (name,))
+        factory, is_pure = TRANSFORMERS[name]
+        try:
+            steps.append((name, factory(arg)))
+        except Exception as err:
+            raise TransformError('Invalid argument of the transformer %s: %r (%s)' % (name, arg, err))
+        pure = pure and is_pure
+
+    steps = tuple(steps)
+
+    def transform(value):
+        for name, func in steps:
+            try:
+                value = func(value)
+            except Exception as err:
+                raise TransformError('The transformer %s failed on %r: %s' % (name, value, err))
+        return value
+
+    if not pure:
+        return transform
+
+    memo = {}
+
+    def memoized(value):
+        try:
+            return memo[value]
+        except KeyError:
+            pass
+        result = transform(value)
+        if len(memo) >= MEMO_SIZE:
+            memo.clear()
+        memo[value] = result
+        return result
+
+    return memoized
@@ -2,6 +2,35 @@
 import re
 import htmlentitydefs
 
+# PATTERNS
+ENTITY_PATTERN = re.compile(r'&#?\w+;')
+
+# The replacement of the named entities by their name
+# &amp;, &gt; and &lt; are kept in the source code
+ENTITIES = dict((name, unichr(codepoint)) for (name, codepoint) in htmlentitydefs.name2codepoint.iteritems())
+ENTITIES.update({
+    'amp': '&amp;amp;',
+    'gt': '&amp;gt;',
+    'lt': '&amp;lt;',
+})
+
+
+def _fixup(m):
+    text = m.group(0)
+    if text[:2] == "&#":
+        # character reference
+        try:
+            if text[:3] == "&#x":
+                return unichr(int(text[3:-1], 16))
+            else:
+                return unichr(int(text[2:-1]))
+        except ValueError:
+            pass
+        return text  # leave as is
+
+    # named entity
+    return ENTITIES.get(text[1:-1], text)
+
 
 def unescape(text):
     """Removes HTML or XML character references
@@ -10,32 +39,38 @@ def unescape(text):
     from Fredrik Lundh
     http://effbot.org/zone/re-sub.htm#unescape-html
     """
-    def fixup(m):
-        text = m.group(0)
-        if text[:2] == "&#":
-            # character reference
-            try:
-                if text[:3] == "&#x":
-                    return unichr(int(text[3:-1], 16))
-                else:
-                    return unichr(int(text[2:-1]))
-            except ValueError:
-                #print "erreur de valeur"
-                pass
-        else:
-            # named entity
-            try:
-                if text[1:-1] == "amp":
-                    text = "&amp;amp;"
-                elif text[1:-1] == "gt":
-                    text = "&amp;gt;"
-                elif text[1:-1] == "lt":
-                    text = "&amp;lt;"
-                else:
-                    #print text[1:-1]
-                    text = unichr(htmlentitydefs.name2codepoint[text[1:-1]])
-            except KeyError:
-                #print "keyerror"
-                pass
-        return text  # leave as is
-    return re.sub("&#?\w+;", fixup, text)
+    # Most texts have nothing to unescape
+    if '&' not in text:
+        return text
+    return ENTITY_PATTERN.sub(_fixup, text)
+
+
+def memoized_unescape(size=1024, max_length=64):
+    """Returns an unescape function remembering the short texts it unescaped, e.g. repeated prices or codes.
+    The memo is cleared when it is full.
+
+    Args:
+        size: the maximum number of texts to remember
+        max_length: the maximum length of a text to remember
+
+    Returns:
+        A function behaving like unescape.
+    """
+    memo = {}
+
+    def unescape_text(text):
+        if '&' not in text:
+            return text
+        if len(text) > max_length:
+            return ENTITY_PATTERN.sub(_fixup, text)
+
+        # The type is part of the key: a str and a unicode equal texts may not be unescaped the same way
+        key = (type(text), text)
+        result = memo.get(key)
+        if result is None:
+            if len(memo) >= size:
+                memo.clear()
+            result = memo[key] = ENTITY_PATTERN.sub(_fixup, text)
+        return result
+
+    return unescape_text
@@ -1,12 +1,16 @@
 # Python stdlib
+import atexit
 import os
 import os.path
 import logging
+import logging.handlers
 import string
+import threading
 import unicodedata
+from collections import deque
 
 # Django
-from django.utils.functional import LazyObject
+from django.utils.functional import LazyObject, empty
 from django.core.files.base import ContentFile
 from django.utils.encoding import force_unicode
 
@@ -57,9 +61,157 @@ def make_safe(s):
     return windows_safe(u''.join(c for c in s if c in valid_chars))
 
 
+# The policies of a QueueHandler when its queue is full
+BLOCK = 'block'
+DROP = 'drop'
+
+
+class QueueListener(object):
+    """Runs handlers in a background thread on the records put in its queue by a QueueHandler,
+    so the formatting and the writes of the handlers do not slow down the threads logging.
+
+    The queue is a deque: putting a record takes no lock. The thread wakes up every interval seconds,
+    or as soon as the queue is half full, and handles all the records queued.
+    The thread is started on the first record and stopped (once the queue is drained) at exit.
+    """
+
+    def __init__(self, handlers, size=10000, interval=0.1):
+        self.handlers = tuple(handlers)
+        self.size = size
+        self.interval = interval
+        self.records = deque()
+        self.thread = None
+        self.stopped = False
+        self.busy = False
+        self.wakeup = threading.Event()
+        self.drained = threading.Condition()
+
+    def start(self):
+        """Starts the thread if it is not running."""
+        with self.drained:
+            if self.thread is not None:
+                return
+            self.stopped = False
+            self.thread = threading.Thread(target=self.run, name='xmlmapping-log')
+            self.thread.daemon = True
+            self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Writes the records left in the queue and stops the thread."""
+        with self.drained:
+            thread = self.thread
+            self.thread = None
+            self.stopped = True
+        if thread is not None:
+            self.wakeup.set()
+            thread.join()
+
+    def put(self, record, block=True):
+        """Puts a record in the queue. When the queue is full, waits for room or drops the record.
+
+        Returns:
+            Whether the record has been put in the queue.
+        """
+        records = self.records
+        if len(records) >= self.size:
+            if not block:
+                return False
+            with self.drained:
+                while len(records) >= self.size and self.thread is not None:
+                    self.wakeup.set()
+                    self.drained.wait(self.interval)
+
+        records.append(record)
+        if len(records) == self.size // 2:
+            self.wakeup.set()
+        return True
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            self.drain()
+            if self.stopped:
+                self.drain()
+                return
+
+    def drain(self):
+        """Runs the handlers on the records queued."""
+        records = self.records
+        self.busy = True
+        try:
+            while records:
+                self.handle(records.popleft())
+        finally:
+            self.busy = False
+            with self.drained:
+                self.drained.notify_all()
+
+    def handle(self, record):
+        """Runs the handlers on a record."""
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def flush(self):
+        """Waits until the records put in the queue are written."""
+        with self.drained:
+            while (self.records or self.busy) and self.thread is not None:
+                self.wakeup.set()
+                self.drained.wait(self.interval)
+
+
+class QueueHandler(logging.Handler):
+    """Puts the records in the queue of a QueueListener, to be handled in a background thread.
+
+    When the queue is full, the handler either blocks until there is room (block) or drops the record (drop):
+    the number of records dropped is then logged as a warning once there is room again.
+    The arguments of the messages are formatted by the background thread: they must not be changed after the call.
+    In a forked process (e.g. a worker of load_xml_chunks), the thread of the listener does not run,
+    so the records are handled by the process logging.
+    """
+
+    def __init__(self, listener, policy=BLOCK):
+        logging.Handler.__init__(self)
+        self.listener = listener
+        self.block = policy == BLOCK
+        self.dropped = 0
+        self.pid = os.getpid()
+
+    def emit(self, record):
+        try:
+            listener = self.listener
+            if self.pid != os.getpid():
+                listener.handle(record)
+                return
+            if listener.thread is None:
+                listener.start()
+
+            if self.dropped and listener.put(logging.makeLogRecord({
+                'name': record.name,
+                'levelno': logging.WARNING,
+                'levelname': logging.getLevelName(logging.WARNING),
+                'msg': '%s log records dropped: the log queue was full.' % (self.dropped,),
+            }), self.block):
+                self.dropped = 0
+
+            if not listener.put(record, self.block):
+                self.dropped = self.dropped + 1
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except:
+            self.handleError(record)
+
+
 class DefaultLogger(LazyObject):
-    """Logger with default file handler if no one exists."""
-    def __init__(self, logger_name=None, log_file=None, level=logging.INFO, log_size=5 * 1024 * 2 ** 10, logger_format='%(asctime)s %(levelname)s %(module)s %(message)s'):
+    """Logger with default file handler if no one exists.
+
+    When queue_size is set, the default file handler is run in a background thread: the records are put
+    in a queue of queue_size records by a QueueHandler, and queue_full is the policy when the queue is full.
+    """
+    def __init__(self, logger_name=None, log_file=None, level=logging.INFO, log_size=5 * 1024 * 2 ** 10, logger_format='%(asctime)s %(levelname)s %(module)s %(message)s',
+                 queue_size=0, queue_full=BLOCK):
         # IMPORTANT: must be here to avoid recursion
         super(DefaultLogger, self).__init__()
 
@@ -70,12 +222,18 @@ class DefaultLogger(LazyObject):
         if not logger.handlers and not log_file:
             raise ImproperlyConfigured('A log_file must be provided to use the default RotatingFileHandler when the logger does not exist or does not contain any handler.')
 
+        if queue_full not in (BLOCK, DROP):
+            raise ImproperlyConfigured('The policy of a full log queue must be %s or %s, not %s.' % (BLOCK, DROP, queue_full))
+
         self.__dict__['logger'] = logger
         self.__dict__['logger_name'] = logger_name
         self.__dict__['log_file'] = log_file
         self.__dict__['log_size'] = log_size
         self.__dict__['logger_format'] = logger_format
         self.__dict__['level'] = level
+        self.__dict__['queue_size'] = queue_size
+        self.__dict__['queue_full'] = queue_full
+        self.__dict__['listener'] = None
         self.__dict__['messages'] = []
 
     def _setup(self):
@@ -95,10 +253,28 @@ class DefaultLogger(LazyObject):
             )
             handler.formatter = logging.Formatter(fmt=self.logger_format)
 
+            if self.queue_size:
+                listener = QueueListener([handler], self.queue_size)
+                self.__dict__['listener'] = listener
+                handler = QueueHandler(listener, self.queue_full)
+
             self.logger.handlers.append(handler)
 
         self._wrapped = self.logger
 
+    def get_logger(self):
+        """Returns the wrapped logger, set up if needed.
+        Calling it directly in a loop saves the cost of the proxy on each call.
+        """
+        if self._wrapped is empty:
+            self._setup()
+        return self._wrapped
+
+    def flush_queue(self):
+        """Waits until the records in the queue are written, when the default handler runs in a background thread."""
+        if self.listener is not None:
+            self.listener.flush()
+
     def append_msg(self, msg):
         """Appends a message to the log buffer."""
         self.messages.append(msg)
@@ -118,9 +294,10 @@ class DefaultLogger(LazyObject):
 
 class LoggerWithStorage(DefaultLogger):
     """Logger with a Storage."""
-    def __init__(self, storage=None, logger_name=None, log_file=None, level=logging.INFO, log_size=5 * 1024 * 2 ** 10, logger_format='%(asctime)s %(levelname)s %(module)s %(message)s'):
+    def __init__(self, storage=None, logger_name=None, log_file=None, level=logging.INFO, log_size=5 * 1024 * 2 ** 10, logger_format='%(asctime)s %(levelname)s %(module)s %(message)s',
+                 queue_size=0, queue_full=BLOCK):
         # IMPORTANT: must be here to avoid recursion
-        super(LoggerWithStorage, self).__init__(logger_name, log_file, level, log_size, logger_format)
+        super(LoggerWithStorage, self).__init__(logger_name, log_file, level, log_size, logger_format, queue_size, queue_full)
 
         if not (storage and logger_name):
             raise ImproperlyConfigured('A storage AND a logger name must be provided.')
@@ -1,5 +1,9 @@
 # Python stdlib
 import re
+from collections import namedtuple
+
+# Third-party apps
+from lxml import etree  # http://lxml.de/
 
 # Internal
 from . import html
@@ -12,12 +16,65 @@ URI_PATTERN = re.compile(r'({.*?})')
 class ElementNotFound(Exception):
     pass
 
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses max_size size')
+
+
+class PathCache(object):
+    """A bounded cache of the paths resolved against a namespace mapping, counting its hits and misses.
+    It is cleared when it is full.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.data = {}
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, compute, path, nsmap):
+        """Returns the path resolved by compute(path, nsmap), computed once per path and namespace mapping.
+        The errors are not cached.
+        """
+        key = (compute, path, frozenset(nsmap.iteritems()))
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses = self.misses + 1
+            value = compute(path, nsmap)
+            if len(self.data) >= self.max_size:
+                self.data.clear()
+            self.data[key] = value
+            return value
+
+        self.hits = self.hits + 1
+        return value
+
+    def info(self):
+        """Returns the statistics of the cache as a CacheInfo."""
+        return CacheInfo(self.hits, self.misses, self.max_size, len(self.data))
+
+    def clear(self):
+        """Empties the cache and resets its statistics."""
+        self.data.clear()
+        self.hits = 0
+        self.misses = 0
+
+
 class XMLHelper(object):
 
+    # The resolved paths, see path_cache_info
+    path_cache = PathCache()
+
+    @classmethod
+    def path_cache_info(cls):
+        """Returns the number of hits and misses of the cache of the resolved paths as a CacheInfo."""
+        return cls.path_cache.info()
+
     @classmethod
     def to_xpath(cls, path, nsmap):
         """Converts a dotted path to a xpath format.
         i.e. dots are replaced by backslash and prefix are replaced by URI
+        The converted paths are cached.
         
         Args:
             path: the dotted path to convert
@@ -29,6 +86,10 @@ class XMLHelper(object):
         if path is None:
             return None
 
+        return cls.path_cache.resolve(cls._to_xpath, path, nsmap)
+
+    @classmethod
+    def _to_xpath(cls, path, nsmap):
         return cls.ns_prefix_to_uri(path.replace('.', '/'), nsmap)
 
     @staticmethod
@@ -50,10 +111,11 @@ class XMLHelper(object):
 
         return path
 
-    @staticmethod
-    def ns_uri_to_prefix(path, ns_map):
+    @classmethod
+    def ns_uri_to_prefix(cls, path, ns_map):
         """Replaces the URI of a path by their prefix.
         {uri}tag_name -> prefix:tag_name
+        The converted paths are cached.
 
         Args:
             path: the path to convert
@@ -62,7 +124,10 @@ class XMLHelper(object):
         Returns:
             A String being the converted path
         """
+        return cls.path_cache.resolve(cls._ns_uri_to_prefix, path, ns_map)
 
+    @staticmethod
+    def _ns_uri_to_prefix(path, ns_map):
         uri = URI_PATTERN.findall(path)
 
         # Reverse key, values
@@ -73,6 +138,46 @@ class XMLHelper(object):
 
         return path
 
+    @classmethod
+    def to_tags(cls, path, nsmap):
+        """Converts a dotted path to a tuple of tags.
+        i.e. the path is split on dots and prefixes are replaced by URI
+
+        Args:
+            path: the dotted path to convert
+            nsmap: the namespace mapping to use
+
+        Returns:
+            A tuple of strings. An empty tuple for an empty path.
+        """
+        if not path:
+            return ()
+
+        return cls.path_cache.resolve(cls._to_tags, path, nsmap)
+
+    @classmethod
+    def _to_tags(cls, path, nsmap):
+        return tuple(cls.ns_prefix_to_uri(tag, nsmap) for tag in path.split('.'))
+
+    @staticmethod
+    def relative_path(path, node_path):
+        """Removes the node_path from the path if the path starts with it.
+
+        Args:
+            path: the dotted path
+            node_path: the dotted path of the node
+
+        Returns:
+            A String being the path relative to the node. An empty string if the path is the node_path itself.
+        """
+        if path == node_path:
+            return ''
+
+        if path.startswith(node_path + '.'):
+            return path[len(node_path) + 1:]
+
+        return path
+
     @classmethod
     def get_elements(cls, path, node, node_path=None):
         """Finds all the elements matching the path starting from the node.
@@ -141,3 +246,29 @@ class XMLHelper(object):
             An ElementNotFound exception when the tag cannot be found in the element.
         """
         return html.unescape(cls.get_text(element, tag))
+
+    @classmethod
+    def text_finder(cls, tag, nsmap, unescape=True):
+        """Compiles a function getting the text value of the first tag found in an element.
+        It behaves like get_text (or get_text_unescape) but the path is resolved and compiled once.
+
+        Args:
+            tag: the tag to look for
+            nsmap: the namespace mapping to use
+            unescape: whether the text must be unescaped
+
+        Returns:
+            A function taking an element and returning a string.
+            It raises an ElementNotFound exception when the tag cannot be found in the element.
+        """
+        path = cls.to_xpath(tag, nsmap)
+        xpath = etree.ETXPath(path)
+
+        def find_text(element):
+            found = xpath(element)
+            if not found:
+                raise ElementNotFound('%s (path=%s) not found in the element' % (tag, path,))
+            text = found[0].text or ''
+            return html.unescape(text) if unescape else text
+
+        return find_text